@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Benchmark del control adaptativo AIMD contra un servidor local con límite de ritmo
+El servidor devuelve 429 cuando un slot (proxy simulado) supera N requests por
+segundo. Compara el delay estático, AutoThrottle y AdaptiveConcurrency midiendo
+items/segundo, bloqueos recibidos y el límite global alcanzado (AIMD parte de
+CONCURRENT_REQUESTS = 1 y lo sube solo)
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixture_server import DEFAULT_TITLE_PAGE
+
+
+class RateLimitedServer:
+    """Servidor que bloquea (429) a cada slot que supera `rate` requests por segundo"""
+
+    def __init__(self, rate: float):
+        outer = self
+        self.rate = rate
+        self.lock = threading.Lock()
+        self.history = defaultdict(deque)
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                slot = parse_qs(urlparse(self.path).query).get('slot', [''])[0]
+                blocked = outer.over_limit(slot)
+                body = b'Too Many Requests' if blocked else DEFAULT_TITLE_PAGE
+                self.send_response(429 if blocked else 200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def over_limit(self, slot: str) -> bool:
+        """Ventana deslizante de un segundo por slot"""
+        now = time.monotonic()
+        with self.lock:
+            window = self.history[slot]
+            while window and now - window[0] > 1.0:
+                window.popleft()
+            if len(window) >= self.rate:
+                return True
+            window.append(now)
+            return False
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+VARIANTS = {
+    'estatico': {'AUTOTHROTTLE_ENABLED': False, 'ADAPTIVE_CONCURRENCY_ENABLED': False},
+    'autothrottle': {'AUTOTHROTTLE_ENABLED': True, 'AUTOTHROTTLE_START_DELAY': 1.0,
+                     'AUTOTHROTTLE_TARGET_CONCURRENCY': 1.0, 'ADAPTIVE_CONCURRENCY_ENABLED': False},
+    # Arranque conservador: un request a la vez y el límite global lo sube el propio AIMD
+    'aimd': {'AUTOTHROTTLE_ENABLED': False, 'ADAPTIVE_CONCURRENCY_ENABLED': True,
+             'CONCURRENT_REQUESTS': 1, 'ADAPTIVE_TOTAL_CONCURRENCY_MAX': 64},
+}
+
+
+def run_crawl(variant: str, base_url: str, items: int, slots: int, delay: float) -> dict:
+    """Ejecutar un crawl contra el servidor (en un proceso hijo)"""
+    import scrapy
+    from scrapy.crawler import CrawlerProcess
+
+    class RateSpider(scrapy.Spider):
+        name = 'rate_fixture'
+
+        async def start(self):
+            for request in self.start_requests():
+                yield request
+
+        def start_requests(self):
+            for i in range(items):
+                slot = f"proxy-{i % slots}"
+                yield scrapy.Request(
+                    f"{base_url}/title/tt{i:07d}/?slot={slot}",
+                    callback=self.parse,
+                    meta={'download_slot': slot},
+                    dont_filter=True,
+                )
+
+        def parse(self, response):
+            yield {'titulo': response.css('h1 span::text').get()}
+
+    settings = {
+        'LOG_LEVEL': os.environ.get('BENCH_LOG_LEVEL', 'ERROR'),
+        'TELNETCONSOLE_ENABLED': False,
+        'CONCURRENT_REQUESTS': 64,
+        'CONCURRENT_REQUESTS_PER_DOMAIN': 1,
+        # Los 429 se reintentan hasta conseguir el item
+        'RETRY_HTTP_CODES': [429],
+        'RETRY_TIMES': 100,
+        'DOWNLOAD_DELAY': delay,
+        'RANDOMIZE_DOWNLOAD_DELAY': False,
+        'EXTENSIONS': {'imdb_scraper.extensions.AdaptiveConcurrency': 500},
+        'ADAPTIVE_CONCURRENCY_MAX': 8,
+        'ADAPTIVE_DELAY_MIN': 0.05,
+        'ADAPTIVE_DELAY_STEP': 0.1,
+        'ADAPTIVE_INCREASE_EVERY': 5,
+        'ADAPTIVE_BLOCK_COOLDOWN': 1.0,
+    }
+    settings.update(VARIANTS[variant])
+
+    process = CrawlerProcess(settings=settings)
+    crawler = process.create_crawler(RateSpider)
+    start = time.monotonic()
+    process.crawl(crawler)
+    process.start()
+    elapsed = time.monotonic() - start
+
+    scraped = crawler.stats.get_value('item_scraped_count', 0)
+    return {
+        'variant': variant,
+        'items': scraped,
+        'seconds': round(elapsed, 2),
+        'items_per_second': round(scraped / elapsed, 2),
+        'blocks': crawler.stats.get_value('downloader/response_status_count/429', 0),
+        'peak_total': crawler.stats.get_value('adaptive_concurrency/peak_total_concurrency',
+                                              settings['CONCURRENT_REQUESTS']),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--items', type=int, default=300)
+    parser.add_argument('--slots', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=5, help='Requests/segundo tolerados por slot')
+    parser.add_argument('--delay', type=float, default=1.0, help='DOWNLOAD_DELAY de partida')
+    parser.add_argument('--child', nargs=2, metavar=('VARIANT', 'BASE_URL'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        variant, base_url = args.child
+        print(json.dumps(run_crawl(variant, base_url, args.items, args.slots, args.delay)))
+        return
+
+    # El reactor de Twisted no se puede reiniciar: un proceso por crawl
+    server = RateLimitedServer(args.rate)
+    results = []
+    for variant in VARIANTS:
+        output = subprocess.check_output([
+            sys.executable, os.path.abspath(__file__),
+            '--items', str(args.items), '--slots', str(args.slots), '--delay', str(args.delay),
+            '--child', variant, server.base_url,
+        ])
+        results.append(json.loads(output.decode().strip().splitlines()[-1]))
+
+    print(f"{'Variante':<14} {'Items':>6} {'Segundos':>9} {'Items/s':>8} {'Bloqueos':>9} {'Límite global':>14}")
+    for r in results:
+        print(f"{r['variant']:<14} {r['items']:>6} {r['seconds']:>9} "
+              f"{r['items_per_second']:>8} {r['blocks']:>9} {r['peak_total']:>14}")
+
+
+if __name__ == "__main__":
+    main()
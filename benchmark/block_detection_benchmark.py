@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la detección de páginas de bloqueo sobre las fixtures sintéticas
+Compara el detector original (body.lower() + siete búsquedas en la página
+completa) con BlockDetector: tiempo de CPU por respuesta, falsos positivos en
+fichas legítimas (también películas tituladas como una firma, p. ej.
+"Blocked") y bloqueos no detectados
+"""
+
+import argparse
+import gzip
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixture_pages import load_fixture_bodies, make_response
+from imdb_scraper.block_detector import BlockDetector, brotli, zstd
+
+# Codificaciones que anuncia el spider (zstd si Scrapy tiene el módulo)
+ENCODINGS = {'gzip': gzip.compress}
+if brotli is not None:
+    ENCODINGS['br'] = brotli.compress
+if zstd is not None:
+    ENCODINGS['zstd'] = zstd.compress
+
+
+def legacy_is_blocked(response) -> bool:
+    """Réplica de ProxyRotationMiddleware._is_blocked_response original"""
+    blocked_status_codes = [403, 429, 503, 521, 522, 523, 524]
+
+    if response.status in blocked_status_codes:
+        return True
+
+    blocked_indicators = [
+        b'blocked',
+        b'access denied',
+        b'rate limit',
+        b'too many requests',
+        b'captcha',
+        b'cloudflare',
+        b'please verify',
+    ]
+
+    body_lower = response.body.lower()
+    for indicator in blocked_indicators:
+        if indicator in body_lower:
+            return True
+
+    return False
+
+
+def per_response_us(detect, responses, rounds: int) -> float:
+    start = time.process_time()
+    for _ in range(rounds):
+        for response in responses:
+            detect(response)
+    return (time.process_time() - start) / (rounds * len(responses)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rounds', type=int, default=200)
+    args = parser.parse_args()
+
+    detector = BlockDetector()
+    bodies = load_fixture_bodies()
+    # Ficha legítima de una película cuyo título coincide con firmas de bloqueo
+    modern = bodies['title_modern_html_tt0111161']
+    start = modern.index(b'<title>')
+    end = modern.index(b'</title>', start)
+    bodies['title_signature_named_film'] = (
+        modern[:start] + b'<title>Blocked: The Captcha (2021) - IMDb' + modern[end:]
+    )
+
+    # Las mismas páginas con el cuerpo aún comprimido, como las ve la señal response_downloaded
+    cases = []
+    for name, body in bodies.items():
+        expected = name.startswith('block_')
+        cases.append((name, expected, make_response(name, body)))
+        for encoding, compress in ENCODINGS.items():
+            cases.append((f"{name} ({encoding})", expected, make_response(
+                name, compress(body), headers={'Content-Encoding': encoding})))
+
+    detectors = {'original': legacy_is_blocked, 'BlockDetector': detector.is_blocked}
+
+    print(f"{'Fixture':<42} {'Esperado':>9} {'original':>9} {'BlockDetector':>14}")
+    for name, expected, response in cases:
+        row = [('bloqueo' if d(response) else 'ok') for d in detectors.values()]
+        print(f"{name:<42} {'bloqueo' if expected else 'ok':>9} {row[0]:>9} {row[1]:>14}")
+
+    print()
+    print(f"{'Detector':<14} {'µs/resp (ficha)':>16} {'µs/resp (todas)':>16} {'Falsos +':>9} {'Falsos -':>9}")
+    plain = [response for name, _, response in cases if not name.endswith(')')]
+    legit = [response for name, expected, response in cases if not expected and not name.endswith(')')]
+    for label, detect in detectors.items():
+        false_pos = sum(1 for _, expected, r in cases if not expected and detect(r))
+        false_neg = sum(1 for _, expected, r in cases if expected and not detect(r))
+        title_us = per_response_us(detect, legit, args.rounds)
+        all_us = per_response_us(detect, plain, args.rounds)
+        print(f"{label:<14} {title_us:>16.1f} {all_us:>16.1f} {false_pos:>9} {false_neg:>9}")
+
+
+if __name__ == "__main__":
+    main()
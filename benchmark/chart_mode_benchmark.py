@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Benchmark del modo 'chart' de TopMoviesSpider
+Genera una página /chart/top/ sintética con la forma de la real (ItemList
+JSON-LD en el <head> y `chartTitles` con 250 edges dentro de __NEXT_DATA__)
+y la pasa por TopMoviesSpider.parse_chart con distintos CHART_DETAIL_FIELDS.
+Compara requests por item con el modo 'detail' (una ficha por película),
+mide extract_chart por las dos vías y comprueba que coinciden en los campos
+comunes. Sale con código 1 si falta alguna película o hay discrepancias
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scrapy
+from scrapy.utils.test import get_crawler
+
+from fixture_pages import make_response
+from imdb_scraper.extraction_pool import extract_chart
+from imdb_scraper.spiders.top_movies import TopMoviesSpider
+
+
+def chart_titles(count: int) -> list:
+    """Títulos sintéticos; los primeros con los IDs reales del top 50"""
+    ids = TopMoviesSpider.TOP_50_MOVIE_IDS + [f'tt{9000000 + i:07d}' for i in range(count)]
+    return [
+        {
+            'id': ids[i],
+            'title': f'Película {i + 1} & "secuela"',
+            'year': 1950 + i % 70,
+            'rating': round(9.3 - i * 0.005, 1),
+            'seconds': (90 + i % 90) * 60,
+            # El ranking real no siempre trae el metascore
+            'metascore': 60 + i % 40 if i % 3 else None,
+        }
+        for i in range(count)
+    ]
+
+
+def build_chart_page(titles: list, next_data: bool = True) -> bytes:
+    item_list = {
+        '@context': 'https://schema.org',
+        '@type': 'ItemList',
+        'itemListElement': [
+            {
+                '@type': 'ListItem',
+                'item': {
+                    '@type': 'Movie',
+                    'url': f"https://www.imdb.com/title/{title['id']}/",
+                    'name': title['title'],
+                    'aggregateRating': {'@type': 'AggregateRating', 'ratingValue': title['rating']},
+                    'duration': f"PT{title['seconds'] // 3600}H{title['seconds'] // 60 % 60}M",
+                },
+            }
+            for title in titles
+        ],
+    }
+    edges = [
+        {
+            'currentRank': rank,
+            'node': {
+                'id': title['id'],
+                'titleText': {'text': title['title']},
+                'originalTitleText': {'text': title['title']},
+                'releaseYear': {'year': title['year'], 'endYear': None},
+                'ratingsSummary': {'aggregateRating': title['rating'], 'voteCount': 1000000 - rank},
+                'runtime': {'seconds': title['seconds']},
+                'metacritic': {'metascore': {'score': title['metascore']}} if title['metascore'] else None,
+                # Relleno con el peso aproximado de cada nodo real (imágenes, trama, géneros)
+                'primaryImage': {'url': 'https://m.media-amazon.com/images/M/' + 'x' * 120 + '.jpg',
+                                 'width': 1200, 'height': 1800},
+                'plot': {'plotText': {'plainText': 'Lorem ipsum dolor sit amet. ' * 12}},
+                'titleGenres': {'genres': [{'genre': {'text': 'Drama'}}, {'genre': {'text': 'Crime'}}]},
+            },
+        }
+        for rank, title in enumerate(titles, 1)
+    ]
+    page = [
+        '<!DOCTYPE html><html lang="en-US"><head><meta charSet="utf-8"/>',
+        '<title>IMDb Top 250 Movies</title>',
+        f'<script type="application/ld+json">{json.dumps(item_list)}</script>',
+        '</head><body><main>' + '<div class="ipc-metadata-list-summary-item"></div>' * len(titles) + '</main>',
+    ]
+    if next_data:
+        next_payload = {'props': {'pageProps': {'pageData': {'chartTitles': {'edges': edges}}}}}
+        page.append(f'<script id="__NEXT_DATA__" type="application/json">{json.dumps(next_payload)}</script>')
+    page.append('</body></html>')
+    return ''.join(page).encode()
+
+
+def run_parse_chart(body: bytes, detail_fields: list) -> tuple:
+    """(items, requests de fichas) que produce parse_chart"""
+    crawler = get_crawler(TopMoviesSpider, {
+        'CHART_DETAIL_FIELDS': detail_fields,
+        'EXTRACTION_CACHE_ENABLED': False,
+    })
+    spider = TopMoviesSpider.from_crawler(crawler)
+    crawler.spider = spider
+
+    items, requests = [], []
+    for output in spider.parse_chart(make_response('chart_top', body)):
+        (requests if isinstance(output, scrapy.Request) else items).append(output)
+    return items, requests
+
+
+def median_ms(func, rounds: int) -> float:
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--titles', type=int, default=250)
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    titles = chart_titles(args.titles)
+    with_next_data = build_chart_page(titles)
+    json_ld_only = build_chart_page(titles, next_data=False)
+    failures = []
+
+    print(f"Página sintética: {len(with_next_data) // 1024} KB con __NEXT_DATA__, "
+          f"{len(json_ld_only) // 1024} KB solo JSON-LD")
+    for label, body in (('__NEXT_DATA__', with_next_data), ('JSON-LD', json_ld_only)):
+        elapsed = median_ms(lambda: extract_chart(make_response('chart_top', body)), args.rounds)
+        print(f"  extract_chart ({label}): {elapsed:.2f} ms")
+
+    next_entries = extract_chart(make_response('chart_top', with_next_data))
+    ld_entries = extract_chart(make_response('chart_top', json_ld_only))
+    if len(next_entries) != len(titles) or len(ld_entries) != len(titles):
+        failures.append(f"entradas: {len(next_entries)} / {len(ld_entries)} de {len(titles)}")
+    for a, b in zip(next_entries, ld_entries):
+        for field in ('imdb_id', 'ranking', 'titulo', 'calificacion', 'duracion'):
+            if a[field] != b[field]:
+                failures.append(f"{a['imdb_id']}.{field}: {a[field]!r} != {b[field]!r}")
+
+    print(f"\n{'Modo':<34} {'Requests':>9} {'Items':>6} {'Items/request':>14}")
+    detail_count = len(TopMoviesSpider.TOP_50_MOVIE_IDS)
+    print(f"{'detail (TOP_50_MOVIE_IDS)':<34} {detail_count:>9} {detail_count:>6} {1.0:>14.1f}")
+    for fields in ([], ['metascore'], ['actores']):
+        items, requests = run_parse_chart(with_next_data, fields)
+        total = 1 + len(requests)
+        produced = len(items) + len(requests)
+        if produced != len(titles):
+            failures.append(f"chart {fields}: {produced} películas de {len(titles)}")
+        label = f"chart CHART_DETAIL_FIELDS={fields}"
+        print(f"{label:<34} {total:>9} {produced:>6} {produced / total:>14.1f}")
+
+    if failures:
+        print("\nFallos:")
+        for failure in failures[:20]:
+            print(f"  ✗ {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark de las estrategias CSS con selectores precompilados
+Compara, sobre las fichas sintéticas de benchmark/fixtures, los selectores
+evaluados con response.css en cada llamada (traducción CSS -> XPath y
+objetos Selector por página) frente a los XPath compilados al importar.
+El DOM se construye antes de medir: solo cuenta la extracción
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixture_pages import load_fixture_bodies, make_response
+from imdb_scraper.selector_factory import LegacyIMDbSelector, ModernIMDbSelector, SelectorFactory
+
+
+class PerCallCssMixin:
+    """Misma tabla SELECTORS, evaluada con response.css en cada llamada"""
+
+    def _first(self, response, field):
+        for query in self.SELECTORS[field]:
+            value = response.css(query).get()
+            if value:
+                return value
+        return None
+
+    def _all(self, response, field):
+        for query in self.SELECTORS[field]:
+            values = response.css(query).getall()
+            if values:
+                return values
+        return []
+
+    def _re_first(self, response, field, pattern):
+        for query in self.SELECTORS[field]:
+            value = response.css(query).re_first(pattern)
+            if value:
+                return value
+        return None
+
+
+class PerCallModernSelector(PerCallCssMixin, ModernIMDbSelector):
+    pass
+
+
+class PerCallLegacySelector(PerCallCssMixin, LegacyIMDbSelector):
+    pass
+
+
+PER_CALL = {
+    ModernIMDbSelector: PerCallModernSelector,
+    LegacyIMDbSelector: PerCallLegacySelector,
+}
+
+FIELDS = ('extract_title', 'extract_year', 'extract_rating',
+          'extract_duration', 'extract_metascore', 'extract_actors')
+
+
+def extract(selector, response):
+    return [getattr(selector, field)(response) for field in FIELDS]
+
+
+def time_page(selector, name: str, body: bytes, rounds: int):
+    timings = []
+    data = None
+    for _ in range(rounds):
+        response = make_response(name, body)
+        response.selector.root  # DOM construido fuera de la medida
+        start = time.perf_counter()
+        data = extract(selector, response)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rounds', type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'Fixture':<28} {'Estrategia':<20} {'response.css (ms)':>18} {'Compilado (ms)':>15} {'Iguales':>8}")
+    totals = [0.0, 0.0]
+    for name, body in load_fixture_bodies('title_').items():
+        strategy = type(SelectorFactory.create_css_selector(make_response(name, body)))
+        per_call_ms, per_call_data = time_page(PER_CALL[strategy](), name, body, args.rounds)
+        compiled_ms, compiled_data = time_page(strategy(), name, body, args.rounds)
+        totals[0] += per_call_ms
+        totals[1] += compiled_ms
+        same = 'sí' if per_call_data == compiled_data else 'no'
+        print(f"{name:<28} {strategy.__name__:<20} {per_call_ms:>18.3f} {compiled_ms:>15.3f} {same:>8}")
+
+    print(f"{'Total':<49} {totals[0]:>18.3f} {totals[1]:>15.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Benchmark del re-crawl condicional (ConditionalRequestMiddleware)
+Un servidor local sirve las fichas sintéticas en gzip con ETag y
+Last-Modified y responde 304 a If-None-Match / If-Modified-Since. Se hacen
+tres crawls con el mismo almacén de validadores:
+1. Primera ejecución: todo 200, se guardan los validadores
+2. Refresco con 1 de cada `--changed-every` fichas modificada: el resto da 304
+3. Igual (con una copia del almacén tras el crawl 1), pero el servidor ignora
+   los validadores y siempre da 200: las fichas sin cambios se descartan por
+   el hash del contenido
+Para cada crawl muestra items, extracciones, KB de red y segundos. Sale con
+código 1 si los refrescos no producen exactamente las fichas modificadas
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixture_pages import load_fixture_bodies
+
+LAST_MODIFIED = 'Sat, 17 Oct 2026 08:00:00 GMT'
+
+
+class ValidatingFixtureServer:
+    """
+    Sirve /title/tt<n>/ con las fichas sintéticas; /<gen>/<validate>/title/...
+    elige la generación (1: original, 2: fichas modificadas) y si se honran
+    los validadores
+    """
+
+    def __init__(self, changed_every: int):
+        pages = list(load_fixture_bodies('title_').values())
+
+        def body_for(number: int, generation: int) -> bytes:
+            body = pages[number % len(pages)]
+            if generation > 1 and number % changed_every == 0:
+                # Cambio dentro del <head>: parte normalizada del cuerpo
+                body = body.replace(b'</title>', b' </title>', 1)
+            return body
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                _, generation, validate, _, title_id, _ = self.path.split('/')
+                number = int(title_id[2:])
+                body = body_for(number, int(generation))
+                etag = '"%s"' % hashlib.sha1(body).hexdigest()[:16]
+                modified = LAST_MODIFIED if body is pages[number % len(pages)] else \
+                    'Sun, 18 Oct 2026 08:00:00 GMT'
+
+                if validate == '1' and self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+
+                payload = gzip.compress(body, compresslevel=1)
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Encoding', 'gzip')
+                self.send_header('Content-Length', str(len(payload)))
+                if validate == '1':
+                    self.send_header('ETag', etag)
+                    self.send_header('Last-Modified', modified)
+                self.end_headers()
+                try:
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def run_crawl(base_url: str, store_path: str, items: int) -> dict:
+    """Ejecutar un crawl contra el servidor (en un proceso hijo)"""
+    import scrapy
+    from scrapy import signals
+    from scrapy.crawler import CrawlerProcess
+
+    from imdb_scraper.spiders.top_movies import TopMoviesSpider
+
+    class FixtureTopMoviesSpider(TopMoviesSpider):
+        name = 'top_movies_fixture'
+        allowed_domains = []
+
+        def start_requests(self):
+            for i in range(items):
+                title_id = f'tt{i:07d}'
+                yield scrapy.Request(
+                    f"{base_url}/title/{title_id}/", callback=self.parse_detail, dont_filter=True,
+                    meta={'rank': i, 'title_id': title_id, 'early_abort': True, 'conditional': True},
+                )
+
+    scraped = []
+
+    def item_scraped(item, response, spider):
+        scraped.append(item['ranking'])
+
+    settings = {
+        'LOG_LEVEL': os.environ.get('BENCH_LOG_LEVEL', 'ERROR'),
+        'TELNETCONSOLE_ENABLED': False,
+        'CONCURRENT_REQUESTS': 8,
+        'DOWNLOADER_MIDDLEWARES': {'imdb_scraper.middlewares.ConditionalRequestMiddleware': 340},
+        'EXTENSIONS': {'imdb_scraper.extensions.EarlyAbortDownload': 510},
+        'EARLY_ABORT_ENABLED': True,
+        'CONDITIONAL_REQUESTS_ENABLED': True,
+        'CONDITIONAL_REQUESTS_PATH': store_path,
+    }
+    process = CrawlerProcess(settings=settings)
+    crawler = process.create_crawler(FixtureTopMoviesSpider)
+    crawler.signals.connect(item_scraped, signal=signals.item_scraped)
+    start = time.monotonic()
+    process.crawl(crawler)
+    process.start()
+    elapsed = time.monotonic() - start
+
+    stats = crawler.stats.get_stats()
+    return {
+        'items': sorted(scraped),
+        'extractions': sum(v for k, v in stats.items() if k.startswith('selector/layout/')),
+        'wire_kb': round(stats.get('downloader/response_bytes', 0) / 1024, 1),
+        'not_modified': stats.get('conditional/not_modified', 0),
+        'unchanged': stats.get('conditional/unchanged', 0),
+        'seconds': round(elapsed, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--items', type=int, default=40)
+    parser.add_argument('--changed-every', type=int, default=10, help='Cambia 1 de cada N fichas')
+    parser.add_argument('--child', nargs=2, metavar=('BASE_URL', 'STORE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        base_url, store_path = args.child
+        print(json.dumps(run_crawl(base_url, store_path, args.items)))
+        return
+
+    server = ValidatingFixtureServer(args.changed_every)
+    expected = [i for i in range(args.items) if i % args.changed_every == 0]
+    failures = []
+
+    print(f"{'Crawl':<34} {'Items':>6} {'Extracc.':>9} {'304':>5} {'Hash =':>7} {'KB red':>8} {'s':>6}")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = os.path.join(tmp, 'validadores.db')
+        copy = os.path.join(tmp, 'validadores_copia.db')
+        runs = (
+            ('1. Primera ejecución', '1/1', store, None),
+            ('2. Refresco (ETag/Last-Modified)', '2/1', store, expected),
+            ('3. Refresco (solo hash)', '2/0', copy, expected),
+        )
+        # El reactor de Twisted no se puede reiniciar: un proceso por crawl
+        for label, path, store_path, expected_items in runs:
+            output = subprocess.check_output([
+                sys.executable, os.path.abspath(__file__), '--items', str(args.items),
+                '--child', f"{server.base_url}/{path}", store_path,
+            ])
+            if not os.path.exists(copy):
+                shutil.copy(store, copy)
+            r = json.loads(output.decode().strip().splitlines()[-1])
+            print(f"{label:<34} {len(r['items']):>6} {r['extractions']:>9} {r['not_modified']:>5} "
+                  f"{r['unchanged']:>7} {r['wire_kb']:>8} {r['seconds']:>6}")
+            if expected_items is None and len(r['items']) != args.items:
+                failures.append(f"{label}: {len(r['items'])} items de {args.items}")
+            if expected_items is not None and r['items'] != expected_items:
+                failures.append(f"{label}: items {r['items']} en lugar de {expected_items}")
+
+    if failures:
+        print("\nFallos:")
+        for failure in failures:
+            print(f"  ✗ {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
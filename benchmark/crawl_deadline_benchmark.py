@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Benchmark del plazo fijo del crawl (CRAWL_DEADLINE_SECONDS)
+Un servidor local tarda `--latency` segundos por ficha y responde 503 a las
+dos primeras peticiones de 1 de cada `--fail-every` fichas (reintentos con
+backoff de NetworkResilienceMiddleware). Se comparan:
+1. Modo 'detail' sin plazo: cuánto dura realmente el crawl
+2. Modo 'detail' con plazo `--budget`: debe terminar dentro del plazo y con
+   los títulos de mejor ranking hechos
+3. Modo 'chart' con CHART_DETAIL_FIELDS=['metascore'] y el mismo plazo: las
+   fichas opcionales que no caben se saltan, pero salen los 250 items
+Para cada crawl muestra segundos, items, cobertura del top (de los N mejores
+rankings, cuántos hay, con N = items del crawl) y lo descartado. Los huecos
+del top solo pueden ser fichas con 503 cuyo backoff no cabe en el plazo:
+las que se descartan sin haber fallado tienen que ser las de peor ranking.
+Sale con código 1 si algún crawl con plazo se pasa, deja huecos de fichas
+sin fallos o pierde items del ranking
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chart_mode_benchmark import build_chart_page, chart_titles
+from fixture_server import DEFAULT_TITLE_PAGE
+
+
+class SlowFixtureServer:
+    """Fichas lentas y con fallos transitorios; /chart/top/ con el ranking sintético"""
+
+    def __init__(self, latency: float, fail_every: int):
+        chart_page = build_chart_page(chart_titles(250))
+        attempts = Counter()
+        lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith('/chart/'):
+                    body, status = chart_page, 200
+                else:
+                    time.sleep(latency)
+                    number = int(self.path.split('/')[2][2:])
+                    with lock:
+                        attempts[self.path] += 1
+                        failing = number % fail_every == 0 and attempts[self.path] <= 2
+                    body, status = (b'Service Unavailable', 503) if failing else (DEFAULT_TITLE_PAGE, 200)
+
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def run_crawl(base_url: str, mode: str, titles: int, budget: float, reserve: float) -> dict:
+    """Ejecutar un crawl contra el servidor (en un proceso hijo)"""
+    from scrapy import signals
+    from scrapy.crawler import CrawlerProcess
+
+    from imdb_scraper.spiders.top_movies import TopMoviesSpider
+
+    class FixtureTopMoviesSpider(TopMoviesSpider):
+        name = 'top_movies_fixture'
+        allowed_domains = []
+        CHART_URL = f"{base_url}/chart/top/"
+
+        def title_ids(self):
+            self.title_source = None
+            return ((i, f'tt{i:07d}') for i in range(1, titles + 1))
+
+        def detail_request(self, movie_id, rank, **meta):
+            request = super().detail_request(movie_id, rank, **meta)
+            return request.replace(url=f"{base_url}/title/{movie_id}/")
+
+    scraped = []
+
+    def item_scraped(item, response, spider):
+        scraped.append(item['ranking'])
+
+    settings = {
+        'LOG_LEVEL': os.environ.get('BENCH_LOG_LEVEL', 'ERROR'),
+        'TELNETCONSOLE_ENABLED': False,
+        'CONCURRENT_REQUESTS': 4,
+        'CONCURRENT_REQUESTS_PER_DOMAIN': 4,
+        'DOWNLOADER_MIDDLEWARES': {
+            'imdb_scraper.middlewares.CrawlDeadlineMiddleware': 330,
+            'imdb_scraper.middlewares.NetworkResilienceMiddleware': 345,
+            'scrapy.downloadermiddlewares.retry.RetryMiddleware': None,
+        },
+        'EXTRACTION_CACHE_ENABLED': False,
+        'CONDITIONAL_REQUESTS_ENABLED': False,
+        'RETRY_TIMES': 3,
+        'BACKOFF_FACTOR': 2.0,
+        'TOP_MOVIES_MODE': mode,
+        'CHART_DETAIL_FIELDS': ['metascore'] if mode == 'chart' else [],
+        'CRAWL_DEADLINE_SECONDS': budget,
+        'CRAWL_DEADLINE_RESERVE_SECONDS': reserve,
+        'CRAWL_DEADLINE_WINDOW_SECONDS': 5,
+    }
+    process = CrawlerProcess(settings=settings)
+    crawler = process.create_crawler(FixtureTopMoviesSpider)
+    crawler.signals.connect(item_scraped, signal=signals.item_scraped)
+    start = time.monotonic()
+    process.crawl(crawler)
+    process.start()
+    elapsed = time.monotonic() - start
+
+    stats = crawler.stats.get_stats()
+    return {
+        'items': sorted(scraped),
+        'seconds': round(elapsed, 2),
+        'reason': stats.get('finish_reason'),
+        'retries': stats.get('retry_scheduler/scheduled', 0),
+        'skipped': {key.rsplit('/', 1)[1]: value for key, value in stats.items()
+                    if key.startswith('deadline/skipped/')},
+        'start_stopped_at': stats.get('deadline/start_stopped_at'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--titles', type=int, default=120)
+    parser.add_argument('--latency', type=float, default=0.25, help='Segundos por ficha')
+    parser.add_argument('--fail-every', type=int, default=8, help='1 de cada N fichas da 503 dos veces')
+    parser.add_argument('--budget', type=float, default=8.0, help='Plazo del crawl en segundos')
+    parser.add_argument('--reserve', type=float, default=0.5)
+    parser.add_argument('--child', nargs=3, metavar=('BASE_URL', 'MODE', 'BUDGET'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        base_url, mode, budget = args.child
+        print(json.dumps(run_crawl(base_url, mode, args.titles, float(budget), args.reserve)))
+        return
+
+    runs = (
+        ('1. detail sin plazo', 'detail', 0),
+        (f'2. detail, plazo {args.budget:g}s', 'detail', args.budget),
+        (f'3. chart + metascore, plazo {args.budget:g}s', 'chart', args.budget),
+    )
+    failures = []
+
+    print(f"{args.titles} fichas, {args.latency}s por ficha, 1 de cada {args.fail_every} con 503 x2\n")
+    print(f"{'Crawl':<32} {'s':>6} {'Items':>6} {'Top N':>7} {'Reint.':>7}  Descartado")
+    # El reactor de Twisted no se puede reiniciar: un proceso por crawl
+    for label, mode, budget in runs:
+        # Servidor nuevo por crawl: los fallos transitorios vuelven a empezar
+        server = SlowFixtureServer(args.latency, args.fail_every)
+        output = subprocess.check_output([
+            sys.executable, os.path.abspath(__file__), '--titles', str(args.titles),
+            '--reserve', str(args.reserve), '--child', server.base_url, mode, str(budget),
+        ])
+        r = json.loads(output.decode().strip().splitlines()[-1])
+        items = r['items']
+        top = len(set(items) & set(range(1, len(items) + 1)))
+        gaps = sorted(set(range(1, len(items) + 1)) - set(items))
+        skipped = ', '.join(f"{kind}: {count}" for kind, count in sorted(r['skipped'].items())) or '-'
+        if r['start_stopped_at'] is not None:
+            skipped += f"; fuente detenida en {r['start_stopped_at']}"
+        print(f"{label:<32} {r['seconds']:>6} {len(items):>6} {top:>3}/{len(items):<3} {r['retries']:>7}  {skipped}")
+        if gaps:
+            print(f"{'':<32} huecos del top: {gaps}")
+
+        if budget and r['seconds'] > budget:
+            failures.append(f"{label}: {r['seconds']}s con un plazo de {budget:g}s ({r['reason']})")
+        # Sin prioridad por ranking se descartan fichas sanas por delante de otras peores
+        skipped_ahead = [rank for rank in gaps if rank % args.fail_every]
+        if skipped_ahead:
+            failures.append(f"{label}: fichas sin fallos descartadas por delante del top: {skipped_ahead}")
+        if mode == 'chart' and len(items) != 250:
+            failures.append(f"{label}: {len(items)} items del ranking de 250")
+
+    if failures:
+        print("\nFallos:")
+        for failure in failures:
+            print(f"  ✗ {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Benchmark de RandomDelayMiddleware contra un servidor local de fixtures
+Compara el delay bloqueante original (time.sleep) con la versión asíncrona
+por slot, sola (DOWNLOAD_DELAY = 0, como en settings.py) y apilada sobre un
+DOWNLOAD_DELAY igual a la media del jitter. Mide items/segundo en régimen
+estable (del primer al último item, sin el arranque del proceso) con
+distintos valores de CONCURRENT_REQUESTS; con varios slots, la versión
+asíncrona tiene que escalar con la concurrencia
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixture_server import FixtureServer
+
+
+class BlockingRandomDelayMiddleware:
+    """Réplica del middleware original: duerme el reactor antes de cada request"""
+
+    def __init__(self, min_delay, max_delay):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(
+            crawler.settings.getfloat('RANDOM_DELAY_MIN'),
+            crawler.settings.getfloat('RANDOM_DELAY_MAX'),
+        )
+
+    def process_request(self, request, spider):
+        time.sleep(random.uniform(self.min_delay, self.max_delay))
+        return None
+
+
+JITTER = (0.1, 0.3)
+
+# Middleware y DOWNLOAD_DELAY de cada variante
+VARIANTS = {
+    'blocking': ('delay_benchmark.BlockingRandomDelayMiddleware', 0),
+    'async': ('imdb_scraper.middlewares.RandomDelayMiddleware', 0),
+    'apilado': ('imdb_scraper.middlewares.RandomDelayMiddleware', sum(JITTER) / 2),
+}
+
+
+def run_crawl(variant: str, concurrency: int, base_url: str, requests_count: int, slots: int) -> dict:
+    """Ejecutar un crawl contra el servidor de fixtures (en un proceso hijo)"""
+    import scrapy
+    from scrapy import signals
+    from scrapy.crawler import CrawlerProcess
+
+    class FixtureSpider(scrapy.Spider):
+        name = 'delay_fixture'
+
+        async def start(self):
+            for request in self.start_requests():
+                yield request
+
+        def start_requests(self):
+            for i in range(requests_count):
+                yield scrapy.Request(
+                    f"{base_url}/title/tt{i:07d}/",
+                    callback=self.parse,
+                    # Un slot por "proxy" simulado, como hace ProxyRotationMiddleware
+                    meta={'download_slot': f"proxy-{i % slots}"},
+                    dont_filter=True,
+                )
+
+        def parse(self, response):
+            yield {'titulo': response.css('h1 span::text').get()}
+
+    middleware, download_delay = VARIANTS[variant]
+    process = CrawlerProcess(settings={
+        'LOG_LEVEL': 'ERROR',
+        'CONCURRENT_REQUESTS': concurrency,
+        'CONCURRENT_REQUESTS_PER_DOMAIN': concurrency,
+        'DOWNLOAD_DELAY': download_delay,
+        'AUTOTHROTTLE_ENABLED': False,
+        'TELNETCONSOLE_ENABLED': False,
+        'RANDOM_DELAY_MIN': JITTER[0],
+        'RANDOM_DELAY_MAX': JITTER[1],
+        'DOWNLOADER_MIDDLEWARES': {middleware: 450},
+    })
+    crawler = process.create_crawler(FixtureSpider)
+    scraped_at = []
+
+    def item_scraped(item, response, spider):
+        scraped_at.append(time.monotonic())
+
+    crawler.signals.connect(item_scraped, signal=signals.item_scraped)
+
+    process.crawl(crawler)
+    process.start()
+
+    # Régimen estable: del primer al último item, sin arranque ni parada del proceso
+    items = len(scraped_at)
+    elapsed = scraped_at[-1] - scraped_at[0] if items > 1 else 0
+    return {
+        'variant': variant,
+        'concurrency': concurrency,
+        'items': items,
+        'seconds': round(elapsed, 2),
+        'items_per_second': round((items - 1) / elapsed, 2) if elapsed > 0 else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=160)
+    parser.add_argument('--slots', type=int, default=4, help='Número de proxies simulados')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--child', nargs=3, metavar=('VARIANT', 'CONCURRENCY', 'BASE_URL'),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        variant, concurrency, base_url = args.child
+        result = run_crawl(variant, int(concurrency), base_url, args.requests, args.slots)
+        print(json.dumps(result))
+        return
+
+    results = []
+    with FixtureServer() as server:
+        for variant in VARIANTS:
+            for concurrency in args.concurrency:
+                # El reactor de Twisted no es reiniciable: un proceso por crawl
+                output = subprocess.run(
+                    [sys.executable, __file__, '--requests', str(args.requests),
+                     '--slots', str(args.slots), '--child', variant, str(concurrency), server.base_url],
+                    capture_output=True, text=True, check=True,
+                )
+                results.append(json.loads(output.stdout.strip().splitlines()[-1]))
+
+    print(f"{'Variante':<10} {'Concurrencia':>12} {'Items':>6} {'Tiempo (s)':>11} {'Items/s':>8}")
+    for r in results:
+        print(f"{r['variant']:<10} {r['concurrency']:>12} {r['items']:>6} "
+              f"{r['seconds']:>11} {r['items_per_second']:>8}")
+    # Cada slot saca un request por jitter medio: el techo es slots / jitter medio
+    print(f"Techo con {args.slots} slots solapados: {args.slots / (sum(JITTER) / 2):.1f} items/s; "
+          f"con un solo slot: {1 / (sum(JITTER) / 2):.1f} items/s")
+
+
+if __name__ == "__main__":
+    main()
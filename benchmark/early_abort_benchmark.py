@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Benchmark del corte anticipado de descargas (EarlyAbortDownload)
+Un servidor local sirve las fichas sintéticas comprimidas con gzip y con el
+ancho de banda limitado (como un proxy residencial). Compara la descarga
+completa con el corte anticipado midiendo bytes de red por item, segundos
+por item y si los items extraídos coinciden
+"""
+
+import argparse
+import gzip
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixture_pages import load_fixture_bodies
+
+CHUNK_BYTES = 8192
+
+
+class ThrottledFixtureServer:
+    """Sirve /title/<n>/ alternando las fichas sintéticas, en gzip y a `bytes_per_sec`"""
+
+    def __init__(self, bytes_per_sec: int):
+        pages = [gzip.compress(body) for body in load_fixture_bodies('title_').values()]
+        delay = CHUNK_BYTES / bytes_per_sec
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                number = int(''.join(ch for ch in self.path if ch.isdigit()) or 0)
+                body = pages[number % len(pages)]
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Encoding', 'gzip')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                try:
+                    for start in range(0, len(body), CHUNK_BYTES):
+                        self.wfile.write(body[start:start + CHUNK_BYTES])
+                        self.wfile.flush()
+                        time.sleep(delay)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def run_crawl(early_abort: bool, base_url: str, items: int, concurrency: int) -> dict:
+    """Ejecutar un crawl contra el servidor (en un proceso hijo)"""
+    import scrapy
+    from scrapy import signals
+    from scrapy.crawler import CrawlerProcess
+
+    from imdb_scraper.spiders.top_movies import TopMoviesSpider
+
+    class FixtureTopMoviesSpider(TopMoviesSpider):
+        name = 'top_movies_fixture'
+        allowed_domains = []
+
+        async def start(self):
+            for request in self.start_requests():
+                yield request
+
+        def start_requests(self):
+            for i in range(items):
+                yield scrapy.Request(f"{base_url}/title/tt{i:07d}/", callback=self.parse_detail,
+                                     meta={'rank': i, 'early_abort': True}, dont_filter=True)
+
+    scraped = {}
+
+    def item_scraped(item, response, spider):
+        scraped[item['ranking']] = dict(item)
+
+    settings = {
+        'LOG_LEVEL': os.environ.get('BENCH_LOG_LEVEL', 'ERROR'),
+        'TELNETCONSOLE_ENABLED': False,
+        'CONCURRENT_REQUESTS': concurrency,
+        'CONCURRENT_REQUESTS_PER_DOMAIN': concurrency,
+        'EXTENSIONS': {'imdb_scraper.extensions.EarlyAbortDownload': 510},
+        'EARLY_ABORT_ENABLED': early_abort,
+    }
+    process = CrawlerProcess(settings=settings)
+    crawler = process.create_crawler(FixtureTopMoviesSpider)
+    crawler.signals.connect(item_scraped, signal=signals.item_scraped)
+    start = time.monotonic()
+    process.crawl(crawler)
+    process.start()
+    elapsed = time.monotonic() - start
+
+    stats = crawler.stats
+    count = len(scraped) or 1
+    return {
+        'early_abort': early_abort,
+        'items': len(scraped),
+        'seconds_per_item': round(elapsed * concurrency / count, 3),
+        'wire_kb_per_item': round(stats.get_value('downloader/response_bytes', 0) / 1024 / count, 1),
+        'stopped': stats.get_value('early_abort/stopped', 0),
+        'scraped': {str(rank): item for rank, item in scraped.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--items', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--bandwidth', type=int, default=500_000, help='Bytes/segundo por conexión')
+    parser.add_argument('--child', nargs=2, metavar=('EARLY_ABORT', 'BASE_URL'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        early_abort, base_url = args.child
+        print(json.dumps(run_crawl(early_abort == '1', base_url, args.items, args.concurrency)))
+        return
+
+    server = ThrottledFixtureServer(args.bandwidth)
+    results = []
+    # El reactor de Twisted no se puede reiniciar: un proceso por crawl
+    for early_abort in ('0', '1'):
+        output = subprocess.check_output([
+            sys.executable, os.path.abspath(__file__), '--items', str(args.items),
+            '--concurrency', str(args.concurrency), '--child', early_abort, server.base_url,
+        ])
+        results.append(json.loads(output.decode().strip().splitlines()[-1]))
+
+    print(f"{'Variante':<18} {'Items':>6} {'KB red/item':>12} {'s/item':>8} {'Cortadas':>9}")
+    for r, label in zip(results, ('Descarga completa', 'Corte anticipado')):
+        print(f"{label:<18} {r['items']:>6} {r['wire_kb_per_item']:>12} "
+              f"{r['seconds_per_item']:>8} {r['stopped']:>9}")
+    print(f"Mismos items: {'sí' if results[0]['scraped'] == results[1]['scraped'] else 'no'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark de imdb_scraper.extraction_cache sobre las fichas de benchmark/fixtures
+Por ficha compara extract_movie (parseo completo) con el acierto de la caché
+(body_key + consulta SQLite) y comprueba que la clave:
+- es la misma para prefijos distintos de la descarga (cortes de EarlyAbortDownload)
+- ignora los nonce de CSP y cambia si cambia un dato del item
+Con __NEXT_DATA__ o JSON-LD la extracción cuesta menos que la clave: el
+spider no consulta la caché para esas maquetaciones (ExtractionCache.applies).
+Al final verifica la cota de entradas y el desalojo LRU. Sale con código 1 si
+algún acierto no devuelve lo mismo que la extracción o alguna comprobación falla
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixture_pages import load_fixture_bodies, make_response
+from imdb_scraper.extraction_cache import ExtractionCache, body_key
+from imdb_scraper.extraction_pool import extract_movie
+from imdb_scraper.selector_factory import has_required_data
+
+
+def median_us(func, rounds: int) -> float:
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1e6)
+    return statistics.median(timings)
+
+
+def shortest_prefix(body: bytes, step: int = 16384) -> int:
+    """Primer corte (en múltiplos de `step`) en el que EarlyAbortDownload pararía"""
+    for end in range(step, len(body), step):
+        if has_required_data(body[:end]):
+            return end
+    return len(body)
+
+
+def check_keys(name: str, body: bytes, expected: dict) -> list:
+    """Problemas de estabilidad/sensibilidad de la clave en una ficha"""
+    problems = []
+    full = body_key(body)
+
+    cut = shortest_prefix(body)
+    for end in sorted({cut, min(len(body), cut + 50_000), len(body)}):
+        if body_key(body[:end]) != full:
+            problems.append(f"clave distinta con el prefijo de {end} bytes")
+
+    with_nonce = body.replace(b'<script', b'<script nonce="a1b2c3"', 1)
+    other_nonce = body.replace(b'<script', b'<script nonce="z9y8x7"', 1)
+    if with_nonce != body and body_key(with_nonce) != body_key(other_nonce):
+        problems.append("la clave depende del nonce")
+
+    title = (expected.get('titulo') or '').encode()
+    if title and title in body[:len(body)]:
+        changed = body.replace(title, title + b' (Remastered)')
+        if body_key(changed) == full:
+            problems.append("la clave no cambia al cambiar el título")
+    return problems
+
+
+def check_lru(path: str, max_entries: int) -> list:
+    cache = ExtractionCache(path, max_entries=max_entries)
+    for i in range(max_entries):
+        cache.put(f'k{i}', {'titulo': str(i)})
+    # Uso reciente de la primera entrada: debe sobrevivir al desalojo
+    time.sleep(0.01)
+    cache.get('k0')
+    for i in range(max_entries, max_entries + max_entries // 2):
+        cache.put(f'k{i}', {'titulo': str(i)})
+
+    problems = []
+    if cache.entries > max_entries:
+        problems.append(f"{cache.entries} entradas con max_entries={max_entries}")
+    if cache.get('k0') is None:
+        problems.append("se desalojó la entrada usada más recientemente")
+    if cache.get('k1') is not None:
+        problems.append("no se desalojó la entrada usada hace más tiempo")
+    cache.close()
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rounds', type=int, default=30)
+    parser.add_argument('--backend', default='parsel')
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ExtractionCache(os.path.join(tmp, 'extracciones.db'))
+
+        print(f"{'Ficha':<32} {'Layout':<10} {'Extracción (µs)':>16} {'Clave (µs)':>11} "
+              f"{'Acierto (µs)':>13} {'Speedup':>8}")
+        for name, body in load_fixture_bodies('title_').items():
+            data = extract_movie(make_response(name, body), backend=args.backend)
+            key = cache.key(body)
+            cache.put(key, data)
+
+            extract = median_us(lambda: extract_movie(make_response(name, body), backend=args.backend), args.rounds)
+            hashing = median_us(lambda: cache.key(body), args.rounds)
+            hit = median_us(lambda: cache.get(cache.key(body)), args.rounds)
+
+            if cache.get(key) != data:
+                failures.append(f"{name}: el acierto no coincide con la extracción")
+            failures.extend(f"{name}: {problem}" for problem in check_keys(name, body, data))
+
+            print(f"{name:<32} {data['layout']:<10} {extract:>16.0f} {hashing:>11.0f} "
+                  f"{hit:>13.0f} {extract / hit:>7.1f}x")
+        cache.close()
+
+        failures.extend(f"LRU: {problem}" for problem in check_lru(os.path.join(tmp, 'lru.db'), 200))
+
+    if failures:
+        print("\nFallos:")
+        for failure in failures:
+            print(f"  ✗ {failure}")
+    else:
+        print("\n✓ Claves estables por prefijo y nonce, sensibles al contenido; LRU acotada")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Banco de pruebas offline de la extracción (imdb_scraper.selector_factory)
+Sobre las fichas sintéticas de benchmark/fixtures mide, por página:
+- SelectorFactory: detección completa (probe_layout) y elección con la caché por huella
+- Construcción del DOM (solo la necesitan las estrategias CSS y los respaldos)
+- Cada método de la estrategia de la página, por campo, con el DOM ya construido
+  y un selector nuevo (incluye la decodificación perezosa que dispare ese campo)
+- DataExtractor.extract_all_data de principio a fin, con una respuesta nueva
+Informa mediana y p95 en µs y el pico de memoria residente de
+extract_all_data (RSS en un proceso nuevo, con el árbol de lxml incluido; ver
+peak_memory). Compara la salida con fixtures/expected_items.json y sale con
+código 1 si alguna ficha no coincide. No usa la red
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixture_pages import FIXTURES_NOTE, load_expected_items, load_fixture_bodies, make_response
+from peak_memory import CHILD_FLAG, peak_rss_kb, run_child, warm_up
+from imdb_scraper.selector_factory import (
+    LAYOUT_BUILDERS, DataExtractor, LayoutDetector, LxmlResponse, SelectorFactory,
+)
+
+FIELDS = ('title', 'year', 'rating', 'duration', 'metascore', 'actors')
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def timed(func, setup, rounds: int) -> dict:
+    """Mediana y p95 en µs de func(setup()), sin contar setup"""
+    timings = []
+    for _ in range(rounds):
+        arg = setup()
+        start = time.perf_counter()
+        func(arg)
+        timings.append((time.perf_counter() - start) * 1e6)
+    return {'median_us': round(statistics.median(timings), 1), 'p95_us': round(percentile(timings, 0.95), 1)}
+
+
+def memory(name: str, body: bytes, backend: str) -> dict:
+    """Pico de RSS de extract_all_data: parseo, DOM y extracción (en el proceso hijo)"""
+    warm_up(DataExtractor, backend)
+    response = make_response(name, body)
+    return {'rss_peak_kb': peak_rss_kb(lambda: DataExtractor(response, backend=backend).extract_all_data())}
+
+
+def measure_page(name: str, body: bytes, backend: str, rounds: int) -> dict:
+    def fresh():
+        response = make_response(name, body)
+        return LxmlResponse(response) if backend == 'lxml' else response
+
+    def with_dom():
+        response = fresh()
+        response.selector.root
+        return response
+
+    detector = LayoutDetector(LAYOUT_BUILDERS, SelectorFactory.probe_layout)
+    detector.select(fresh())
+    layout = SelectorFactory.probe_layout(fresh())[0]
+
+    stages = {
+        'factory.probe_layout': timed(SelectorFactory.probe_layout, fresh, rounds),
+        'factory.cached': timed(detector.select, fresh, rounds),
+        'dom': timed(lambda response: response.selector.root, fresh, rounds),
+    }
+
+    for field in FIELDS:
+        def setup():
+            response = with_dom()
+            return SelectorFactory.probe_layout(response)[1], response
+        method = f'extract_{field}'
+        stages[f'{layout}.{method}'] = timed(
+            lambda args, method=method: getattr(args[0], method)(args[1]), setup, rounds,
+        )
+
+    stages['extract_all_data'] = timed(
+        lambda response: DataExtractor(response, backend=backend).extract_all_data(),
+        lambda: make_response(name, body), rounds,
+    )
+
+    return {
+        'layout': layout,
+        'stages': stages,
+        'memory': run_child(__file__, name, backend),
+        'output': DataExtractor(make_response(name, body), backend=backend).extract_all_data(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rounds', type=int, default=50)
+    parser.add_argument('--backend', default='parsel', choices=DataExtractor.BACKENDS)
+    parser.add_argument('--prefix', default='title_', help='Solo las fixtures con este prefijo')
+    parser.add_argument('--json', metavar='PATH', help='Guardar los resultados en JSON')
+    parser.add_argument(CHILD_FLAG, nargs=2, metavar=('FIXTURE', 'BACKEND'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.memory_child:
+        name, backend = args.memory_child
+        print(json.dumps(memory(name, load_fixture_bodies(name)[name], backend)))
+        return
+
+    print(FIXTURES_NOTE)
+    expected = load_expected_items()
+    results = {}
+    mismatches = []
+    for name, body in load_fixture_bodies(args.prefix).items():
+        page = measure_page(name, body, args.backend, args.rounds)
+        results[name] = page
+        if name in expected and page['output'] != expected[name]:
+            mismatches.append(name)
+
+        print(f"\n{name} ({len(body) // 1024} KB, {page['layout']}) — "
+              f"pico de RSS: {page['memory']['rss_peak_kb']} KB")
+        print(f"  {'Etapa':<34} {'Mediana (µs)':>13} {'p95 (µs)':>10}")
+        for stage, timing in page['stages'].items():
+            print(f"  {stage:<34} {timing['median_us']:>13} {timing['p95_us']:>10}")
+
+    print(f"\nSalida esperada: {len(results) - len(mismatches)}/{len(results)} fichas")
+    for name in mismatches:
+        print(f"  ✗ {name}: {results[name]['output']} != {expected[name]}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'backend': args.backend, 'rounds': args.rounds, 'pages': results},
+                      f, ensure_ascii=False, indent=2)
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
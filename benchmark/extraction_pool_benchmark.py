@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark del pool de procesos de extracción de TopMoviesSpider
+Sirve la ficha legacy sintética (necesita el DOM) desde un servidor local y
+compara la extracción en el reactor con EXTRACTION_PROCESS_WORKERS = N:
+items/segundo y retraso del reactor (un LoopingCall cada 10 ms mide cuánto
+llega tarde). Cada variante corre en un proceso hijo
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixture_pages import load_fixture_bodies
+from fixture_server import FixtureServer
+
+LAG_INTERVAL = 0.01
+
+
+def run_crawl(workers: int, base_url: str, items: int, backend: str) -> dict:
+    """Ejecutar un crawl contra el servidor (en un proceso hijo)"""
+    import scrapy
+    from scrapy.crawler import CrawlerProcess
+
+    from imdb_scraper.spiders.top_movies import TopMoviesSpider
+
+    class FixtureTopMoviesSpider(TopMoviesSpider):
+        name = 'top_movies_fixture'
+        allowed_domains = []
+
+        async def start(self):
+            # El reactor se instala al arrancar el crawl: el medidor se arranca aquí
+            from twisted.internet import task
+            self.lag_loop = task.LoopingCall(tick)
+            self.lag_loop.start(LAG_INTERVAL)
+            for request in self.start_requests():
+                yield request
+
+        def start_requests(self):
+            for i in range(items):
+                yield scrapy.Request(f"{base_url}/title/tt{i:07d}/", callback=self.parse_detail,
+                                     meta={'rank': i + 1}, dont_filter=True)
+
+    lags = []
+    last = [None]
+
+    def tick():
+        now = time.monotonic()
+        if last[0] is not None:
+            lags.append(max(0.0, now - last[0] - LAG_INTERVAL) * 1000)
+        last[0] = now
+
+    settings = {
+        'LOG_LEVEL': os.environ.get('BENCH_LOG_LEVEL', 'ERROR'),
+        'TELNETCONSOLE_ENABLED': False,
+        'CONCURRENT_REQUESTS': 32,
+        'CONCURRENT_REQUESTS_PER_DOMAIN': 32,
+        'EXTRACTION_PROCESS_WORKERS': workers,
+        'EXTRACTION_BACKEND': backend,
+    }
+    process = CrawlerProcess(settings=settings)
+    crawler = process.create_crawler(FixtureTopMoviesSpider)
+    start = time.monotonic()
+    process.crawl(crawler)
+    process.start()
+    elapsed = time.monotonic() - start
+
+    scraped = crawler.stats.get_value('item_scraped_count', 0)
+    lags.sort()
+    return {
+        'workers': workers,
+        'items': scraped,
+        'items_per_second': round(scraped / elapsed, 1),
+        'lag_p95_ms': round(lags[int(len(lags) * 0.95)], 1) if lags else 0.0,
+        'lag_max_ms': round(lags[-1], 1) if lags else 0.0,
+        'lag_median_ms': round(statistics.median(lags), 2) if lags else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--items', type=int, default=400)
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 2, 4])
+    parser.add_argument('--backend', default='parsel', choices=('parsel', 'lxml'))
+    parser.add_argument('--child', nargs=2, metavar=('WORKERS', 'BASE_URL'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        workers, base_url = args.child
+        print(json.dumps(run_crawl(int(workers), base_url, args.items, args.backend)))
+        return
+
+    page = load_fixture_bodies('title_legacy')['title_legacy_tt0068646']
+    results = []
+    # El reactor de Twisted no se puede reiniciar: un proceso por crawl
+    with FixtureServer(page) as server:
+        for workers in args.workers:
+            output = subprocess.check_output([
+                sys.executable, os.path.abspath(__file__), '--items', str(args.items),
+                '--backend', args.backend, '--child', str(workers), server.base_url,
+            ])
+            results.append(json.loads(output.decode().strip().splitlines()[-1]))
+
+    print(f"CPUs: {os.cpu_count()}")
+    print(f"{'Procesos':>8} {'Items':>6} {'Items/s':>8} {'Retraso mediana (ms)':>21} "
+          f"{'p95 (ms)':>9} {'Máx (ms)':>9}")
+    for r in results:
+        print(f"{r['workers']:>8} {r['items']:>6} {r['items_per_second']:>8} "
+              f"{r['lag_median_ms']:>21} {r['lag_p95_ms']:>9} {r['lag_max_ms']:>9}")
+
+
+if __name__ == "__main__":
+    main()
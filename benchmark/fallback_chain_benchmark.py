@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark de las cadenas de selectores ante un cambio de maquetación
+Simula un crawl sobre la ficha moderna sintética en tres fases: la ficha
+original, la ficha modificada (el título y el metascore dejan de estar donde
+apuntan los primeros selectores) y la original de nuevo (el cambio se
+revierte). Compara el orden declarado fijo con las cadenas que se reordenan
+(con mínimo de muestras e histéresis): µs por página en cada fase, orden de
+las cadenas al terminarla y valores extraídos, que tienen que coincidir.
+El DOM se construye antes de medir
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixture_pages import load_fixture_bodies, make_response
+from imdb_scraper.selector_factory import ModernIMDbSelector
+
+# Cambios de maquetación: los selectores preferidos fallan, los de respaldo aciertan
+DRIFT = (
+    (b'data-testid="hero__pageTitle" class="sc-d8941411-0 dxeMrU"><span class="hero__primary-text" '
+     b'data-testid="hero__primary-text">The Shawshank Redemption</span>',
+     b'class="sc-b73cd867-0">The Shawshank Redemption'),
+    (b'<span class="score-meta"', b'<span class="score-meta-v2"'),
+)
+
+FIELDS = ('extract_title', 'extract_year', 'extract_rating',
+          'extract_duration', 'extract_metascore', 'extract_actors')
+
+
+def drifted_body(body: bytes) -> bytes:
+    for old, new in DRIFT:
+        assert old in body, old
+        body = body.replace(old, new)
+    return body
+
+
+class FixedOrderModernSelector(ModernIMDbSelector):
+    CHAIN_REORDER_EVERY = 0
+
+
+class ReorderingModernSelector(ModernIMDbSelector):
+    pass
+
+
+VARIANTS = {'Orden fijo': FixedOrderModernSelector, 'Reordenada': ReorderingModernSelector}
+
+
+def parsed_responses(body: bytes, pages: int):
+    responses = []
+    for _ in range(pages):
+        response = make_response('drift', body)
+        response.selector.root
+        responses.append(response)
+    return responses
+
+
+def run(selector_cls, responses):
+    """Un selector por página, como DataExtractor; las cadenas son las de la clase"""
+    outputs = []
+    start = time.perf_counter()
+    for response in responses:
+        selector = selector_cls()
+        outputs.append([getattr(selector, field)(response) for field in FIELDS])
+    elapsed = time.perf_counter() - start
+    return elapsed / len(responses) * 1e6, outputs
+
+
+def chain_orders(selector_cls) -> str:
+    """Campos cuya cadena no está en el orden declarado"""
+    moved = [f"{field}={list(chain.order)}" for field, chain in selector_cls._chains.items()
+             if chain.order != tuple(range(len(chain.queries)))]
+    return ', '.join(moved) or 'declarado'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--pages', type=int, default=300, help='Páginas por fase')
+    args = parser.parse_args()
+
+    body = load_fixture_bodies('title_modern')['title_modern_tt0111161']
+    original = parsed_responses(body, args.pages)
+    drifted = parsed_responses(drifted_body(body), args.pages)
+    phases = (('Original', original), ('Modificada', drifted), ('Revertida', original))
+
+    outputs = {label: [] for label in VARIANTS}
+    print(f"{'Fase':<12} {'Variante':<12} {'µs/página':>10}  Orden de las cadenas")
+    for phase, responses in phases:
+        for label, selector_cls in VARIANTS.items():
+            us, out = run(selector_cls, responses)
+            outputs[label].extend(out)
+            print(f"{phase:<12} {label:<12} {us:>10.1f}  {chain_orders(selector_cls)}")
+
+    same = outputs['Orden fijo'] == outputs['Reordenada']
+    print(f"Misma salida: {'sí' if same else 'no'}")
+    sys.exit(0 if same else 1)
+
+
+if __name__ == "__main__":
+    main()
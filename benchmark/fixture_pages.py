@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Carga de las páginas de benchmark/fixtures
+Los nombres indican el tipo: title_* son fichas legítimas (.html o .html.gz)
+y block_* páginas de bloqueo servidas con status 200. expected_items.json
+guarda lo que DataExtractor debe devolver para cada ficha.
+
+Todas son sintéticas, no descargas reales de IMDb: se escribieron con la
+estructura de cada maquetación y texto de relleno (aleatorio con semilla
+fija). title_modern_tt0111161 imita la ficha actual (__NEXT_DATA__, JSON-LD,
+data-testid, CSS y scripts en línea hasta ~1,2 MB). title_legacy_tt0068646
+imita la anterior al rediseño (ratingValue, title_wrapper, cast_list) y es
+bastante más pequeña que aquellas páginas. Sirven para comprobar la salida y
+comparar variantes entre sí; los tiempos absolutos sobre páginas reales
+serán otros.
+
+Variantes de title_modern_tt0111161 (generadas desde la original):
+title_modern_jsonld_* sin el script __NEXT_DATA__ y title_modern_html_* sin
+__NEXT_DATA__ ni JSON-LD, para cubrir todas las estrategias
+"""
+
+import gzip
+import json
+import os
+from typing import Dict
+
+from scrapy.http import HtmlResponse
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+FIXTURES_NOTE = "Fichas sintéticas de benchmark/fixtures (estructura de IMDb, no descargas reales)"
+
+
+def load_fixture_bodies(prefix: str = '') -> Dict[str, bytes]:
+    """Cuerpos descomprimidos por nombre de fixture (sin extensión)"""
+    bodies = {}
+    for filename in sorted(os.listdir(FIXTURES_DIR)):
+        if not filename.startswith(prefix):
+            continue
+        path = os.path.join(FIXTURES_DIR, filename)
+        if filename.endswith('.html.gz'):
+            with gzip.open(path, 'rb') as f:
+                bodies[filename[:-len('.html.gz')]] = f.read()
+        elif filename.endswith('.html'):
+            with open(path, 'rb') as f:
+                bodies[filename[:-len('.html')]] = f.read()
+    return bodies
+
+
+def load_expected_items() -> Dict[str, dict]:
+    """Salida esperada de DataExtractor.extract_all_data por fixture"""
+    with open(os.path.join(FIXTURES_DIR, 'expected_items.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def make_response(name: str, body: bytes, status: int = 200, headers=None) -> HtmlResponse:
+    """HtmlResponse de Scrapy para una fixture"""
+    return HtmlResponse(
+        url=f"https://www.imdb.com/fixture/{name}/",
+        status=status,
+        headers=headers,
+        body=body,
+        encoding='utf-8',
+    )
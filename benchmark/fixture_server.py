@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Servidor HTTP local para benchmarks sin red
+Sirve páginas de título de IMDb de prueba en /title/<id>/
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+DEFAULT_TITLE_PAGE = b"""<!DOCTYPE html>
+<html><head><title>Fixture Movie (1994) - IMDb</title></head>
+<body>
+<h1 data-testid="hero__pageTitle"><span>Fixture Movie</span></h1>
+<ul class="ipc-inline-list"><li><a>1994</a></li><li>2h 22m</li></ul>
+<div data-testid="hero-rating-bar__aggregate-rating"><span>9.3</span></div>
+<span class="score-meta">82</span>
+<a data-testid="title-cast-item__actor">Actor One</a>
+<a data-testid="title-cast-item__actor">Actor Two</a>
+<a data-testid="title-cast-item__actor">Actor Three</a>
+</body></html>
+"""
+
+
+class FixtureServer:
+    """Servidor HTTP en un hilo que devuelve siempre la misma página de título"""
+
+    def __init__(self, page: bytes = DEFAULT_TITLE_PAGE, host: str = '127.0.0.1', port: int = 0):
+        page_body = page
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(page_body)))
+                self.end_headers()
+                self.wfile.write(page_body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
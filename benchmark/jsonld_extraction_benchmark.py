@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Benchmark de extracción por página: selectores CSS frente a JSON-LD
+Cada iteración usa una respuesta nueva, de modo que el coste de construir el
+DOM (cuando se necesita) entra en la medida como en el crawl real
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixture_pages import load_fixture_bodies, make_response
+from imdb_scraper.selector_factory import DataExtractor, SelectorFactory
+
+
+class CssDataExtractor(DataExtractor):
+    """DataExtractor con la selección anterior: solo estrategias CSS"""
+
+    def __init__(self, response):
+        self.response = response
+        self.selector = SelectorFactory.create_css_selector(response)
+
+
+def time_page(extractor_cls, name: str, body: bytes, rounds: int):
+    timings = []
+    data = None
+    for _ in range(rounds):
+        response = make_response(name, body)
+        start = time.perf_counter()
+        data = extractor_cls(response).extract_all_data()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rounds', type=int, default=30)
+    args = parser.parse_args()
+
+    print(f"{'Fixture':<28} {'Estrategia':<22} {'CSS (ms)':>9} {'Factory (ms)':>13} {'Iguales':>8}")
+    for name, body in load_fixture_bodies('title_').items():
+        css_ms, css_data = time_page(CssDataExtractor, name, body, args.rounds)
+        factory_ms, factory_data = time_page(DataExtractor, name, body, args.rounds)
+        strategy = type(SelectorFactory.create_selector(make_response(name, body))).__name__
+        same = 'sí' if css_data == factory_data else 'no'
+        print(f"{name:<28} {strategy:<22} {css_ms:>9.2f} {factory_ms:>13.2f} {same:>8}")
+        if css_data != factory_data:
+            print(f"    CSS:     {css_data}\n    Factory: {factory_data}")
+
+
+if __name__ == "__main__":
+    main()
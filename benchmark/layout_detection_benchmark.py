@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la elección de estrategia por huella de maquetación
+Recorre un flujo de páginas con las fichas sintéticas y compara la detección
+completa en cada página (SelectorFactory.probe_layout) con LayoutDetector,
+que solo la ejecuta la primera vez que ve cada huella. El DOM se construye
+antes de medir: solo cuenta la elección de estrategia, en total y por ficha.
+La comprobación compara los datos extraídos, exige que la caché no sea más
+lenta que la detección completa en ninguna ficha y, con la caché envenenada
+(cada huella asociada a una maquetación equivocada), que DataExtractor la
+invalide y extraiga lo mismo que la detección completa
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixture_pages import FIXTURES_NOTE, load_fixture_bodies, make_response
+from imdb_scraper.selector_factory import (
+    LAYOUT_BUILDERS, DataExtractor, LayoutDetector, SelectorFactory, layout_detector,
+)
+
+
+def build_stream(pages: int, fixtures=None):
+    fixtures = fixtures or list(load_fixture_bodies('title_').items())
+    responses = []
+    for i in range(pages):
+        name, body = fixtures[i % len(fixtures)]
+        response = make_response(name, body)
+        response.selector.root  # DOM construido fuera de la medida
+        responses.append(response)
+    return responses
+
+
+FIELDS = ('extract_title', 'extract_year', 'extract_rating',
+          'extract_duration', 'extract_metascore', 'extract_actors')
+
+
+def run(select, pages: int, fixtures=None) -> tuple:
+    responses = build_stream(pages, fixtures)
+    selectors = []
+    # Sin recolecciones de los DOM de la pasada anterior dentro de la medida
+    gc.collect()
+    gc.disable()
+    start = time.perf_counter()
+    for response in responses:
+        selectors.append(select(response)[1])
+    elapsed = time.perf_counter() - start
+    gc.enable()
+    data = [[getattr(selector, field)(response) for field in FIELDS]
+            for selector, response in zip(selectors, responses)]
+    return elapsed / pages * 1e6, data
+
+
+def check_stale_cache() -> list:
+    """Huellas asociadas a la maquetación CSS equivocada: se tienen que corregir solas"""
+    failures = []
+    for name, body in load_fixture_bodies('title_').items():
+        expected = DataExtractor(make_response(name, body)).extract_all_data()
+        layout = layout_detector.fingerprints[layout_detector.fingerprint(body)]
+        wrong = 'legacy' if layout != 'legacy' else 'modern'
+        layout_detector.fingerprints[layout_detector.fingerprint(body)] = wrong
+        extractor = DataExtractor(make_response(name, body))
+        if extractor.extract_all_data() != expected:
+            failures.append(f"{name}: caché con '{wrong}' no invalidada ({extractor.layout})")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--pages', type=int, default=400)
+    args = parser.parse_args()
+
+    probe_us, probe_data = run(SelectorFactory.probe_layout, args.pages)
+    detector = LayoutDetector(LAYOUT_BUILDERS, SelectorFactory.probe_layout)
+    cached_us, cached_data = run(detector.select, args.pages)
+
+    print(FIXTURES_NOTE)
+    print(f"{'Variante':<22} {'µs/página':>10} {'Detecciones':>12}")
+    print(f"{'Detección completa':<22} {probe_us:>10.1f} {args.pages:>12}")
+    print(f"{'Huella + caché':<22} {cached_us:>10.1f} {detector.probes:>12}")
+    print(f"Mismos datos en todas las páginas: {'sí' if probe_data == cached_data else 'no'}")
+    print(f"Maquetaciones: {dict(detector.layouts)}")
+
+    print(f"Huellas distintas: {len(detector.fingerprints)}")
+
+    # Por ficha, con la caché ya caliente: el camino cacheado no puede costar más
+    failures = []
+    print()
+    print(f"{'Ficha':<32} {'Completa (µs)':>14} {'Caché (µs)':>11}")
+    for name, body in load_fixture_bodies('title_').items():
+        fixture_pages = max(50, args.pages // 4)
+        fixture_probe_us, _ = run(SelectorFactory.probe_layout, fixture_pages, [(name, body)])
+        fixture_cached_us, _ = run(detector.select, fixture_pages, [(name, body)])
+        print(f"{name:<32} {fixture_probe_us:>14.1f} {fixture_cached_us:>11.1f}")
+        # Margen para el ruido de medida en las fichas que ya son baratas
+        if fixture_cached_us > fixture_probe_us * 1.1 + 2:
+            failures.append(f"{name}: la caché es más lenta que la detección completa")
+
+    failures += check_stale_cache()
+    print(f"Caché envenenada: {layout_detector.invalidations} invalidaciones")
+    if probe_data != cached_data:
+        failures.append("la caché cambia los datos extraídos")
+    for failure in failures:
+        print(f"  ✗ {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
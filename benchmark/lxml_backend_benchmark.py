@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Paridad, tiempo y memoria del backend de extracción 'lxml' frente a 'parsel'
+Para cada fixture comprueba que ambos backends devuelven el mismo dict
+(también forzando las estrategias CSS) y mide, con respuestas nuevas en cada
+iteración, el tiempo de parseo + extracción y el pico de memoria residente
+(RSS en un proceso nuevo, con el árbol de lxml incluido; ver peak_memory).
+Sale con código 1 si algún fixture no coincide
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixture_pages import load_fixture_bodies, make_response
+from peak_memory import CHILD_FLAG, peak_rss_kb, run_child, warm_up
+from imdb_scraper.selector_factory import DataExtractor, LxmlResponse, SelectorFactory
+
+BACKENDS = DataExtractor.BACKENDS
+
+
+class CssDataExtractor(DataExtractor):
+    """Solo estrategias CSS: el caso en el que se construye el DOM"""
+
+    def __init__(self, response, backend='parsel'):
+        self.response = LxmlResponse(response) if backend == 'lxml' else response
+        self.layout = 'css'
+        self.selector = SelectorFactory.create_css_selector(self.response)
+
+
+def extract(extractor_cls, name, body, backend):
+    return extractor_cls(make_response(name, body), backend=backend).extract_all_data()
+
+
+def time_backend(extractor_cls, name, body, backend, rounds):
+    timings = []
+    for _ in range(rounds):
+        response = make_response(name, body)
+        start = time.perf_counter()
+        extractor_cls(response, backend=backend).extract_all_data()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def memory_backend(name, body, backend):
+    """KB de pico de RSS de parseo + extracción CSS (en el proceso hijo)"""
+    warm_up(CssDataExtractor, backend)
+    response = make_response(name, body)
+    return peak_rss_kb(lambda: CssDataExtractor(response, backend=backend).extract_all_data())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument(CHILD_FLAG, nargs=2, metavar=('FIXTURE', 'BACKEND'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.memory_child:
+        name, backend = args.memory_child
+        print(json.dumps({'rss_peak_kb': memory_backend(name, load_fixture_bodies(name)[name], backend)}))
+        return
+
+    fixtures = load_fixture_bodies()
+    mismatches = 0
+    for extractor_cls in (DataExtractor, CssDataExtractor):
+        for name, body in fixtures.items():
+            results = {backend: extract(extractor_cls, name, body, backend) for backend in BACKENDS}
+            if results['parsel'] != results['lxml']:
+                mismatches += 1
+                print(f"✗ {extractor_cls.__name__} {name}: {results}")
+    total = len(fixtures) * 2
+    print(f"Paridad: {total - mismatches}/{total} extracciones iguales\n")
+
+    print(f"{'Fixture':<28} {'Backend':<8} {'ms (CSS)':>9} {'Pico RSS KB':>12}")
+    for name, body in load_fixture_bodies('title_').items():
+        for backend in BACKENDS:
+            ms = time_backend(CssDataExtractor, name, body, backend, args.rounds)
+            peak_kb = run_child(__file__, name, backend)['rss_peak_kb']
+            print(f"{name:<28} {backend:<8} {ms:>9.2f} {peak_kb:>12}")
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark de extracción por página: CSS, JSON-LD y __NEXT_DATA__
+Mide además el coste de decodificar el blob __NEXT_DATA__ entero frente a
+las secciones que lee NextDataSelector. Cada iteración usa una respuesta
+nueva, como en el crawl real
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixture_pages import load_fixture_bodies, make_response
+from imdb_scraper.selector_factory import DataExtractor, NextDataPayload, SelectorFactory
+
+
+class CssDataExtractor(DataExtractor):
+    """Solo estrategias CSS (construye el DOM)"""
+
+    def __init__(self, response):
+        self.response = response
+        self.selector = SelectorFactory.create_css_selector(response)
+
+
+class JsonLdDataExtractor(DataExtractor):
+    """JSON-LD con respaldo CSS (la selección anterior)"""
+
+    def __init__(self, response):
+        self.response = response
+        self.selector = SelectorFactory.create_json_ld_selector(response)
+
+
+EXTRACTORS = {
+    'CSS': CssDataExtractor,
+    'JSON-LD': JsonLdDataExtractor,
+    'Factory': DataExtractor,
+}
+
+
+def median_ms(func, rounds: int):
+    timings = []
+    result = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), result
+
+
+def time_page(extractor_cls, name: str, body: bytes, rounds: int):
+    timings = []
+    data = None
+    for _ in range(rounds):
+        response = make_response(name, body)
+        start = time.perf_counter()
+        data = extractor_cls(response).extract_all_data()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), data
+
+
+def lazy_sections(body: bytes):
+    payload = NextDataPayload.from_body(body)
+    return payload.section('aboveTheFoldData'), payload.section('mainColumnData', 'cast')
+
+
+def full_blob(body: bytes):
+    return NextDataPayload.from_body(body).load()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rounds', type=int, default=30)
+    args = parser.parse_args()
+
+    fixtures = load_fixture_bodies('title_')
+    header = ''.join(f"{label + ' (ms)':>15}" for label in EXTRACTORS)
+    print(f"{'Fixture':<28} {'Estrategia':<18}{header} {'Iguales':>8}")
+    for name, body in fixtures.items():
+        results = {label: time_page(cls, name, body, args.rounds) for label, cls in EXTRACTORS.items()}
+        strategy = type(SelectorFactory.create_selector(make_response(name, body))).__name__
+        reference = results['CSS'][1]
+        same = all(data == reference for _, data in results.values())
+        timings = ''.join(f"{ms:>15.2f}" for ms, _ in results.values())
+        print(f"{name:<28} {strategy:<18}{timings} {'sí' if same else 'no':>8}")
+        if not same:
+            for label, (_, data) in results.items():
+                print(f"    {label:<8} {data}")
+
+    print()
+    print(f"{'Fixture':<28} {'Blob (KB)':>10} {'Entero (ms)':>12} {'Secciones (ms)':>15}")
+    for name, body in fixtures.items():
+        payload = NextDataPayload.from_body(body)
+        if payload is None:
+            continue
+        full_ms, _ = median_ms(lambda: full_blob(body), args.rounds)
+        lazy_ms, _ = median_ms(lambda: lazy_sections(body), args.rounds)
+        size_kb = (payload.end - payload.start) / 1024
+        print(f"{name:<28} {size_kb:>10.0f} {full_ms:>12.2f} {lazy_ms:>15.3f}")
+
+
+if __name__ == "__main__":
+    main()
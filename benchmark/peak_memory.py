@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Pico de memoria residente (RSS) para los benchmarks de extracción
+tracemalloc solo ve las asignaciones de Python: el árbol de lxml y las
+cadenas de sus nodos se asignan en C. Aquí se mide el crecimiento del pico
+de RSS del proceso, que incluye las dos. La memoria liberada se reutiliza
+dentro del mismo proceso, así que cada medida se toma en un proceso nuevo
+(run_child) tras extraer una ficha mínima (imports perezosos y cachés de
+selectores fuera de la cifra)
+"""
+
+import gc
+import json
+import os
+import resource
+import subprocess
+import sys
+
+from fixture_pages import make_response
+from fixture_server import DEFAULT_TITLE_PAGE
+
+CHILD_FLAG = '--memory-child'
+
+
+def _status_kb(field: str) -> int:
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1])
+    raise OSError(f"{field} no está en /proc/self/status")
+
+
+def _maxrss_kb() -> int:
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # En macOS ru_maxrss va en bytes, en Linux en KB
+    return maxrss // 1024 if sys.platform == 'darwin' else maxrss
+
+
+def peak_rss_kb(func) -> int:
+    """Crecimiento en KB del pico de RSS del proceso mientras se ejecuta func()"""
+    gc.collect()
+    try:
+        # Linux: el pico (VmHWM) vuelve al RSS actual
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        before = _status_kb('VmRSS')
+    except OSError:
+        # Sin /proc ru_maxrss no se reinicia: solo cuenta lo que supere el pico previo
+        before = _maxrss_kb()
+        func()
+        return max(0, _maxrss_kb() - before)
+
+    func()
+    return _status_kb('VmHWM') - before
+
+
+def warm_up(extractor_cls, backend: str):
+    """Extraer una ficha mínima antes de medir"""
+    extractor_cls(make_response('warmup', DEFAULT_TITLE_PAGE), backend=backend).extract_all_data()
+
+
+def run_child(script: str, *args) -> dict:
+    """Ejecutar `script --memory-child args...` en un proceso nuevo y leer el JSON de su última línea"""
+    output = subprocess.check_output([sys.executable, os.path.abspath(script), CHILD_FLAG, *args])
+    return json.loads(output.decode().strip().splitlines()[-1])
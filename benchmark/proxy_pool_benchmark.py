@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Benchmark del límite global con un slot por proxy
+Cada "proxy" es un servidor de fixtures local (responde a la URL absoluta que
+le envía Scrapy) y ProxyRotationMiddleware les asigna un slot de descarga con
+su propio DOWNLOAD_DELAY. Compara el límite global fijo en CONCURRENT_REQUESTS
+= 1 con el escalado por proxies activos × CONCURRENT_REQUESTS_PER_DOMAIN,
+midiendo items/segundo según el tamaño del pool
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixture_server import FixtureServer
+
+
+VARIANTS = {
+    # Techo igual al mínimo: el total no pasa de CONCURRENT_REQUESTS = 1
+    'fijo': {'PROXY_TOTAL_CONCURRENCY_MAX': 1},
+    'escalado': {'PROXY_TOTAL_CONCURRENCY_MAX': 16},
+}
+
+
+def run_crawl(variant: str, config_file: str, check_url: str, requests_count: int, delay: float) -> dict:
+    """Ejecutar un crawl a través del pool (en un proceso hijo)"""
+    import scrapy
+    from scrapy.crawler import CrawlerProcess
+
+    class PoolSpider(scrapy.Spider):
+        name = 'proxy_pool_fixture'
+
+        async def start(self):
+            for i in range(requests_count):
+                yield scrapy.Request(f"http://imdb.fixture/title/tt{i:07d}/", callback=self.parse,
+                                     dont_filter=True)
+
+        def parse(self, response):
+            yield {'titulo': response.css('h1 span::text').get()}
+
+    settings = {
+        'LOG_LEVEL': os.environ.get('BENCH_LOG_LEVEL', 'ERROR'),
+        'TELNETCONSOLE_ENABLED': False,
+        'CONCURRENT_REQUESTS': 1,
+        'CONCURRENT_REQUESTS_PER_DOMAIN': 1,
+        'DOWNLOAD_DELAY': delay,
+        'RANDOMIZE_DOWNLOAD_DELAY': False,
+        'AUTOTHROTTLE_ENABLED': False,
+        'DOWNLOADER_MIDDLEWARES': {'imdb_scraper.proxy_middleware.ProxyRotationMiddleware': 350},
+        'PROXY_CONFIG_FILE': config_file,
+        'PROXY_HEALTH_CHECK_URLS': [check_url],
+        'IP_CHECK_URLS': [check_url],
+        'PROXY_IP_VERIFICATION': False,
+        'PROXY_DOWNLOAD_SLOTS': True,
+    }
+    settings.update(VARIANTS[variant])
+
+    process = CrawlerProcess(settings=settings)
+    crawler = process.create_crawler(PoolSpider)
+    start = time.monotonic()
+    process.crawl(crawler)
+    process.start()
+    elapsed = time.monotonic() - start
+
+    scraped = crawler.stats.get_value('item_scraped_count', 0)
+    return {
+        'variant': variant,
+        'items': scraped,
+        'seconds': round(elapsed, 2),
+        'items_per_second': round(scraped / elapsed, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=40)
+    parser.add_argument('--pool', type=int, nargs='+', default=[1, 4, 8], help='Tamaños del pool de proxies')
+    parser.add_argument('--delay', type=float, default=0.5, help='DOWNLOAD_DELAY por proxy')
+    parser.add_argument('--child', nargs=3, metavar=('VARIANT', 'CONFIG', 'CHECK_URL'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        variant, config_file, check_url = args.child
+        print(json.dumps(run_crawl(variant, config_file, check_url, args.requests, args.delay)))
+        return
+
+    results = []
+    with ExitStack() as stack, tempfile.TemporaryDirectory() as tmp:
+        servers = [stack.enter_context(FixtureServer()) for _ in range(max(args.pool))]
+        for size in args.pool:
+            config_file = os.path.join(tmp, f"proxies_{size}.json")
+            with open(config_file, 'w') as f:
+                json.dump({'proxies': [
+                    {'host': server.httpd.server_address[0], 'port': server.httpd.server_address[1]}
+                    for server in servers[:size]
+                ]}, f)
+
+            for variant in VARIANTS:
+                # El reactor de Twisted no es reiniciable: un proceso por crawl. El
+                # directorio temporal recoge los logs/ que escribe ProxyRotator
+                output = subprocess.check_output([
+                    sys.executable, os.path.abspath(__file__),
+                    '--requests', str(args.requests), '--delay', str(args.delay),
+                    '--child', variant, config_file, servers[0].base_url,
+                ], cwd=tmp)
+                result = json.loads(output.decode().strip().splitlines()[-1])
+                result['pool'] = size
+                results.append(result)
+
+    print(f"{'Proxies':>7} {'Variante':<10} {'Items':>6} {'Segundos':>9} {'Items/s':>8}")
+    for r in results:
+        print(f"{r['pool']:>7} {r['variant']:<10} {r['items']:>6} {r['seconds']:>9} {r['items_per_second']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Benchmark del sondeo de salud de proxies contra proxies locales simulados
+Compara la prueba secuencial original con ProxyHealthProber (concurrente,
+con presupuesto de tiempo) sin salir a la red. Durante la ronda comprueba
+que ningún proxy sale de la rotación y que un fallo real registrado
+mientras se prueba sobrevive a la aplicación de los resultados
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from imdb_scraper.proxy_manager import ProxyRotator, ProxyConfig
+from imdb_scraper.proxy_prober import ProxyHealthProber
+
+
+class StandInProxy:
+    """Proxy HTTP simulado: responde él mismo a cualquier URL absoluta con su 'IP de salida'"""
+
+    def __init__(self, exit_ip: str, latency: float = 0.0):
+        outer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                time.sleep(outer.latency)
+                body = json.dumps({'origin': outer.exit_ip}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # El cliente abandonó la prueba por timeout
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        self.exit_ip = exit_ip
+        self.latency = latency
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    @property
+    def port(self) -> int:
+        return self.httpd.server_address[1]
+
+
+def build_pool(healthy: int, slow: int, dead: int, slow_latency: float):
+    """Crear proxies simulados: sanos, lentos (superan el timeout) y caídos"""
+    servers = []
+    proxies = []
+
+    for i in range(healthy):
+        server = StandInProxy(f"10.0.0.{i + 1}", latency=0.05)
+        servers.append(server)
+        proxies.append(ProxyConfig('127.0.0.1', server.port, provider='healthy'))
+
+    for i in range(slow):
+        server = StandInProxy(f"10.0.1.{i + 1}", latency=slow_latency)
+        servers.append(server)
+        proxies.append(ProxyConfig('127.0.0.1', server.port, provider='slow'))
+
+    for i in range(dead):
+        # Puerto reservado y cerrado inmediatamente: conexión rechazada
+        server = StandInProxy('0.0.0.0')
+        port = server.port
+        server.httpd.server_close()
+        proxies.append(ProxyConfig('127.0.0.1', port, provider='dead'))
+
+    return servers, proxies
+
+
+def make_rotator(proxies, timeout: float) -> ProxyRotator:
+    rotator = ProxyRotator(
+        config_file='/nonexistent/proxies.json',
+        test_urls=['http://imdb.test/robots.txt'],
+        ip_check_urls=['http://ip.test/ip'],
+        test_timeout=timeout,
+        log_file=None,
+    )
+    rotator.proxies = proxies
+    return rotator
+
+
+def run_sequential(proxies, timeout: float) -> dict:
+    """Réplica de _test_initial_proxies original: una prueba detrás de otra"""
+    rotator = make_rotator(proxies, timeout)
+    start = time.monotonic()
+    working = sum(1 for proxy in rotator.proxies if rotator.test_proxy(proxy))
+    elapsed = time.monotonic() - start
+    return {'mode': 'secuencial', 'healthy': working, 'seconds_to_start': round(elapsed, 2)}
+
+
+def run_concurrent(proxies, timeout: float, budget: float, min_healthy: int) -> dict:
+    """ProxyHealthProber sobre el reactor de Twisted"""
+    from twisted.internet import reactor
+
+    rotator = make_rotator(proxies, timeout)
+    prober = ProxyHealthProber(rotator, time_budget=budget, min_healthy=min_healthy)
+    result = {}
+
+    def on_ready(healthy):
+        result['seconds_to_start'] = round(time.monotonic() - start, 2)
+        result['healthy_at_start'] = healthy
+        # Tráfico durante la ronda: todos en rotación y un fallo real que debe conservarse
+        result['in_rotation'] = sum(1 for p in rotator.proxies if p.is_active)
+        result['picked'] = all(rotator.get_next_proxy() is not None for _ in range(50))
+        rotator.mark_proxy_failed(rotator.proxies[0])
+        # Esperar a las pruebas en segundo plano para ver el estado final
+        reactor.callLater(timeout + 0.5, reactor.stop)
+
+    start = time.monotonic()
+    reactor.callWhenRunning(lambda: prober.probe_all().addCallback(on_ready))
+    reactor.run()
+
+    result.update({
+        'mode': f'concurrente (min_healthy={min_healthy})',
+        'healthy': sum(1 for p in rotator.proxies if p.is_active),
+        'failure_kept': rotator.proxies[0].failure_count == 1,
+        'probing': rotator.probing,
+    })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--healthy', type=int, default=6)
+    parser.add_argument('--slow', type=int, default=3)
+    parser.add_argument('--dead', type=int, default=3)
+    parser.add_argument('--timeout', type=float, default=2.0)
+    parser.add_argument('--budget', type=float, default=5.0)
+    parser.add_argument('--min-healthy', type=int, default=2)
+    args = parser.parse_args()
+
+    servers, proxies = build_pool(args.healthy, args.slow, args.dead, slow_latency=args.timeout * 2)
+
+    results = [run_sequential(proxies, args.timeout)]
+    for proxy in proxies:
+        proxy.is_active = True
+    results.append(run_concurrent(proxies, args.timeout, args.budget, args.min_healthy))
+
+    total = len(proxies)
+    print(f"{'Modo':<32} {'Arranque (s)':>12} {'Sanos':>8}")
+    for r in results:
+        print(f"{r['mode']:<32} {r['seconds_to_start']:>12} {r['healthy']:>5}/{total}")
+
+    concurrent = results[-1]
+    checks = {
+        'Proxies en rotación durante la ronda': concurrent['in_rotation'] == total and concurrent['picked'],
+        'Fallo real conservado tras la ronda': concurrent['failure_kept'],
+        'Ronda cerrada': not concurrent['probing'],
+    }
+    print()
+    for label, ok in checks.items():
+        print(f"{'✓' if ok else '✗'} {label}")
+    sys.exit(0 if all(checks.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
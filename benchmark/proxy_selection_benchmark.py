@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark de ProxyRotator.get_next_proxy con pools grandes
+Compara la selección original (filtrado + ordenación de la lista completa)
+con los índices de las estrategias 'least_used' (heap) y 'weighted' (árbol de
+Fenwick), intercalando fallos y éxitos como en un crawl real
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from imdb_scraper.proxy_manager import ProxyRotator, ProxyConfig
+
+
+class LegacyProxyRotator(ProxyRotator):
+    """Réplica de la selección original: lista de activos y sort cada 10 requests"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.current_proxy_index = 0
+        self.rotation_threshold = 10
+
+    def get_next_proxy(self):
+        if not self.proxies:
+            return None
+
+        active_proxies = [p for p in self.proxies if p.is_active and p.failure_count < p.max_failures]
+
+        if not active_proxies:
+            for proxy in self.proxies:
+                proxy.failure_count = 0
+                proxy.is_active = True
+            active_proxies = self.proxies
+
+        if self.request_count % self.rotation_threshold == 0 or self.current_proxy_index >= len(active_proxies):
+            self.current_proxy_index = 0
+            active_proxies.sort(key=lambda p: (p.failure_count, p.last_used or datetime.min))
+
+        proxy = active_proxies[self.current_proxy_index % len(active_proxies)]
+        proxy.last_used = datetime.now()
+
+        self.current_proxy_index += 1
+        self.request_count += 1
+
+        return proxy
+
+    def mark_proxy_failed(self, proxy):
+        proxy.failure_count += 1
+        if proxy.failure_count >= proxy.max_failures:
+            proxy.is_active = False
+
+    def mark_proxy_success(self, proxy, ip_used=None):
+        proxy.failure_count = max(0, proxy.failure_count - 1)
+        proxy.is_active = True
+
+
+class _NullHistory(list):
+    def append(self, item):
+        pass
+
+
+def build_rotator(cls, size: int, strategy: str) -> ProxyRotator:
+    rotator = cls(config_file='/nonexistent/proxies.json', selection_strategy=strategy, log_file=None)
+    # Sin E/S de logs por request: se mide solo la selección
+    rotator.logger.setLevel(logging.ERROR)
+    rotator.ip_history = _NullHistory()
+    rotator.proxies = [ProxyConfig(f"10.{i // 65536}.{i // 256 % 256}.{i % 256}", 8080) for i in range(size)]
+    return rotator
+
+
+def run(cls, size: int, requests_count: int, failure_rate: float, seed: int,
+        strategy: str = 'least_used') -> float:
+    """Microsegundos por request (selección + marcado del resultado)"""
+    rotator = build_rotator(cls, size, strategy)
+    rng = random.Random(seed)
+    outcomes = [rng.random() < failure_rate for _ in range(requests_count)]
+
+    start = time.perf_counter()
+    for failed in outcomes:
+        proxy = rotator.get_next_proxy()
+        if failed:
+            rotator.mark_proxy_failed(proxy)
+        else:
+            rotator.mark_proxy_success(proxy)
+    elapsed = time.perf_counter() - start
+
+    return elapsed / requests_count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--requests', type=int, default=2_000)
+    parser.add_argument('--failure-rate', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"{'Proxies':>8} {'Original (µs/req)':>18} {'Heap (µs/req)':>14} {'Fenwick (µs/req)':>17}")
+    for size in args.sizes:
+        legacy = run(LegacyProxyRotator, size, args.requests, args.failure_rate, args.seed)
+        heap = run(ProxyRotator, size, args.requests, args.failure_rate, args.seed, 'least_used')
+        fenwick = run(ProxyRotator, size, args.requests, args.failure_rate, args.seed, 'weighted')
+        print(f"{size:>8} {legacy:>18.1f} {heap:>14.1f} {fenwick:>17.1f}")
+
+
+if __name__ == "__main__":
+    main()
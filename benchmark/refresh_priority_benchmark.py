@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la prioridad de refresco (imdb_scraper.refresh_priority)
+1. Simulación de un catálogo durante `--days` días con un presupuesto diario
+   de requests: unos pocos títulos cambian de rating a menudo (estrenos) y la
+   mayoría casi nunca (clásicos). Compara el orden fijo de la lista (por
+   turnos), el azar, RefreshScorer y un oráculo que conoce la probabilidad
+   real de cambio de cada título (cota inferior), midiendo el error de rating guardado
+   ponderado por ranking (Σ peso × |rating real − guardado|) tras cada día.
+   Cada refresco escribe una fila en `peliculas` como DatabasePipeline y
+   RefreshHistory lee el historial de esa base
+2. RefreshPriorityMiddleware.process_start con presupuesto sobre una fuente
+   grande, con la ventana por defecto y con una ventana del catálogo entero
+   (leer toda la fuente antes de emitir): candidatas leídas, espera hasta el
+   primer request, µs por candidata leída y cuántas de las emitidas están
+   entre las `budget` mejores del catálogo
+"""
+
+import argparse
+import asyncio
+import heapq
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scrapy
+from scrapy.statscollectors import MemoryStatsCollector
+from scrapy.utils.test import get_crawler
+
+from imdb_scraper.middlewares import RefreshPriorityMiddleware
+from imdb_scraper.refresh_priority import DAY_SECONDS, RefreshHistory, RefreshScorer
+
+
+class Catalogue:
+    """Ratings reales que cambian cada día con probabilidad propia de cada título"""
+
+    def __init__(self, titles: int, hot_fraction: float, seed: int):
+        rng = random.Random(seed)
+        self.rng = rng
+        self.ids = [f'tt{i:07d}' for i in range(1, titles + 1)]
+        self.rank = {title_id: i for i, title_id in enumerate(self.ids, 1)}
+        self.rating = {title_id: round(rng.uniform(6.0, 9.3), 1) for title_id in self.ids}
+        self.change_probability = {
+            title_id: 0.5 if rng.random() < hot_fraction else 0.01 for title_id in self.ids
+        }
+
+    def advance_day(self):
+        for title_id, probability in self.change_probability.items():
+            if self.rng.random() < probability:
+                delta = self.rng.choice((-0.1, 0.1))
+                self.rating[title_id] = round(min(10.0, max(1.0, self.rating[title_id] + delta)), 1)
+
+
+class PeliculasDB:
+    """Tabla peliculas de DatabasePipeline con fecha_scraping simulada"""
+
+    def __init__(self, path: str):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('''
+            CREATE TABLE peliculas (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ranking INTEGER,
+                titulo TEXT NOT NULL,
+                calificacion REAL,
+                fecha_scraping TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                imdb_id TEXT
+            )
+        ''')
+        self.connection.execute('CREATE INDEX idx_peliculas_imdb_id ON peliculas (imdb_id, fecha_scraping)')
+
+    def record(self, title_id: str, ranking: int, rating: float, now: float):
+        self.connection.execute(
+            "INSERT INTO peliculas (ranking, titulo, calificacion, fecha_scraping, imdb_id) "
+            "VALUES (?, ?, ?, datetime(?, 'unixepoch'), ?)",
+            (ranking, title_id, rating, now, title_id),
+        )
+
+    def commit(self):
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+
+def weighted_error(catalogue: Catalogue, stored: dict, scorer: RefreshScorer) -> float:
+    return sum(
+        scorer.rank_weight(catalogue.rank[title_id]) * abs(catalogue.rating[title_id] - stored[title_id])
+        for title_id in catalogue.ids
+    )
+
+
+def simulate(strategy: str, args, tmp: str) -> float:
+    """Error medio ponderado tras cada día (menor es mejor)"""
+    catalogue = Catalogue(args.titles, args.hot_fraction, args.seed)
+    scorer = RefreshScorer()
+    path = os.path.join(tmp, f'{strategy}.db')
+    database = PeliculasDB(path)
+    history = RefreshHistory(path)
+    rng = random.Random(args.seed + 1)
+
+    # Día 0: crawl completo
+    stored = dict(catalogue.rating)
+    for title_id in catalogue.ids:
+        database.record(title_id, catalogue.rank[title_id], catalogue.rating[title_id], now=0.0)
+    database.commit()
+
+    cursor = 0
+    last_refresh = dict.fromkeys(catalogue.ids, 0)
+    errors = []
+    for day in range(1, args.days + 1):
+        now = day * DAY_SECONDS
+        catalogue.advance_day()
+
+        if strategy == 'lista':
+            chosen = [catalogue.ids[(cursor + i) % len(catalogue.ids)] for i in range(args.budget)]
+            cursor = (cursor + args.budget) % len(catalogue.ids)
+        elif strategy == 'azar':
+            chosen = rng.sample(catalogue.ids, args.budget)
+        elif strategy == 'oráculo':
+            chosen = heapq.nlargest(args.budget, catalogue.ids, key=lambda title_id: (
+                (day - last_refresh[title_id]) * catalogue.change_probability[title_id]
+                * scorer.rank_weight(catalogue.rank[title_id])))
+        else:
+            chosen = heapq.nlargest(args.budget, catalogue.ids, key=lambda title_id: scorer.score(
+                history.get(title_id), catalogue.rank[title_id], now=now))
+
+        for title_id in chosen:
+            stored[title_id] = catalogue.rating[title_id]
+            last_refresh[title_id] = day
+            database.record(title_id, catalogue.rank[title_id], catalogue.rating[title_id], now=now)
+        database.commit()
+        errors.append(weighted_error(catalogue, stored, scorer))
+
+    history.close()
+    database.close()
+    return statistics.mean(errors)
+
+
+async def drain(middleware, candidates: int, read: list):
+    """Requests emitidos y segundos hasta el primero"""
+    async def start():
+        for i in range(1, candidates + 1):
+            read.append(i)
+            title_id = f'tt{i:07d}'
+            yield scrapy.Request(f'https://www.imdb.com/title/{title_id}/', dont_filter=True,
+                                 meta={'rank': i, 'title_id': title_id})
+
+    began = time.perf_counter()
+    first = None
+    emitted = []
+    async for request in middleware.process_start(start()):
+        if first is None:
+            first = time.perf_counter() - began
+        emitted.append(request.meta['title_id'])
+    return emitted, first
+
+
+def build_history(path: str, candidates: int):
+    """Mitad de los títulos con historial, con antigüedades distintas"""
+    database = PeliculasDB(path)
+    now = time.time()
+    for i in range(1, candidates + 1, 2):
+        database.record(f'tt{i:07d}', i, 8.0, now=now - (i % 30) * DAY_SECONDS)
+    database.commit()
+    database.close()
+
+
+def measure_middleware(path: str, candidates: int, budget: int, lookahead: int) -> dict:
+    history = RefreshHistory(path)
+    stats = MemoryStatsCollector(get_crawler())
+    middleware = RefreshPriorityMiddleware(history, RefreshScorer(), budget, stats, lookahead=lookahead)
+    read = []
+    start = time.perf_counter()
+    emitted, first = asyncio.run(drain(middleware, candidates, read))
+    elapsed = time.perf_counter() - start
+
+    # Las `budget` mejores del catálogo completo, con el mismo historial
+    scorer = RefreshScorer()
+    best = set(heapq.nlargest(budget, (f'tt{i:07d}' for i in range(1, candidates + 1)),
+                              key=lambda title_id: scorer.score(history.get(title_id), int(title_id[2:]))))
+    history.close()
+    return {
+        'read': len(read),
+        'emitted': len(emitted),
+        'first_ms': first * 1e3,
+        'us_per_read': elapsed / len(read) * 1e6,
+        'best': len(best & set(emitted)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--titles', type=int, default=5000)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--budget', type=int, default=500, help='Requests por día')
+    parser.add_argument('--hot-fraction', type=float, default=0.05)
+    parser.add_argument('--candidates', type=int, default=100_000)
+    parser.add_argument('--lookahead', type=int, default=1000, help='REFRESH_LOOKAHEAD')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"Catálogo de {args.titles} títulos ({args.hot_fraction:.0%} volátiles), "
+          f"{args.budget} requests/día durante {args.days} días")
+    print(f"{'Estrategia':<22} {'Error ponderado medio':>22}")
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {strategy: simulate(strategy, args, tmp)
+                   for strategy in ('lista', 'azar', 'prioridad', 'oráculo')}
+        for strategy, error in results.items():
+            print(f"{strategy:<22} {error:>22.2f}")
+
+        path = os.path.join(tmp, 'fuente.db')
+        build_history(path, args.candidates)
+        print(f"\nprocess_start: {args.candidates} candidatas, presupuesto {args.budget}")
+        print(f"{'Ventana':>10} {'Leídas':>8} {'Emitidas':>9} {'1er request (ms)':>17} "
+              f"{'µs/leída':>9} {'Entre las mejores':>18}")
+        for lookahead in (args.lookahead, args.candidates):
+            r = measure_middleware(path, args.candidates, args.budget, lookahead)
+            print(f"{lookahead:>10} {r['read']:>8} {r['emitted']:>9} {r['first_ms']:>17.1f} "
+                  f"{r['us_per_read']:>9.1f} {r['best']:>12}/{args.budget}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark de imdb_scraper.title_source.TitleIdSource
+Genera un title.basics.tsv.gz sintético (mismas columnas que el volcado de
+IMDb) y compara la lectura en streaming con la carga completa del fichero en
+una lista: tiempo hasta el primer ID, IDs por segundo y pico de memoria de
+Python (tracemalloc). Comprueba además que los shards son disjuntos y cubren
+la lectura sin shards, y que start_requests del spider es perezoso. Sale con
+código 1 si alguna comprobación falla
+"""
+
+import argparse
+import gzip
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scrapy.utils.test import get_crawler
+
+from imdb_scraper.spiders.top_movies import TopMoviesSpider
+from imdb_scraper.title_source import TitleIdSource
+
+TITLE_TYPES = ('movie', 'short', 'tvEpisode', 'tvSeries', 'tvMovie', 'video')
+
+
+def write_basics(path: str, rows: int, seed: int = 7):
+    rng = random.Random(seed)
+    with gzip.open(path, 'wt', encoding='utf-8', compresslevel=1) as f:
+        f.write('tconst\ttitleType\tprimaryTitle\toriginalTitle\tisAdult\tstartYear\tendYear\t'
+                'runtimeMinutes\tgenres\n')
+        for i in range(1, rows + 1):
+            year = str(rng.randint(1900, 2025)) if rng.random() > 0.05 else '\\N'
+            f.write(f"tt{i:07d}\t{rng.choice(TITLE_TYPES)}\tTitle {i}\tTitle {i}\t"
+                    f"{int(rng.random() < 0.02)}\t{year}\t\\N\t{rng.randint(5, 200)}\tDrama,Crime\n")
+
+
+def load_all(path: str, title_types) -> list:
+    """Lectura original: el fichero completo en memoria antes del primer request"""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        rows = [line.rstrip('\n').split('\t') for line in f]
+    return [row[0] for row in rows[1:] if row[1] in title_types and row[4] != '1']
+
+
+def measure(label: str, run) -> dict:
+    tracemalloc.start()
+    start = time.perf_counter()
+    first, count = run()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{label:<28} {first * 1000:>12.1f} {count / elapsed:>12,.0f} {peak / 1024 / 1024:>12.1f}")
+    return {'count': count}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=500_000)
+    parser.add_argument('--shards', type=int, default=4)
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'title.basics.tsv.gz')
+        write_basics(path, args.rows)
+        print(f"title.basics.tsv.gz sintético: {args.rows:,} filas, {os.path.getsize(path) // 1024} KB\n")
+
+        print(f"{'Lectura':<28} {'1er ID (ms)':>12} {'IDs/s':>12} {'Pico (MB)':>12}")
+
+        def full_load():
+            start = time.perf_counter()
+            ids = load_all(path, {'movie'})
+            return time.perf_counter() - start, len(ids)
+
+        def streaming():
+            start = time.perf_counter()
+            first = None
+            count = 0
+            for _ in TitleIdSource(path, title_types=['movie']):
+                if first is None:
+                    first = time.perf_counter() - start
+                count += 1
+            return first, count
+
+        loaded = measure('carga completa (lista)', full_load)
+        streamed = measure('TitleIdSource (streaming)', streaming)
+        if loaded['count'] != streamed['count']:
+            failures.append(f"streaming {streamed['count']} IDs, carga completa {loaded['count']}")
+
+        # Shards: disjuntos, misma posición y, juntos, la lectura completa
+        everything = list(TitleIdSource(path, title_types=['movie'], min_year=1990))
+        sharded = [list(TitleIdSource(path, title_types=['movie'], min_year=1990, shard=shard, shards=args.shards))
+                   for shard in range(args.shards)]
+        merged = sorted(pair for shard in sharded for pair in shard)
+        if merged != everything:
+            failures.append("los shards no reproducen la lectura sin shards")
+        sizes = ', '.join(str(len(shard)) for shard in sharded)
+        print(f"\nShards ({args.shards}) con types=movie, min_year=1990: {sizes} = {len(everything)} títulos")
+
+        # Texto plano con URLs y comentarios
+        text_path = os.path.join(tmp, 'ids.txt')
+        with open(text_path, 'w') as f:
+            f.write('# lista de prueba\nhttps://www.imdb.com/title/tt0111161/\n\ntt0068646\n')
+        if [title_id for _, title_id in TitleIdSource(text_path)] != ['tt0111161', 'tt0068646']:
+            failures.append("lectura de texto plano")
+
+        # El spider genera los requests bajo demanda: el primero sale sin leer el fichero
+        crawler = get_crawler(TopMoviesSpider, {'TITLE_IDS_FILE': path, 'EXTRACTION_CACHE_ENABLED': False})
+        spider = TopMoviesSpider.from_crawler(crawler, ids_types='movie', ids_limit='1000')
+        start = time.perf_counter()
+        requests = spider.start_requests()
+        first = next(requests)
+        first_ms = (time.perf_counter() - start) * 1000
+        remaining = sum(1 for _ in requests)
+        print(f"Spider: primer request en {first_ms:.1f} ms ({first.url}), {remaining + 1} con ids_limit=1000")
+        if remaining + 1 != 1000:
+            failures.append(f"ids_limit=1000 produjo {remaining + 1} requests")
+
+    if failures:
+        print("\nFallos:")
+        for failure in failures:
+            print(f"  ✗ {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la rotación de identidad TOR contra un puerto de control falso
+Compara la rotación bloqueante original (socket nuevo + time.sleep) con
+TorRotationMiddleware sobre TorControlClient, midiendo el bloqueo del reactor,
+la espera de requests por TOR y directos, y cuántos de los requests por TOR
+que disparan una rotación salen antes de que TOR acepte un NEWNYM (es decir,
+por el circuito anterior)
+"""
+
+import argparse
+import os
+import socket
+import socketserver
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scrapy import Request
+from scrapy.settings import Settings
+from scrapy.utils.defer import deferred_from_coro
+from twisted.internet import reactor, task
+
+from imdb_scraper.proxy_middleware import TorRotationMiddleware
+
+
+class FakeTorControl(socketserver.StreamRequestHandler):
+    """Puerto de control falso: acepta AUTHENTICATE y SIGNAL NEWNYM"""
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        for line in self.rfile:
+            line = line.strip()
+            if line.startswith(b'AUTHENTICATE'):
+                server.authentications += 1
+                self.wfile.write(b'250 OK\r\n')
+            elif line == b'SIGNAL NEWNYM':
+                server.newnyms += 1
+                self.wfile.write(b'250 OK\r\n')
+            else:
+                self.wfile.write(b'510 Unrecognized command\r\n')
+
+
+class FakeTorControlServer(socketserver.ThreadingTCPServer):
+    """Servidor en un hilo propio: debe responder aunque el reactor esté bloqueado"""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeTorControl)
+        self.connections = 0
+        self.authentications = 0
+        self.newnyms = 0
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+
+class BlockingTorRotation:
+    """Réplica de la rotación original: socket nuevo, autenticación y sleep en el reactor"""
+
+    def __init__(self, port, rotation_interval, circuit_wait):
+        self.port = port
+        self.rotation_interval = rotation_interval
+        self.circuit_wait = circuit_wait
+        self.request_count = 0
+
+    def process_request(self, request, spider):
+        self.request_count += 1
+        if self.request_count % self.rotation_interval == 0:
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+                s.connect(('127.0.0.1', self.port))
+                s.send(b'AUTHENTICATE\r\n')
+                if b'250 OK' in s.recv(1024):
+                    s.send(b'SIGNAL NEWNYM\r\n')
+                    if b'250 OK' in s.recv(1024):
+                        time.sleep(self.circuit_wait)
+        return None
+
+
+def run(variant, args):
+    server = FakeTorControlServer()
+    port = server.server_address[1]
+
+    if variant == 'blocking':
+        middleware = BlockingTorRotation(port, args.interval, args.circuit_wait)
+    else:
+        middleware = TorRotationMiddleware(Settings({
+            'TOR_ROTATION_ENABLED': True,
+            'TOR_ROTATION_INTERVAL': args.interval,
+            'TOR_CONTROL_PORT': port,
+            'TOR_NEWNYM_INTERVAL': args.newnym_interval,
+            'TOR_CIRCUIT_BUILD_WAIT': args.circuit_wait,
+        }))
+
+    # Medir cuánto tarda el reactor en atender un tick de 10ms
+    ticks = []
+    last_tick = [time.monotonic()]
+
+    def tick():
+        now = time.monotonic()
+        ticks.append(now - last_tick[0])
+        last_tick[0] = now
+
+    ticker = task.LoopingCall(tick)
+    ticker.start(0.01)
+
+    waits = {'tor': [], 'direct': []}
+    stale = []
+
+    def send(i):
+        # Impares por TOR: con un intervalo par, los que disparan la rotación también
+        routed = 'tor' if i % 2 else 'direct'
+        proxy = 'http://127.0.0.1:8118' if routed == 'tor' else 'http://10.0.0.1:8080'
+        request = Request(f"http://imdb.test/title/tt{i:07d}/", meta={'proxy': proxy})
+        start = time.monotonic()
+        newnyms = server.newnyms
+
+        def released(_):
+            waits[routed].append(time.monotonic() - start)
+            if routed == 'tor' and (i + 1) % args.interval == 0:
+                stale.append(server.newnyms == newnyms)
+
+        if variant == 'blocking':
+            middleware.process_request(request, None)
+            released(None)
+        else:
+            d = deferred_from_coro(middleware.process_request(request, None))
+            d.addCallback(released)
+
+    for i in range(args.requests):
+        reactor.callLater(i * args.spacing, send, i)
+
+    def stop():
+        ticker.stop()
+        reactor.stop()
+
+    reactor.callLater(args.requests * args.spacing + args.newnym_interval + args.circuit_wait + 0.5, stop)
+    return server, ticks, waits, stale
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('variant', choices=['blocking', 'async'])
+    parser.add_argument('--requests', type=int, default=80)
+    parser.add_argument('--spacing', type=float, default=0.05, help='Segundos entre requests')
+    parser.add_argument('--interval', type=int, default=8, help='TOR_ROTATION_INTERVAL')
+    parser.add_argument('--newnym-interval', type=float, default=1.0)
+    parser.add_argument('--circuit-wait', type=float, default=0.5)
+    args = parser.parse_args()
+
+    server, ticks, waits, stale = run(args.variant, args)
+    reactor.run()
+
+    def p95(values):
+        return sorted(values)[int(len(values) * 0.95) - 1] if values else 0.0
+
+    print(f"Variante: {args.variant}")
+    print(f"  Conexiones de control: {server.connections}, "
+          f"autenticaciones: {server.authentications}, NEWNYM: {server.newnyms}")
+    print(f"  Bloqueo máximo del reactor: {max(ticks) * 1000:.0f} ms")
+    for routed, values in waits.items():
+        print(f"  Espera requests {routed:<6}: mediana {statistics.median(values) * 1000:.0f} ms, "
+              f"p95 {p95(values) * 1000:.0f} ms, máx {max(values) * 1000:.0f} ms")
+    print(f"  Requests por TOR que disparan la rotación y salen por el circuito anterior: "
+          f"{sum(stale)}/{len(stale)}")
+
+
+if __name__ == "__main__":
+    main()
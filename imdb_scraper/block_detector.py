@@ -0,0 +1,183 @@
+"""
+Detección de páginas de bloqueo (desafíos anti-bot, captchas, rate limit)
+Inspecciona solo el <title> y, si hace falta, un prefijo acotado del cuerpo,
+sin copiar ni pasar a minúsculas la página completa
+"""
+
+import re
+import sys
+import zlib
+from typing import Iterable, Optional
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+# Mismos módulos zstd que HttpCompressionMiddleware (solo anuncia zstd si hay uno)
+try:
+    if sys.version_info >= (3, 14):
+        from compression import zstd
+    else:
+        from backports import zstd
+except ImportError:
+    zstd = None
+
+
+# Códigos de estado que indican bloqueo
+DEFAULT_STATUS_CODES = (403, 429, 503, 521, 522, 523, 524)
+
+# Frases que solo cuentan dentro de <title>: en el cuerpo de una ficha
+# legítima aparecen en reseñas, tramas o scripts
+DEFAULT_TITLE_SIGNATURES = (
+    'access denied',
+    'attention required',
+    'just a moment',
+    'too many requests',
+    'rate limit',
+    'robot check',
+    'are you a robot',
+    'captcha',
+    'blocked',
+    'please verify',
+)
+
+# Marcadores propios de las páginas de desafío, válidos en cualquier parte del prefijo
+DEFAULT_MARKERS = (
+    '/cdn-cgi/challenge-platform/',  # Cloudflare managed challenge
+    '_cf_chl_opt',
+    'cf-error-details',  # Cloudflare 1020 / bloqueo por firewall
+    'awswafcookiedomainlist',  # AWS WAF (captcha de IMDb)
+    'captcha-sdk.awswaf.com',
+    'captcha-delivery.com',  # DataDome
+    'px-captcha',  # PerimeterX
+    'distil_r_captcha',  # Distil / Imperva
+)
+
+# Títulos de las fichas legítimas: si el <title> termina así no se buscan marcadores
+DEFAULT_TRUSTED_TITLES = (
+    ' - imdb',
+)
+
+# Las páginas de bloqueo son pequeñas y el <title> de IMDb está al principio
+DEFAULT_SCAN_BYTES = 32 * 1024
+
+TITLE_RE = re.compile(rb'<title[^>]*>([^<]{0,512})', re.IGNORECASE)
+
+
+class BlockDetector:
+    """
+    Clasificador de respuestas bloqueadas
+
+    Solo se inspeccionan regiones concretas de los primeros `scan_bytes`
+    bytes: el texto de <title>, que si es el de una ficha conocida (termina
+    en un título de confianza) da la respuesta por buena y si no se compara
+    con las firmas de título, y después los marcadores de desafío con un
+    único patrón compilado. Las fichas legítimas se resuelven con la
+    lectura del título. Los cuerpos sin descomprimir (p. ej. en la señal
+    response_downloaded, antes de HttpCompressionMiddleware) se descomprimen
+    solo hasta ese tamaño: gzip y deflate siempre, br y zstd si está
+    instalado el mismo módulo con el que Scrapy los anuncia.
+    """
+
+    def __init__(self, status_codes: Iterable[int] = DEFAULT_STATUS_CODES,
+                 title_signatures: Iterable[str] = DEFAULT_TITLE_SIGNATURES,
+                 markers: Iterable[str] = DEFAULT_MARKERS,
+                 trusted_titles: Iterable[str] = DEFAULT_TRUSTED_TITLES,
+                 scan_bytes: int = DEFAULT_SCAN_BYTES):
+        self.status_codes = frozenset(int(code) for code in status_codes)
+        self.scan_bytes = scan_bytes
+        self.title_pattern = self._compile(title_signatures)
+        self.marker_pattern = self._compile(markers)
+        self.trusted_titles = tuple(title.lower().encode() for title in trusted_titles if title)
+
+    @classmethod
+    def from_settings(cls, settings):
+        """Crear instancia desde settings"""
+        return cls(
+            status_codes=settings.getlist('BLOCK_PAGE_STATUS_CODES') or DEFAULT_STATUS_CODES,
+            title_signatures=settings.getlist('BLOCK_PAGE_TITLE_SIGNATURES') or DEFAULT_TITLE_SIGNATURES,
+            markers=settings.getlist('BLOCK_PAGE_MARKERS') or DEFAULT_MARKERS,
+            trusted_titles=settings.getlist('BLOCK_PAGE_TRUSTED_TITLES', DEFAULT_TRUSTED_TITLES),
+            scan_bytes=settings.getint('BLOCK_PAGE_SCAN_BYTES', DEFAULT_SCAN_BYTES),
+        )
+
+    @staticmethod
+    def _compile(phrases: Iterable[str]):
+        """Una alternativa de literales en minúsculas (se buscan sobre texto en minúsculas)"""
+        alternation = b'|'.join(re.escape(phrase.lower().encode()) for phrase in phrases if phrase)
+        return re.compile(alternation) if alternation else None
+
+    def match(self, response) -> Optional[str]:
+        """
+        Motivo del bloqueo o None si la respuesta parece legítima
+
+        Returns:
+            str: 'status NNN', el título o el marcador que coincidió
+        """
+        if response.status in self.status_codes:
+            return f'status {response.status}'
+
+        body = response.body
+        end = self.scan_bytes
+        encoding = response.headers.get(b'Content-Encoding', b'').lower()
+        if encoding:
+            body = self._decode_prefix(body, encoding)
+            end = len(body)
+
+        # pos/endpos acotan la búsqueda sin copiar el cuerpo
+        title = TITLE_RE.search(body, 0, end)
+        if title:
+            text = title.group(1).strip().lower()
+            # Antes que las firmas: una película puede llamarse "Blocked" o "Captcha"
+            if text.endswith(self.trusted_titles):
+                return None
+            if self.title_pattern is not None and self.title_pattern.search(text):
+                return f"título '{text.decode('utf-8', 'replace')}'"
+
+        if self.marker_pattern is not None:
+            found = self.marker_pattern.search(body[:end].lower())
+            if found:
+                return f"marcador '{found.group(0).decode('ascii', 'replace')}'"
+
+        return None
+
+    def is_blocked(self, response) -> bool:
+        """Detectar si la respuesta indica bloqueo"""
+        return self.match(response) is not None
+
+    def _decode_prefix(self, body: bytes, encoding: bytes) -> bytes:
+        """Descomprimir como mucho `scan_bytes` bytes del cuerpo (códec no disponible: sin inspección)"""
+        compressed = memoryview(body)[:self.scan_bytes]
+        if encoding == b'br':
+            if brotli is None:
+                return b''
+            try:
+                return brotli.Decompressor().process(compressed, output_buffer_limit=self.scan_bytes)
+            except brotli.error:
+                return b''
+        if encoding == b'zstd':
+            if zstd is None:
+                return b''
+            try:
+                return zstd.ZstdDecompressor().decompress(compressed, max_length=self.scan_bytes)
+            except zstd.ZstdError:
+                return b''
+
+        if encoding in (b'gzip', b'x-gzip'):
+            wbits_options = (16 + zlib.MAX_WBITS,)
+        elif encoding == b'deflate':
+            # deflate con cabecera zlib o en crudo, según el servidor
+            wbits_options = (zlib.MAX_WBITS, -zlib.MAX_WBITS)
+        else:
+            return b''
+
+        for wbits in wbits_options:
+            try:
+                return zlib.decompressobj(wbits).decompress(compressed, self.scan_bytes)
+            except zlib.error:
+                continue
+        return b''
@@ -0,0 +1,253 @@
+"""
+Plazo fijo para el crawl (CRAWL_DEADLINE_SECONDS)
+Estima el ritmo real de descarga (respuestas por segundo en una ventana
+deslizante, con delays, jitter y reintentos incluidos) y decide qué trabajo
+cabe todavía en el tiempo que queda, para que el crawl termine a tiempo con
+los títulos de más prioridad hechos
+"""
+
+import logging
+import time
+from collections import Counter, deque
+from typing import Optional
+
+from scrapy import signals
+from scrapy.utils.defer import deferred_from_coro
+
+
+class CrawlDeadline:
+    """
+    Presupuesto de tiempo del crawl compartido por el spider y los middlewares
+
+    El trabajo pendiente se cuenta por prioridad de Scrapy con las señales
+    request_scheduled / request_dropped y CrawlDeadlineMiddleware lo descuenta
+    al salir de la cola. Un request cabe si
+
+        (segundos restantes − espera) × respuestas/s ≥ en vuelo + pendientes por delante + 1
+
+    donde «por delante» son los pendientes de mayor prioridad (o igual, para
+    un reintento: a igualdad de prioridad va antes el trabajo nuevo). Orden
+    en que se recorta al apretar el plazo:
+
+    - Fichas opcionales (meta['optional'], p. ej. el detalle del modo 'chart'):
+      solo si cabe todo lo pendiente además de ellas
+    - Reintentos: si no caben por delante del trabajo de su prioridad o su
+      backoff acaba después del plazo
+    - Trabajo nuevo: el spider deja de leer la fuente de IDs y los requests
+      de la cola que ya no caben se descartan
+
+    Sin `min_samples` respuestas no hay estimación y solo cuenta el tiempo
+    restante. Los últimos `reserve` segundos no empieza nada nuevo (quedan
+    para los requests en vuelo y los pipelines); al agotarse el plazo
+    completo se cierra el spider con el motivo 'deadline'.
+    """
+
+    def __init__(self, crawler, budget: float, reserve: float = 30.0, window: float = 60.0,
+                 min_samples: int = 5, clock=time.monotonic):
+        self.crawler = crawler
+        self.budget = budget
+        self.reserve = min(reserve, budget)
+        self.window = window
+        self.min_samples = min_samples
+        self.clock = clock
+        self.logger = logging.getLogger(__name__)
+
+        self.started_at = clock()
+        self.completions = deque()
+        self.completed = 0
+        self.pending = Counter()
+        self.parked = Counter()
+        self.skipped = Counter()
+        self.start_stopped_at = None
+        self._timer = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """Crear el plazo si CRAWL_DEADLINE_SECONDS > 0; None en caso contrario"""
+        settings = crawler.settings
+        budget = settings.getfloat('CRAWL_DEADLINE_SECONDS', 0)
+        if budget <= 0:
+            return None
+
+        deadline = cls(
+            crawler,
+            budget,
+            reserve=settings.getfloat('CRAWL_DEADLINE_RESERVE_SECONDS', 30.0),
+            window=settings.getfloat('CRAWL_DEADLINE_WINDOW_SECONDS', 60.0),
+            min_samples=settings.getint('CRAWL_DEADLINE_MIN_SAMPLES', 5),
+        )
+        crawler.signals.connect(deadline.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(deadline.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(deadline.request_scheduled, signal=signals.request_scheduled)
+        crawler.signals.connect(deadline.request_dropped, signal=signals.request_dropped)
+        crawler.signals.connect(deadline.request_left_downloader, signal=signals.request_left_downloader)
+        return deadline
+
+    # Estimación
+
+    def elapsed(self) -> float:
+        return self.clock() - self.started_at
+
+    def remaining(self) -> float:
+        """Segundos en los que aún se puede empezar trabajo nuevo"""
+        return self.budget - self.reserve - self.elapsed()
+
+    def throughput(self) -> Optional[float]:
+        """Respuestas por segundo en la ventana; None sin muestras suficientes"""
+        now = self.clock()
+        while self.completions and now - self.completions[0] > self.window:
+            self.completions.popleft()
+        if len(self.completions) < self.min_samples:
+            return None
+        span = min(self.window, now - self.started_at)
+        return len(self.completions) / span if span > 0 else None
+
+    def in_flight(self) -> int:
+        """Requests en el downloader (middlewares, delays y descarga), sin contar el actual"""
+        engine = self.crawler.engine
+        if engine is None or engine.downloader is None:
+            return 0
+        return max(0, len(engine.downloader.active) - 1)
+
+    def pending_ahead(self, priority: int, inclusive: bool = False) -> int:
+        """Requests en cola (o reintentos aparcados) que saldrán antes que uno de `priority`"""
+        return sum(
+            count for queue in (self.pending, self.parked) for queued, count in queue.items()
+            if queued > priority or (inclusive and queued == priority)
+        )
+
+    def backlog(self) -> int:
+        return sum(self.pending.values()) + sum(self.parked.values())
+
+    def fits(self, needed: int, wait: float = 0.0) -> bool:
+        """¿Caben `needed` respuestas más (tras esperar `wait` segundos)?"""
+        available = self.remaining() - wait
+        if available <= 0:
+            return False
+        rate = self.throughput()
+        return rate is None or available * rate >= needed
+
+    # Decisiones
+
+    def admit(self, request) -> Optional[str]:
+        """
+        Request que sale de la cola del scheduler: None si cabe, o el motivo
+        del descarte ('optional', 'retry' o 'request')
+        """
+        self._unqueue(request)
+        in_flight = self.in_flight()
+
+        if request.meta.get('optional'):
+            needed, kind = in_flight + self.backlog() + 1, 'optional'
+        elif request.meta.get('retry_times'):
+            needed, kind = in_flight + self.pending_ahead(request.priority, inclusive=True) + 1, 'retry'
+        else:
+            needed, kind = in_flight + self.pending_ahead(request.priority) + 1, 'request'
+
+        if self.fits(needed):
+            return None
+        self.skip(kind, request)
+        return kind
+
+    def admits_retry(self, request, wait: float = 0.0) -> bool:
+        """
+        ¿Compensa reintentar `request` tras `wait` segundos de backoff?
+
+        Un reintento aceptado con espera cuenta como trabajo por delante de
+        los de menor prioridad hasta que vuelve a la cola.
+        """
+        needed = self.in_flight() + self.pending_ahead(request.priority, inclusive=True) + 1
+        if not self.fits(needed, wait):
+            self.skip('retry', request)
+            return False
+
+        if wait > 0:
+            self.parked[request.priority] += 1
+            request.meta['deadline_parked'] = True
+        return True
+
+    def unpark(self, request):
+        """El reintento aceptado por admits_retry no llegó a aparcarse"""
+        if request.meta.pop('deadline_parked', False):
+            self._unqueue(request, self.parked)
+
+    def accepts_new(self) -> bool:
+        """¿Cabe un request nuevo detrás de todo lo pendiente?"""
+        return self.fits(self.in_flight() + self.backlog() + 1)
+
+    def stop_start(self, position):
+        """El spider deja de leer la fuente de IDs en `position`"""
+        self.start_stopped_at = position
+        self.crawler.stats.set_value('deadline/start_stopped_at', position)
+        rate = self.throughput()
+        self.logger.warning(
+            f"⏰ Plazo del crawl: no se leen más títulos desde la posición {position} "
+            f"({max(0.0, self.remaining()):.0f}s restantes"
+            + (f", {rate:.2f} respuestas/s)" if rate is not None else ")")
+        )
+
+    def skip(self, kind: str, request):
+        self.skipped[kind] += 1
+        self.crawler.stats.inc_value(f'deadline/skipped/{kind}')
+        self.logger.debug(f"⏰ Plazo del crawl: {kind} descartado {request.url}")
+
+    # Señales
+
+    def _unqueue(self, request, queue=None):
+        queue = self.pending if queue is None else queue
+        priority = request.priority
+        queue[priority] -= 1
+        if queue[priority] <= 0:
+            del queue[priority]
+
+    def request_scheduled(self, request, spider):
+        self.unpark(request)
+        self.pending[request.priority] += 1
+
+    def request_dropped(self, request, spider):
+        self._unqueue(request)
+
+    def request_left_downloader(self, request, spider):
+        self.completions.append(self.clock())
+        self.completed += 1
+
+    def spider_opened(self, spider):
+        """Empezar a contar y programar el cierre forzoso al agotar el plazo"""
+        from twisted.internet import reactor
+
+        self.started_at = self.clock()
+        self._timer = reactor.callLater(self.budget, self._hard_stop)
+        self.logger.info(f"⏰ Plazo del crawl: {self.budget:.0f}s ({self.reserve:.0f}s de reserva)")
+
+    def _hard_stop(self):
+        self._timer = None
+        self.crawler.stats.set_value('deadline/hard_stop', 1)
+        self.logger.warning(f"⏰ Plazo del crawl agotado ({self.budget:.0f}s): cerrando el spider")
+        engine = self.crawler.engine
+        if hasattr(engine, 'close_spider_async'):
+            deferred_from_coro(engine.close_spider_async(reason='deadline'))
+        else:
+            # Scrapy anteriores (requirements.txt admite 2.11): close_spider con Deferred
+            engine.close_spider(self.crawler.spider, 'deadline')
+
+    def spider_closed(self, spider):
+        """Cancelar el cierre forzoso y registrar lo que se ha recortado"""
+        if self._timer is not None and self._timer.active():
+            self._timer.cancel()
+        self._timer = None
+
+        elapsed = self.elapsed()
+        stats = self.crawler.stats
+        stats.set_value('deadline/budget_seconds', self.budget)
+        stats.set_value('deadline/elapsed_seconds', round(elapsed, 1))
+        stats.set_value('deadline/completed', self.completed)
+        if elapsed > 0:
+            stats.set_value('deadline/throughput', round(self.completed / elapsed, 2))
+
+        self.logger.info(
+            f"⏰ Plazo del crawl: {elapsed:.0f}s de {self.budget:.0f}s; descartados "
+            f"{self.skipped['retry']} reintentos, {self.skipped['optional']} fichas opcionales y "
+            f"{self.skipped['request']} requests en cola"
+            + (f"; fuente de IDs detenida en la posición {self.start_stopped_at}"
+               if self.start_stopped_at is not None else "")
+        )
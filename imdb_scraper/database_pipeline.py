@@ -34,10 +34,18 @@ class DatabasePipeline:
                 duracion TEXT,
                 metascore INTEGER,
                 actores TEXT,
-                fecha_scraping TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                fecha_scraping TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                imdb_id TEXT
             )
         ''')
         
+        # Bases anteriores sin imdb_id; RefreshPriorityMiddleware lee de aquí
+        # el historial de refrescos de cada título
+        self.cursor.execute('PRAGMA table_info(peliculas)')
+        if 'imdb_id' not in {column[1] for column in self.cursor.fetchall()}:
+            self.cursor.execute('ALTER TABLE peliculas ADD COLUMN imdb_id TEXT')
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_peliculas_imdb_id ON peliculas (imdb_id, fecha_scraping)')
+        
         # Crear tabla de actores (modelo relacional)
         self.cursor.execute('''
             CREATE TABLE IF NOT EXISTS actores (
@@ -50,13 +58,38 @@ class DatabasePipeline:
             )
         ''')
         
-        # Limpiar datos anteriores del mismo scraping
-        self.cursor.execute('DELETE FROM actores WHERE DATE(fecha_creacion) = DATE("now")')
-        self.cursor.execute('DELETE FROM peliculas WHERE DATE(fecha_scraping) = DATE("now")')
+        # Con re-crawl condicional las fichas sin cambios no se vuelven a
+        # escribir: no se borra lo del día y cada ficha actualiza su fila del
+        # día (una por título, año y día; el historial de días anteriores se
+        # conserva igual que sin re-crawl condicional)
+        self.upsert = spider.settings.getbool('CONDITIONAL_REQUESTS_ENABLED')
+        if self.upsert:
+            self._ensure_daily_unique_titles()
+        else:
+            # Limpiar datos anteriores del mismo scraping
+            self.cursor.execute('DELETE FROM actores WHERE DATE(fecha_creacion) = DATE("now")')
+            self.cursor.execute('DELETE FROM peliculas WHERE DATE(fecha_scraping) = DATE("now")')
         self.connection.commit()
         
         spider.logger.info("🗄️ Base de datos SQLite inicializada")
     
+    # Clave de la fila del día; COALESCE para que un año NULL no escape al índice único
+    DAILY_KEY = "titulo, COALESCE(anio, ''), DATE(fecha_scraping)"
+    
+    def _ensure_daily_unique_titles(self):
+        """Índice único por (titulo, anio, día), quitando antes los duplicados del mismo día"""
+        self.cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_peliculas_titulo_anio_dia'"
+        )
+        if self.cursor.fetchone():
+            return
+        
+        # Dentro de cada día se conserva la fila más reciente; los demás días no se tocan
+        duplicates = f'SELECT id FROM peliculas WHERE id NOT IN (SELECT MAX(id) FROM peliculas GROUP BY {self.DAILY_KEY})'
+        self.cursor.execute(f'DELETE FROM actores WHERE pelicula_id IN ({duplicates})')
+        self.cursor.execute(f'DELETE FROM peliculas WHERE id IN ({duplicates})')
+        self.cursor.execute(f'CREATE UNIQUE INDEX idx_peliculas_titulo_anio_dia ON peliculas ({self.DAILY_KEY})')
+    
     def close_spider(self, spider):
         if self.connection:
             self.connection.close()
@@ -78,22 +111,50 @@ class DatabasePipeline:
                 except (ValueError, AttributeError):
                     pass
             
-            # Insertar película en base de datos
-            self.cursor.execute('''
-                INSERT INTO peliculas (ranking, titulo, anio, calificacion, duracion, metascore, actores)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
+            values = (
                 adapter.get('ranking'),
                 adapter.get('titulo'),
                 adapter.get('anio'),
                 calificacion,
                 adapter.get('duracion'),
                 metascore,
-                adapter.get('actores')
-            ))
+                adapter.get('actores'),
+                adapter.get('imdb_id')
+            )
             
-            # Obtener el ID de la película insertada
-            pelicula_id = self.cursor.lastrowid
+            if self.upsert:
+                # Insertar o actualizar la fila del día (UPSERT, como en PostgreSQL)
+                self.cursor.execute(f'''
+                    INSERT INTO peliculas (ranking, titulo, anio, calificacion, duracion, metascore, actores, imdb_id)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT ({self.DAILY_KEY}) DO UPDATE SET
+                        ranking = excluded.ranking,
+                        calificacion = excluded.calificacion,
+                        duracion = excluded.duracion,
+                        metascore = excluded.metascore,
+                        actores = excluded.actores,
+                        imdb_id = excluded.imdb_id,
+                        fecha_scraping = CURRENT_TIMESTAMP
+                ''', values)
+                
+                # Obtener el ID de la fila del día (lastrowid no sirve si se actualizó)
+                self.cursor.execute(
+                    f"SELECT id FROM peliculas WHERE ({self.DAILY_KEY}) = (?, COALESCE(?, ''), DATE('now'))",
+                    (adapter.get('titulo'), adapter.get('anio'))
+                )
+                pelicula_id = self.cursor.fetchone()[0]
+                
+                # Los actores se reemplazan por los de esta ficha
+                self.cursor.execute('DELETE FROM actores WHERE pelicula_id = ?', (pelicula_id,))
+            else:
+                # Insertar película en base de datos
+                self.cursor.execute('''
+                    INSERT INTO peliculas (ranking, titulo, anio, calificacion, duracion, metascore, actores, imdb_id)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', values)
+                
+                # Obtener el ID de la película insertada
+                pelicula_id = self.cursor.lastrowid
             
             # Insertar actores en tabla separada (modelo relacional)
             actores_str = adapter.get('actores', '')
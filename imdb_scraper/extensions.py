@@ -0,0 +1,348 @@
+"""
+Extensiones de Scrapy para el scraper de IMDb
+Incluye el control adaptativo de concurrencia (AIMD) por slot de descarga y
+el corte anticipado de las descargas de fichas
+"""
+
+import logging
+import time
+import zlib
+from typing import Dict
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured, StopDownload
+
+from .block_detector import BlockDetector
+from .selector_factory import RequiredDataScanner
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class SlotRateState:
+    """Estado del controlador AIMD para un slot de descarga"""
+
+    __slots__ = ('concurrency', 'delay', 'successes', 'blocks', 'last_decrease')
+
+    def __init__(self, concurrency: float, delay: float):
+        self.concurrency = concurrency
+        self.delay = delay
+        self.successes = 0
+        self.blocks = 0
+        self.last_decrease = float('-inf')
+
+
+class AdaptiveConcurrency:
+    """
+    Controlador AIMD (aumento aditivo, disminución multiplicativa) por slot
+
+    Cada respuesta descargada se clasifica con el mismo BlockDetector que usa
+    ProxyRotationMiddleware (aquí el cuerpo aún puede venir comprimido). Tras
+    `increase_every` éxitos seguidos el slot acelera un paso: primero reduce
+    el delay y, con el delay al mínimo, sube la concurrencia. Un bloqueo multiplica la concurrencia por
+    `decrease_factor` y divide el delay por el mismo factor. Los bloqueos que
+    llegan durante el enfriamiento corresponden a requests enviados con el
+    ritmo anterior y no vuelven a penalizar al slot.
+
+    El límite global del downloader parte de CONCURRENT_REQUESTS (por defecto
+    un request a la vez) y sigue a la suma de la concurrencia de los slots
+    activos: crece a medida que los slots responden sin bloqueos y baja con
+    ellos, sin pasar de `max_total_concurrency`.
+    """
+
+    def __init__(self, crawler, min_concurrency: int = 1, max_concurrency: int = 4,
+                 min_delay: float = 0.5, max_delay: float = 30.0, delay_step: float = 0.25,
+                 increase_every: int = 10, decrease_factor: float = 0.5,
+                 cooldown: float = 5.0, block_detector: BlockDetector = None,
+                 min_total_concurrency: int = 1, max_total_concurrency: int = 16):
+        self.crawler = crawler
+        self.block_detector = block_detector or BlockDetector()
+        self.min_concurrency = max(1, min_concurrency)
+        self.max_concurrency = max(self.min_concurrency, max_concurrency)
+        self.min_total_concurrency = max(1, min_total_concurrency)
+        self.max_total_concurrency = max(self.min_total_concurrency, max_total_concurrency)
+        self.peak_total_concurrency = self.min_total_concurrency
+        self.min_delay = min_delay
+        self.max_delay = max(min_delay, max_delay)
+        self.delay_step = delay_step
+        self.increase_every = max(1, increase_every)
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self.logger = logging.getLogger(__name__)
+
+        self.slots: Dict[str, SlotRateState] = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """Crear instancia desde crawler"""
+        settings = crawler.settings
+        if not settings.getbool('ADAPTIVE_CONCURRENCY_ENABLED', False):
+            raise NotConfigured
+
+        decrease_factor = settings.getfloat('ADAPTIVE_DECREASE_FACTOR', 0.5)
+        if not 0 < decrease_factor < 1:
+            raise NotConfigured("ADAPTIVE_DECREASE_FACTOR debe estar entre 0 y 1")
+
+        if settings.getbool('AUTOTHROTTLE_ENABLED'):
+            logging.getLogger(__name__).warning(
+                "AutoThrottle y AdaptiveConcurrency ajustan el mismo delay de los slots; "
+                "desactiva AUTOTHROTTLE_ENABLED"
+            )
+
+        extension = cls(
+            crawler,
+            min_concurrency=settings.getint('ADAPTIVE_CONCURRENCY_MIN', 1),
+            max_concurrency=settings.getint('ADAPTIVE_CONCURRENCY_MAX', 4),
+            min_delay=settings.getfloat('ADAPTIVE_DELAY_MIN', 0.5),
+            max_delay=settings.getfloat('ADAPTIVE_DELAY_MAX', 30.0),
+            delay_step=settings.getfloat('ADAPTIVE_DELAY_STEP', 0.25),
+            increase_every=settings.getint('ADAPTIVE_INCREASE_EVERY', 10),
+            decrease_factor=decrease_factor,
+            cooldown=settings.getfloat('ADAPTIVE_BLOCK_COOLDOWN', 5.0),
+            block_detector=BlockDetector.from_settings(settings),
+            min_total_concurrency=settings.getint('CONCURRENT_REQUESTS', 1),
+            max_total_concurrency=settings.getint('ADAPTIVE_TOTAL_CONCURRENCY_MAX', 16),
+        )
+        crawler.signals.connect(extension.response_downloaded, signal=signals.response_downloaded)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        return extension
+
+    def response_downloaded(self, response, request, spider):
+        """Clasificar la respuesta y ajustar el slot que la descargó"""
+        key = request.meta.get('download_slot')
+        slot = self.crawler.engine.downloader.slots.get(key)
+        if slot is None:
+            return
+
+        state = self.slots.get(key)
+        if state is None:
+            # Se parte de los valores estáticos del slot (DOWNLOAD_DELAY, etc.)
+            state = SlotRateState(
+                concurrency=min(max(slot.concurrency, self.min_concurrency), self.max_concurrency),
+                delay=min(max(slot.delay, self.min_delay), self.max_delay),
+            )
+            self.slots[key] = state
+
+        if self.block_detector.is_blocked(response):
+            self._on_block(key, state)
+        elif response.status < 500:
+            self._on_success(key, state)
+
+        # Los slots inactivos se recrean con los valores por defecto, así que
+        # el estado del controlador se vuelve a aplicar en cada respuesta
+        slot.concurrency = int(state.concurrency)
+        slot.delay = state.delay
+        self._update_total_concurrency()
+
+    def _update_total_concurrency(self):
+        """Límite global = suma de los slots vivos, entre CONCURRENT_REQUESTS y el techo"""
+        downloader = self.crawler.engine.downloader
+        total = sum(int(state.concurrency) for key, state in self.slots.items() if key in downloader.slots)
+        total = min(self.max_total_concurrency, max(self.min_total_concurrency, total))
+        if total != downloader.total_concurrency:
+            downloader.total_concurrency = total
+            self.peak_total_concurrency = max(self.peak_total_concurrency, total)
+
+    def _on_success(self, key: str, state: SlotRateState):
+        """Aumento aditivo tras una racha de éxitos"""
+        state.successes += 1
+        if state.successes < self.increase_every:
+            return
+
+        state.successes = 0
+        if state.delay > self.min_delay:
+            state.delay = max(self.min_delay, state.delay - self.delay_step)
+        elif state.concurrency < self.max_concurrency:
+            state.concurrency = min(self.max_concurrency, state.concurrency + 1)
+        else:
+            return
+
+        self._inc_stat('increases')
+        self.logger.debug(
+            f"Slot {key} acelera: concurrencia {int(state.concurrency)}, delay {state.delay:.2f}s"
+        )
+
+    def _on_block(self, key: str, state: SlotRateState):
+        """Disminución multiplicativa ante un bloqueo"""
+        state.successes = 0
+        state.blocks += 1
+        self._inc_stat('blocks')
+
+        now = time.monotonic()
+        if now - state.last_decrease < max(self.cooldown, state.delay):
+            return
+
+        state.last_decrease = now
+        state.concurrency = max(self.min_concurrency, state.concurrency * self.decrease_factor)
+        state.delay = min(self.max_delay, max(state.delay, self.delay_step) / self.decrease_factor)
+
+        self._inc_stat('decreases')
+        self.logger.info(
+            f"🐢 Bloqueo en slot {key}: concurrencia {int(state.concurrency)}, delay {state.delay:.2f}s"
+        )
+
+    def _inc_stat(self, key: str, count=1):
+        if self.crawler.stats:
+            self.crawler.stats.inc_value(f'adaptive_concurrency/{key}', count)
+
+    def spider_closed(self, spider):
+        """Registrar el ritmo final alcanzado por cada slot"""
+        if not self.slots:
+            return
+
+        for key, state in sorted(self.slots.items()):
+            self.logger.info(
+                f"Slot {key}: concurrencia {int(state.concurrency)}, "
+                f"delay {state.delay:.2f}s, {state.blocks} bloqueos"
+            )
+
+        if self.crawler.stats:
+            rates = [int(s.concurrency) / max(s.delay, 0.001) for s in self.slots.values()]
+            self.crawler.stats.set_value('adaptive_concurrency/slots', len(self.slots))
+            self.crawler.stats.set_value('adaptive_concurrency/max_slot_rate', round(max(rates), 2))
+            self.crawler.stats.set_value('adaptive_concurrency/peak_total_concurrency', self.peak_total_concurrency)
+
+
+class StreamDecoder:
+    """Descompresión incremental del cuerpo según Content-Encoding"""
+
+    __slots__ = ('_decompress', 'buffer', 'checked_at', 'scanner', 'wire_bytes', 'expected_bytes')
+
+    def __init__(self, decompress, expected_bytes: int):
+        self._decompress = decompress
+        self.buffer = bytearray()
+        self.checked_at = 0
+        self.scanner = RequiredDataScanner()
+        self.wire_bytes = 0
+        self.expected_bytes = expected_bytes
+
+    @classmethod
+    def for_encoding(cls, encoding: bytes, expected_bytes: int = -1):
+        """Decodificador para la codificación, o None si no se puede inspeccionar en streaming"""
+        if encoding in (b'', b'identity'):
+            return cls(bytes, expected_bytes)
+        if encoding in (b'gzip', b'x-gzip'):
+            return cls(zlib.decompressobj(16 + zlib.MAX_WBITS).decompress, expected_bytes)
+        if encoding == b'deflate':
+            # Con cabecera zlib o en crudo: se decide con el primer chunk
+            return cls(_DeflateAutodetect().decompress, expected_bytes)
+        if encoding == b'br' and brotli is not None:
+            return cls(brotli.Decompressor().process, expected_bytes)
+        return None
+
+    def feed(self, data: bytes) -> int:
+        """Añadir un chunk de la red; devuelve los bytes descomprimidos acumulados"""
+        self.wire_bytes += len(data)
+        self.buffer += self._decompress(data)
+        return len(self.buffer)
+
+
+class _DeflateAutodetect:
+    def __init__(self):
+        self._decompressor = None
+
+    def decompress(self, data: bytes) -> bytes:
+        if self._decompressor is None:
+            self._decompressor = zlib.decompressobj()
+            try:
+                return self._decompressor.decompress(data)
+            except zlib.error:
+                self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        return self._decompressor.decompress(data)
+
+
+class EarlyAbortDownload:
+    """
+    Corta la descarga de una ficha en cuanto han llegado los datos que se extraen
+
+    Solo actúa sobre los requests con meta['early_abort']. Los chunks se
+    descomprimen a medida que llegan (bytes_received) y, cada `check_every`
+    bytes descomprimidos, RequiredDataScanner decide si el prefijo ya basta; en
+    ese caso StopDownload(fail=False) entrega al callback la respuesta
+    parcial (con la bandera 'download_stopped'). Si el cuerpo descomprimido
+    supera `max_scan_bytes` sin completarse, la descarga sigue normalmente.
+    """
+
+    def __init__(self, crawler, check_every: int = 16 * 1024, max_scan_bytes: int = 4 * 1024 * 1024):
+        self.crawler = crawler
+        self.check_every = check_every
+        self.max_scan_bytes = max_scan_bytes
+        self.logger = logging.getLogger(__name__)
+
+        self.streams: Dict[object, StreamDecoder] = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """Crear instancia desde crawler"""
+        settings = crawler.settings
+        if not settings.getbool('EARLY_ABORT_ENABLED', False):
+            raise NotConfigured
+
+        extension = cls(
+            crawler,
+            check_every=settings.getint('EARLY_ABORT_CHECK_BYTES', 16 * 1024),
+            max_scan_bytes=settings.getint('EARLY_ABORT_MAX_SCAN_BYTES', 4 * 1024 * 1024),
+        )
+        crawler.signals.connect(extension.headers_received, signal=signals.headers_received)
+        crawler.signals.connect(extension.bytes_received, signal=signals.bytes_received)
+        crawler.signals.connect(extension.request_left_downloader, signal=signals.request_left_downloader)
+        return extension
+
+    def headers_received(self, headers, body_length, request, spider):
+        """Preparar el decodificador si el request admite corte anticipado"""
+        if not request.meta.get('early_abort') or request.method == 'HEAD':
+            return
+
+        encoding = headers.get(b'Content-Encoding', b'').strip().lower()
+        stream = StreamDecoder.for_encoding(encoding, body_length)
+        if stream is None:
+            self._inc_stat('unsupported_encoding')
+            return
+        self.streams[request] = stream
+
+    def bytes_received(self, data, request, spider):
+        """Descomprimir el chunk y cortar la descarga si el prefijo ya basta"""
+        stream = self.streams.get(request)
+        if stream is None:
+            return
+
+        try:
+            size = stream.feed(data)
+        except Exception as e:
+            self.logger.debug(f"No se puede inspeccionar {request.url} en streaming: {e}")
+            del self.streams[request]
+            return
+
+        if size - stream.checked_at < self.check_every:
+            return
+        stream.checked_at = size
+
+        if size > self.max_scan_bytes:
+            del self.streams[request]
+            return
+
+        # Solo se mira lo llegado desde la última comprobación, sin copiar el buffer
+        if stream.scanner.scan(stream.buffer):
+            del self.streams[request]
+            self._record_stop(request, stream)
+            raise StopDownload(fail=False)
+
+    def request_left_downloader(self, request, spider):
+        self.streams.pop(request, None)
+
+    def _record_stop(self, request, stream: StreamDecoder):
+        self._inc_stat('stopped')
+        self._inc_stat('wire_bytes', stream.wire_bytes)
+        if stream.expected_bytes > 0:
+            self._inc_stat('saved_bytes', max(0, stream.expected_bytes - stream.wire_bytes))
+        self.logger.debug(
+            f"✂️ Descarga cortada tras {stream.wire_bytes} bytes"
+            + (f" de {stream.expected_bytes}" if stream.expected_bytes > 0 else "")
+            + f": {request.url}"
+        )
+
+    def _inc_stat(self, key: str, count=1):
+        if self.crawler.stats:
+            self.crawler.stats.inc_value(f'early_abort/{key}', count)
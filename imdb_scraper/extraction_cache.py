@@ -0,0 +1,183 @@
+"""
+Caché persistente de extracciones por contenido de la ficha
+Asocia un hash del cuerpo normalizado con el dict ya extraído y validado, de
+modo que una ficha que no ha cambiado entre ejecuciones cuesta un hash y una
+consulta SQLite en lugar del parseo completo
+"""
+
+import hashlib
+import json
+import os
+import time
+from typing import Optional
+
+from .selector_factory import CAST_SECTION_MARKERS, layout_detector
+from .sqlite_store import SQLiteStore, resolve_path
+
+
+# Cambiarla invalida todas las entradas (p. ej. al modificar los selectores o validaciones)
+CACHE_VERSION = 1
+
+# Valores que cambian en cada respuesta de una misma ficha (inicio, fin del valor)
+VOLATILE_TOKENS = (
+    (b' nonce="', b'"'),  # CSP: nonce distinto por respuesta
+)
+
+DEFAULT_PATH = os.path.join('data', 'cache', 'extracciones.db')
+DEFAULT_MAX_ENTRIES = 20000
+
+# Maquetaciones que se extraen de los bytes en menos tiempo del que cuesta la clave
+DEFAULT_SKIP_LAYOUTS = ('next_data', 'json_ld')
+
+
+def normalized_region(body: bytes) -> int:
+    """
+    Fin de la parte del cuerpo que determina el item
+
+    El reparto es lo último que se extrae: lo que viene detrás (reseñas,
+    recomendaciones, anuncios, el resto de __NEXT_DATA__) cambia sin que
+    cambie el item, y con EarlyAbortDownload el corte llega en un punto
+    distinto en cada descarga. Sin bloque de reparto cerrado se usa todo.
+    """
+    for start_marker, end_marker in CAST_SECTION_MARKERS:
+        position = body.find(start_marker)
+        if position != -1:
+            end = body.find(end_marker, position)
+            if end != -1:
+                return end + len(end_marker)
+    return len(body)
+
+
+def body_key(body: bytes, version: int = CACHE_VERSION) -> str:
+    """Hash del cuerpo normalizado: hasta el fin del reparto y sin los valores volátiles"""
+    end = normalized_region(body)
+    view = memoryview(body)
+    digest = hashlib.sha256(b'v%d:' % version)
+
+    # Tramos a omitir, en orden, para hashear el resto sin copiar el cuerpo
+    skipped = []
+    for start_token, end_token in VOLATILE_TOKENS:
+        position = body.find(start_token, 0, end)
+        while position != -1:
+            value_start = position + len(start_token)
+            value_end = body.find(end_token, value_start, end)
+            if value_end == -1:
+                break
+            skipped.append((value_start, value_end))
+            position = body.find(start_token, value_end, end)
+
+    position = 0
+    for value_start, value_end in sorted(skipped):
+        digest.update(view[position:value_start])
+        position = value_end
+    digest.update(view[position:end])
+    return digest.hexdigest()[:32]
+
+
+class ExtractionCache(SQLiteStore):
+    """
+    Caché LRU en SQLite de fichas extraídas, indexada por body_key
+
+    Cada entrada guarda el dict de extract_movie y el momento de su último
+    uso; al superar `max_entries` se borran las menos usadas recientemente
+    (un 10% de margen para no borrar en cada inserción). Las escrituras se
+    agrupan y se confirman cada `commit_every` operaciones y al cerrar.
+
+    Las fichas cuya huella ya se resolvió a una de `skip_layouts` no pasan
+    por la caché: leer __NEXT_DATA__ o el JSON-LD es más barato que el hash.
+    La huella se resuelve en layout_detector, también con las maquetaciones
+    que devuelven los workers del pool (el spider las registra con learn).
+    """
+
+    SCHEMA = (
+        '''
+        CREATE TABLE IF NOT EXISTS extracciones (
+            clave TEXT PRIMARY KEY,
+            datos TEXT NOT NULL,
+            ultimo_uso REAL NOT NULL
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_extracciones_uso ON extracciones (ultimo_uso)',
+    )
+
+    def __init__(self, path: str, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 commit_every: int = 50, version: int = CACHE_VERSION,
+                 skip_layouts=DEFAULT_SKIP_LAYOUTS):
+        super().__init__(path, commit_every)
+        self.skip_layouts = frozenset(skip_layouts)
+        self.max_entries = max(1, max_entries)
+        self.version = version
+
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.evicted = 0
+        self.entries = self.connection.execute('SELECT COUNT(*) FROM extracciones').fetchone()[0]
+
+    @classmethod
+    def from_settings(cls, settings):
+        """Crear la caché si EXTRACTION_CACHE_ENABLED; None en caso contrario"""
+        if not settings.getbool('EXTRACTION_CACHE_ENABLED', False):
+            return None
+
+        return cls(
+            resolve_path(settings.get('EXTRACTION_CACHE_PATH', DEFAULT_PATH)),
+            max_entries=settings.getint('EXTRACTION_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES),
+            version=settings.getint('EXTRACTION_CACHE_VERSION', CACHE_VERSION),
+            skip_layouts=settings.getlist('EXTRACTION_CACHE_SKIP_LAYOUTS', DEFAULT_SKIP_LAYOUTS),
+        )
+
+    def applies(self, body: bytes) -> bool:
+        """False si la huella de la página ya se asoció a una maquetación barata"""
+        if not self.skip_layouts:
+            return True
+        return layout_detector.fingerprints.get(layout_detector.fingerprint(body)) not in self.skip_layouts
+
+    def key(self, body: bytes) -> str:
+        return body_key(body, self.version)
+
+    def get(self, key: str) -> Optional[dict]:
+        """Dict extraído para la clave o None; un acierto renueva su último uso"""
+        row = self.connection.execute(
+            'SELECT datos FROM extracciones WHERE clave = ?', (key,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.connection.execute(
+            'UPDATE extracciones SET ultimo_uso = ? WHERE clave = ?', (time.time(), key)
+        )
+        self._written()
+        return json.loads(row[0])
+
+    def put(self, key: str, data: dict):
+        """Guardar el dict extraído (solo tipos JSON) y desalojar si se supera el límite"""
+        cursor = self.connection.execute(
+            'INSERT OR REPLACE INTO extracciones (clave, datos, ultimo_uso) VALUES (?, ?, ?)',
+            (key, json.dumps(data, ensure_ascii=False), time.time()),
+        )
+        if cursor.rowcount:
+            self.entries += 1
+            self.stored += 1
+
+        if self.entries > self.max_entries:
+            self._evict(self.entries - self.max_entries + self.max_entries // 10)
+        self._written()
+
+    def _evict(self, count: int):
+        """Borrar las `count` entradas usadas hace más tiempo"""
+        cursor = self.connection.execute(
+            'DELETE FROM extracciones WHERE clave IN '
+            '(SELECT clave FROM extracciones ORDER BY ultimo_uso LIMIT ?)', (count,)
+        )
+        self.evicted += cursor.rowcount
+        # INSERT OR REPLACE cuenta también las claves que ya existían: se recalcula
+        self.entries = self.connection.execute('SELECT COUNT(*) FROM extracciones').fetchone()[0]
+
+    def summary(self) -> str:
+        return (
+            f"🗃️ Caché de extracciones: {self.hits} aciertos, {self.misses} fallos, "
+            f"{self.evicted} desalojadas, {self.entries} entradas"
+        )
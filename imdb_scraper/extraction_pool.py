@@ -0,0 +1,188 @@
+"""
+Extracción de fichas de título fuera del reactor
+Funciones sin estado que convierten una respuesta (o sus bytes) en los campos
+validados del item, y un pool de procesos que las ejecuta y devuelve Deferreds
+"""
+
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from scrapy.http import HtmlResponse
+from twisted.internet.defer import Deferred
+from twisted.python.failure import Failure
+
+from .selector_factory import DataExtractor, find_chart_entries
+
+
+def validate_string(value):
+    """Valida y limpia strings"""
+    try:
+        return str(value).strip() if value else ''
+    except Exception:
+        return ''
+
+
+def validate_year(value):
+    """Valida año"""
+    try:
+        if value and str(value).isdigit() and 1900 <= int(value) <= 2030:
+            return value
+        return None
+    except Exception:
+        return None
+
+
+def validate_rating(value):
+    """Valida rating"""
+    try:
+        if value:
+            rating = float(str(value).replace(',', '.'))
+            if 0 <= rating <= 10:
+                return str(rating)
+        return None
+    except Exception:
+        return None
+
+
+def validate_metascore(value):
+    """Valida metascore"""
+    try:
+        if value and str(value).isdigit():
+            score = int(value)
+            if 0 <= score <= 100:
+                return str(score)
+        return None
+    except Exception:
+        return None
+
+
+def validate_actors(actors_list):
+    """Valida lista de actores"""
+    try:
+        if isinstance(actors_list, list) and actors_list:
+            # Filtrar actores válidos y tomar los primeros 3
+            valid_actors = [actor.strip() for actor in actors_list if actor and actor.strip()][:3]
+            return valid_actors if valid_actors else []
+        return []
+    except Exception:
+        return []
+
+
+def extract_movie(response, backend: str = 'parsel') -> dict:
+    """
+    Extraer y validar los campos del item de una ficha
+
+    Returns:
+        dict: campos de ImdbScraperItem (sin ranking) más 'layout', la
+        maquetación detectada, y 'selectors', los contadores de los
+        selectores CSS evaluados (también desde los procesos del pool)
+    """
+    extractor = DataExtractor(response, backend=backend)
+    data = extractor.extract_all_data()
+    return {
+        'layout': extractor.layout,
+        'selectors': dict(extractor.selector.chain_stats()),
+        'titulo': validate_string(data.get('titulo', '')),
+        'anio': validate_year(data.get('anio')),
+        'calificacion': validate_rating(data.get('calificacion')),
+        'duracion': validate_string(data.get('duracion')),
+        'metascore': validate_metascore(data.get('metascore')),
+        'actores': validate_actors(data.get('actores', [])),
+    }
+
+
+def extract_chart(response) -> list:
+    """
+    Entradas validadas del ranking de /chart/top/
+
+    Returns:
+        list: por película, imdb_id y ranking más los campos de
+        ImdbScraperItem (None o [] si el ranking no los trae)
+    """
+    return [
+        {
+            'imdb_id': entry['imdb_id'],
+            'ranking': entry['ranking'],
+            'titulo': validate_string(entry['titulo']),
+            'anio': validate_year(entry['anio']),
+            'calificacion': validate_rating(entry['calificacion']),
+            'duracion': validate_string(entry['duracion']),
+            'metascore': validate_metascore(entry['metascore']),
+            'actores': validate_actors(entry['actores']),
+        }
+        for entry in find_chart_entries(response.body)
+        if entry['imdb_id'] and entry['titulo']
+    ]
+
+
+def extract_movie_from_bytes(url: str, body: bytes, encoding: str, backend: str = 'parsel') -> dict:
+    """extract_movie para los procesos del pool: solo viajan la URL, los bytes y la codificación"""
+    return extract_movie(HtmlResponse(url, body=body, encoding=encoding), backend=backend)
+
+
+class ExtractionPool:
+    """
+    Pool de procesos para el parseo y la extracción de fichas
+
+    El reactor solo envía los bytes de la respuesta y recibe un dict; el
+    parseo con lxml y las validaciones corren en `max_workers` procesos, de
+    modo que escalan con los núcleos sin retrasar la E/S de red. Los
+    procesos se crean con 'spawn' (no heredan el reactor ni sus sockets) la
+    primera vez que se envía trabajo.
+    """
+
+    def __init__(self, max_workers: int, backend: str = 'parsel'):
+        if backend not in DataExtractor.BACKENDS:
+            raise ValueError(f"Backend de extracción desconocido: {backend}")
+
+        self.max_workers = max_workers
+        self.backend = backend
+        self.logger = logging.getLogger(__name__)
+        self.submitted = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @classmethod
+    def from_settings(cls, settings):
+        """Crear el pool si EXTRACTION_PROCESS_WORKERS > 0; None en caso contrario"""
+        workers = settings.getint('EXTRACTION_PROCESS_WORKERS', 0)
+        if workers <= 0:
+            return None
+        return cls(workers, backend=settings.get('EXTRACTION_BACKEND', 'parsel'))
+
+    def submit(self, response) -> Deferred:
+        """Extraer la ficha en el pool; el Deferred se dispara en el reactor con el dict"""
+        from twisted.internet import reactor
+
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+            reactor.addSystemEventTrigger('during', 'shutdown', self.stop)
+            self.logger.info(f"⚙️ Pool de extracción iniciado con {self.max_workers} procesos")
+
+        d = Deferred()
+        future = self._executor.submit(
+            extract_movie_from_bytes, response.url, response.body, response.encoding, self.backend,
+        )
+        # El callback del future corre en un hilo del executor
+        future.add_done_callback(lambda f: reactor.callFromThread(self._resolve, d, f))
+        self.submitted += 1
+        return d
+
+    @staticmethod
+    def _resolve(d: Deferred, future):
+        try:
+            result = future.result()
+        except BaseException as e:
+            d.errback(Failure(e))
+        else:
+            d.callback(result)
+
+    def stop(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        return None
@@ -17,4 +17,5 @@ class ImdbScraperItem(scrapy.Item):
     metascore = scrapy.Field()
     actores = scrapy.Field()  # Lista con al menos 3 actores
     ranking = scrapy.Field()  # Posición en el top 250
+    imdb_id = scrapy.Field()  # ID del título (tt...): historial de refrescos en la BD
 
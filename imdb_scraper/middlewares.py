@@ -3,7 +3,13 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
-from scrapy import signals
+from scrapy import Request, signals
+from scrapy.http import Response
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.utils.defer import maybe_deferred_to_future
+from scrapy.utils.httpobj import urlparse_cached
+from twisted.internet.task import deferLater
+import heapq
 import random
 import time
 import logging
@@ -11,6 +17,11 @@ import logging
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
 
+from .extraction_cache import body_key
+from .refresh_priority import RefreshHistory, RefreshScorer
+from .retry_scheduler import RetryScheduler
+from .validator_store import Validators, ValidatorStore
+
 logger = logging.getLogger(__name__)
 
 
@@ -130,51 +141,130 @@ class RandomUserAgentMiddleware:
 
 
 class RandomDelayMiddleware:
-    """Middleware para añadir delays aleatorios entre requests"""
+    """
+    Middleware para añadir delays aleatorios entre requests sin bloquear el reactor
+
+    El delay se aplica por slot (proxy o dominio): cada slot recuerda el
+    instante a partir del cual puede salir su siguiente request y el resto de
+    slots sigue descargando mientras tanto. Sustituye a DOWNLOAD_DELAY: el
+    slot de Scrapy aplica también el suyo al recibir el request, así que con
+    DOWNLOAD_DELAY > 0 el espaciado es el mayor de los dos y el jitter se
+    pierde si el delay fijo lo supera.
+    """
     
-    def __init__(self):
-        self.min_delay = 1.0
-        self.max_delay = 3.0
+    def __init__(self, min_delay=1.0, max_delay=3.0):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.next_slot_time = {}
     
-    def process_request(self, request, spider):
-        """Añade delay aleatorio antes del request"""
-        delay = random.uniform(self.min_delay, self.max_delay)
+    @classmethod
+    def from_crawler(cls, crawler):
+        """Crear instancia desde crawler"""
+        settings = crawler.settings
+        min_delay = settings.getfloat('RANDOM_DELAY_MIN', 1.0)
+        max_delay = settings.getfloat('RANDOM_DELAY_MAX', 3.0)
+        if settings.getfloat('DOWNLOAD_DELAY') > 0:
+            logger.warning(
+                "⚠️ DOWNLOAD_DELAY=%ss se combina con el jitter de RandomDelayMiddleware (%s-%ss); "
+                "ponlo a 0 para que el espaciado por slot lo marque solo el jitter",
+                settings.getfloat('DOWNLOAD_DELAY'), min_delay, max_delay,
+            )
+        return cls(min_delay=min_delay, max_delay=max_delay)
+    
+    def _slot_key(self, request):
+        """Clave del slot al que se aplica el jitter: slot de descarga, proxy o dominio"""
+        return (
+            request.meta.get('download_slot') or
+            request.meta.get('proxy') or
+            urlparse_cached(request).hostname or
+            ''
+        )
+    
+    async def process_request(self, request, spider):
+        """Retrasa el request de forma asíncrona según el jitter de su slot"""
+        now = time.monotonic()
+        key = self._slot_key(request)
+        
+        start_at = max(now, self.next_slot_time.get(key, now))
+        self.next_slot_time[key] = start_at + random.uniform(self.min_delay, self.max_delay)
         
-        logger.debug(f"⏱️ Delay aleatorio: {delay:.2f}s antes de {request.url}")
-        time.sleep(delay)
+        delay = start_at - now
+        if delay > 0:
+            from twisted.internet import reactor
+            
+            logger.debug(f"⏱️ Delay aleatorio: {delay:.2f}s antes de {request.url} (slot {key})")
+            await maybe_deferred_to_future(deferLater(reactor, delay, lambda: None))
         
         return None
 
 
 class NetworkResilienceMiddleware:
-    """Middleware para mejorar la resiliencia de red"""
+    """
+    Middleware para mejorar la resiliencia de red
+
+    Los reintentos no duermen el reactor: el request se aparca en un
+    RetryScheduler con backoff exponencial y se reinyecta en el engine cuando
+    vence, mientras el resto de requests sigue en curso.
+    """
     
-    def __init__(self):
-        self.retry_http_codes = [500, 502, 503, 504, 408, 429]
-        self.max_retries = 3
+    def __init__(self, retry_scheduler, retry_http_codes=None, max_retries=3, backoff_factor=2.0):
+        self.retry_scheduler = retry_scheduler
+        self.retry_http_codes = retry_http_codes or [500, 502, 503, 504, 408, 429]
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+    
+    @classmethod
+    def from_crawler(cls, crawler):
+        """Crear instancia desde crawler"""
+        settings = crawler.settings
+        return cls(
+            RetryScheduler.from_crawler(crawler),
+            retry_http_codes=[int(code) for code in settings.getlist('RETRY_HTTP_CODES')],
+            max_retries=settings.getint('RETRY_TIMES', 3),
+            backoff_factor=settings.getfloat('BACKOFF_FACTOR', 2.0),
+        )
+    
+    def _schedule_retry(self, request, reason, spider=None):
+        """Aparcar el request con backoff exponencial; False si no hay más reintentos"""
+        retries = request.meta.get('retry_times', 0)
+        
+        if retries >= self.max_retries:
+            return False
+        
+        retry_delay = (self.backoff_factor ** retries) + random.uniform(0, 1)
+        
+        # Crear nueva request con contador de reintentos
+        retry_req = request.copy()
+        retry_req.meta['retry_times'] = retries + 1
+        retry_req.dont_filter = True
+        
+        # Con plazo (CRAWL_DEADLINE_SECONDS) solo se reintenta lo que aún cabe
+        deadline = getattr(spider, 'crawl_deadline', None)
+        if deadline is not None and not deadline.admits_retry(retry_req, retry_delay):
+            logger.info(f"⏰ {reason} - Sin reintento por el plazo del crawl: {request.url}")
+            return False
+        
+        if not self.retry_scheduler.schedule(retry_req, retry_delay):
+            if deadline is not None:
+                deadline.unpark(retry_req)
+            return False
+        
+        # El original termina con IgnoreRequest: sus errbacks saben que hay reintento
+        request.meta['retry_deferred'] = True
+        logger.warning(
+            f"⚠️ {reason} - Reintento #{retries + 1} "
+            f"en {retry_delay:.2f}s para {request.url} "
+            f"(cola: {self.retry_scheduler.queue_depth})"
+        )
+        return True
         
     def process_response(self, request, response, spider):
         """Maneja respuestas con códigos de error específicos"""
         if response.status in self.retry_http_codes:
-            retries = request.meta.get('retry_times', 0)
+            if self._schedule_retry(request, f"HTTP {response.status}", spider):
+                raise IgnoreRequest(f"Reintento diferido de {request.url}")
             
-            if retries < self.max_retries:
-                retry_delay = (2 ** retries) + random.uniform(0, 1)
-                
-                logger.warning(
-                    f"⚠️ HTTP {response.status} - Reintento #{retries + 1} "
-                    f"en {retry_delay:.2f}s para {request.url}"
-                )
-                
-                time.sleep(retry_delay)
-                
-                # Crear nueva request con contador de reintentos
-                retry_req = request.copy()
-                retry_req.meta['retry_times'] = retries + 1
-                retry_req.dont_filter = True
-                
-                return retry_req
-            else:
+            if request.meta.get('retry_times', 0) >= self.max_retries:
                 logger.error(
                     f"❌ Máximo reintentos alcanzado para {request.url} "
                     f"(HTTP {response.status})"
@@ -184,23 +274,253 @@ class NetworkResilienceMiddleware:
     
     def process_exception(self, request, exception, spider):
         """Maneja excepciones de red"""
-        retries = request.meta.get('retry_times', 0)
+        if isinstance(exception, IgnoreRequest):
+            return None
         
-        if retries < self.max_retries:
-            retry_delay = (2 ** retries) + random.uniform(0, 1)
-            
-            logger.warning(
-                f"⚠️ Excepción {type(exception).__name__} - "
-                f"Reintento #{retries + 1} en {retry_delay:.2f}s"
-            )
-            
-            time.sleep(retry_delay)
+        if self._schedule_retry(request, f"Excepción {type(exception).__name__}", spider):
+            raise IgnoreRequest(f"Reintento diferido de {request.url}")
+        
+        if request.meta.get('retry_times', 0) >= self.max_retries:
+            logger.error(f"❌ Máximo reintentos por excepción: {exception}")
+        return None
+
+
+class CrawlDeadlineMiddleware:
+    """
+    Descarta al salir de la cola los requests que ya no caben en el plazo del crawl
+
+    Va antes que el resto de middlewares de descarga para que un request
+    descartado no espere su delay ni gaste un proxy. Las decisiones y las
+    estadísticas (deadline/skipped/*) son de spider.crawl_deadline
+    (imdb_scraper.crawl_deadline.CrawlDeadline).
+    """
+    
+    @classmethod
+    def from_crawler(cls, crawler):
+        """Crear instancia desde crawler"""
+        if crawler.settings.getfloat('CRAWL_DEADLINE_SECONDS', 0) <= 0:
+            raise NotConfigured
+        return cls()
+    
+    def process_request(self, request, spider):
+        deadline = getattr(spider, 'crawl_deadline', None)
+        if deadline is None:
+            return None
+        
+        kind = deadline.admit(request)
+        if kind is not None:
+            raise IgnoreRequest(f"Plazo del crawl: {kind} descartado {request.url}")
+        return None
+
+
+class ConditionalRequestMiddleware:
+    """
+    Re-crawl condicional de las fichas con los validadores de la ejecución anterior
+
+    Los requests con meta['conditional'] y meta['title_id'] salen con
+    If-None-Match / If-Modified-Since si el título tiene validadores. Un 304
+    llega al spider con meta['not_modified'], y un 200 cuyo hash normalizado
+    (extraction_cache.body_key) coincide con el guardado con meta['unchanged']:
+    en ambos casos el spider no extrae ni genera item y la fecha de sus
+    validadores pasa a la de la comprobación (RefreshHistory la cuenta como
+    refresco sin cambios). Los validadores de una ficha que cambió se guardan
+    con la señal item_scraped, cuando el item ya pasó por los pipelines.
+
+    Va antes que ProxyRotationMiddleware: las páginas de bloqueo se reintentan
+    antes de llegar aquí y nunca se guardan como validadores.
+    """
+    
+    def __init__(self, store, stats):
+        self.store = store
+        self.stats = stats
+    
+    @classmethod
+    def from_crawler(cls, crawler):
+        """Crear instancia desde crawler"""
+        store = ValidatorStore.from_settings(crawler.settings)
+        if store is None:
+            raise NotConfigured
+        
+        middleware = cls(store, crawler.stats)
+        crawler.signals.connect(middleware.item_scraped, signal=signals.item_scraped)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+    
+    def process_request(self, request, spider):
+        """Añadir los validadores guardados (una vez: los reintentos copian headers y meta)"""
+        if not request.meta.get('conditional') or 'validators' in request.meta:
+            return None
+        
+        validators = self.store.get(request.meta.get('title_id'))
+        request.meta['validators'] = validators
+        if validators is None or not (validators.etag or validators.last_modified):
+            return None
+        
+        if validators.etag:
+            request.headers.setdefault('If-None-Match', validators.etag)
+        if validators.last_modified:
+            request.headers.setdefault('If-Modified-Since', validators.last_modified)
+        # Sin esto HttpErrorMiddleware descartaría el 304 antes del spider
+        request.meta['handle_httpstatus_list'] = [*request.meta.get('handle_httpstatus_list', ()), 304]
+        self.stats.inc_value('conditional/sent')
+        return None
+    
+    def process_response(self, request, response, spider):
+        """Marcar las fichas sin cambios y preparar los validadores nuevos"""
+        if not request.meta.get('conditional'):
+            return response
+        
+        for key in ('not_modified', 'unchanged', 'fresh_validators'):
+            request.meta.pop(key, None)
+        
+        if response.status == 304:
+            request.meta['not_modified'] = True
+            self.stats.inc_value('conditional/not_modified')
+            self.store.touch(request.meta['title_id'])
+            return response
+        if response.status != 200:
+            return response
+        
+        fresh = Validators(
+            self._header(response, b'ETag'),
+            self._header(response, b'Last-Modified'),
+            body_key(response.body),
+        )
+        stored = request.meta.get('validators')
+        if stored is not None and stored.content_hash == fresh.content_hash:
+            # Mismo contenido: no habrá item, se guardan ya los validadores nuevos
+            request.meta['unchanged'] = True
+            self.stats.inc_value('conditional/unchanged')
+            if fresh != stored:
+                self.store.update(request.meta['title_id'], fresh)
+            else:
+                self.store.touch(request.meta['title_id'])
+        else:
+            request.meta['fresh_validators'] = fresh
+        return response
+    
+    @staticmethod
+    def _header(response, name):
+        value = response.headers.get(name)
+        return value.decode('latin-1') if value else None
+    
+    def item_scraped(self, item, response, spider):
+        """Guardar los validadores de una ficha cuyo item ya se procesó"""
+        # Los items de un errback llegan con la Failure en lugar de la respuesta
+        meta = response.meta if isinstance(response, Response) and response.request is not None else {}
+        fresh = meta.get('fresh_validators')
+        if fresh is not None:
+            self.store.update(meta['title_id'], fresh)
+            self.stats.inc_value('conditional/stored')
+    
+    def spider_closed(self, spider):
+        self.store.close()
+
+
+class RefreshPriorityMiddleware:
+    """
+    Orden de las fichas iniciales por valor de refresco (spider middleware)
+
+    Cada request con meta['title_id'] recibe una prioridad según
+    RefreshScorer: días desde su último refresco, ranking y volatilidad del
+    rating (RefreshHistory, leído de la base de DatabasePipeline). Sin
+    presupuesto los requests pasan en streaming con su prioridad y el
+    scheduler ordena los que estén en cola.
+
+    Con REFRESH_REQUEST_BUDGET > 0 salen como mucho `budget` fichas: se leen
+    hasta `lookahead` candidatas por delante en un heap y, lleno el heap,
+    cada candidata nueva deja salir la de más valor. La memoria y la espera
+    del primer request no dependen del tamaño del catálogo, y la fuente de
+    IDs deja de leerse al cubrir el presupuesto o cuando el plazo del crawl
+    (spider.crawl_deadline) ya no admite trabajo nuevo. La elección es la
+    mejor dentro de la ventana, no del catálogo completo.
+    """
+    
+    def __init__(self, history, scorer, budget, stats, lookahead=1000):
+        self.history = history
+        self.scorer = scorer
+        self.budget = budget
+        self.stats = stats
+        self.lookahead = max(1, lookahead)
+        self.crawler = None
+    
+    @classmethod
+    def from_crawler(cls, crawler):
+        """Crear instancia desde crawler"""
+        history = RefreshHistory.from_settings(crawler.settings)
+        if history is None:
+            raise NotConfigured
+        
+        middleware = cls(
+            history,
+            RefreshScorer.from_settings(crawler.settings),
+            crawler.settings.getint('REFRESH_REQUEST_BUDGET', 0),
+            crawler.stats,
+            lookahead=crawler.settings.getint('REFRESH_LOOKAHEAD', 1000),
+        )
+        middleware.crawler = crawler
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+    
+    async def process_start(self, start):
+        """Asignar prioridades y, con presupuesto, sacar las mejores fichas de cada ventana"""
+        if self.budget <= 0:
+            async for item_or_request in start:
+                if self._is_title_request(item_or_request):
+                    self._prioritise(item_or_request)
+                yield item_or_request
+            return
+        
+        # Heap de (-puntuación, orden, request): la raíz es la de más valor
+        window = []
+        read = emitted = 0
+        async for item_or_request in start:
+            if not self._is_title_request(item_or_request):
+                yield item_or_request
+                continue
             
-            retry_req = request.copy()
-            retry_req.meta['retry_times'] = retries + 1
-            retry_req.dont_filter = True
+            heapq.heappush(window, (-self._prioritise(item_or_request), read, item_or_request))
+            read += 1
+            if len(window) < self.lookahead:
+                continue
             
-            return retry_req
+            if not self._accepts_new(window[0][2]):
+                break
+            yield heapq.heappop(window)[2]
+            emitted += 1
+            if emitted >= self.budget:
+                break
         
-        logger.error(f"❌ Máximo reintentos por excepción: {exception}")
-        return None
+        while window and emitted < self.budget and self._accepts_new(window[0][2]):
+            yield heapq.heappop(window)[2]
+            emitted += 1
+        
+        self.stats.inc_value('refresh_priority/over_budget', len(window))
+        logger.info(f"🎯 Presupuesto de refresco: {emitted} fichas de {read} leídas")
+    
+    def _accepts_new(self, request):
+        """¿Admite el plazo del crawl (si hay) un request nuevo?"""
+        spider = self.crawler.spider if self.crawler is not None else None
+        deadline = getattr(spider, 'crawl_deadline', None)
+        if deadline is None or deadline.accepts_new():
+            return True
+        if deadline.start_stopped_at is None:
+            deadline.stop_start(request.meta.get('rank'))
+        return False
+    
+    @staticmethod
+    def _is_title_request(item_or_request):
+        return isinstance(item_or_request, Request) and item_or_request.meta.get('title_id')
+    
+    def _prioritise(self, request):
+        history = self.history.get(request.meta['title_id'])
+        score = self.scorer.score(history, request.meta.get('rank'))
+        request.priority = self.scorer.priority(score)
+        request.meta['refresh_score'] = score
+        self.stats.inc_value('refresh_priority/candidates')
+        if history is None:
+            self.stats.inc_value('refresh_priority/never_refreshed')
+        return score
+    
+    def spider_closed(self, spider):
+        self.history.close()
@@ -28,6 +28,11 @@ class ImdbScraperPipeline:
 
 
 class CsvExportPipeline:
+    HEADERS = [
+        'Ranking', 'Título', 'Año', 'Calificación',
+        'Duración (min)', 'Metascore', 'Actores Principales'
+    ]
+    
     def open_spider(self, spider):
         # Obtener el directorio raíz del proyecto (un nivel arriba)
         project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -37,24 +42,54 @@ class CsvExportPipeline:
         os.makedirs(exports_dir, exist_ok=True)
         
         # Crear archivo CSV en la carpeta data/exports
-        csv_path = os.path.join(exports_dir, 'peliculas.csv')
-        self.file = open(csv_path, 'w', newline='', encoding='utf-8')
+        self.csv_path = os.path.join(exports_dir, 'peliculas.csv')
+        
+        # Con re-crawl condicional las fichas sin cambios no generan item: sus
+        # filas del export anterior se conservan y el fichero completo se
+        # escribe aparte y sustituye al anterior al cerrar
+        self.previous_rows = {}
+        self.output_path = self.csv_path
+        if spider.settings.getbool('CONDITIONAL_REQUESTS_ENABLED'):
+            self.previous_rows = self._read_previous_rows()
+            self.output_path = self.csv_path + '.tmp'
+        
+        self.file = open(self.output_path, 'w', newline='', encoding='utf-8')
         self.writer = csv.writer(self.file)
         
         # Escribir headers
-        self.writer.writerow([
-            'Ranking', 'Título', 'Año', 'Calificación', 
-            'Duración (min)', 'Metascore', 'Actores Principales'
-        ])
+        self.writer.writerow(self.HEADERS)
+    
+    def _read_previous_rows(self):
+        """Filas del export anterior por (título, año)"""
+        if not os.path.exists(self.csv_path):
+            return {}
+        
+        with open(self.csv_path, newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            return {self._row_key(row): row for row in reader if len(row) == len(self.HEADERS)}
+    
+    @staticmethod
+    def _row_key(row):
+        """(título, año) de una fila; None se escribe como '' en el CSV"""
+        return tuple('' if value is None else str(value) for value in row[1:3])
     
     def close_spider(self, spider):
+        # Títulos sin item en esta ejecución (304 o contenido sin cambios)
+        for row in self.previous_rows.values():
+            self.writer.writerow(row)
         self.file.close()
+        
+        if self.output_path != self.csv_path:
+            os.replace(self.output_path, self.csv_path)
+            if self.previous_rows:
+                spider.logger.info(f"📄 CSV: {len(self.previous_rows)} películas sin cambios conservadas")
     
     def process_item(self, item, spider):
         adapter = ItemAdapter(item)
         
         # Escribir fila al CSV
-        self.writer.writerow([
+        row = [
             adapter.get('ranking', ''),
             adapter.get('titulo', ''),
             adapter.get('anio', ''),
@@ -62,6 +97,8 @@ class CsvExportPipeline:
             adapter.get('duracion', ''),
             adapter.get('metascore', ''),
             adapter.get('actores', '')
-        ])
+        ]
+        self.writer.writerow(row)
+        self.previous_rows.pop(self._row_key(row), None)
         
         return item
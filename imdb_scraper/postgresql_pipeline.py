@@ -46,8 +46,10 @@ class PostgreSQLPipeline:
             # Verificar que las tablas existen
             self._verify_database_schema(spider)
             
-            # Limpiar datos del scraping actual
-            self._clean_current_session_data(spider)
+            # Limpiar datos del scraping actual (con re-crawl condicional las
+            # fichas sin cambios no se vuelven a escribir: se conservan)
+            if not spider.settings.getbool('CONDITIONAL_REQUESTS_ENABLED'):
+                self._clean_current_session_data(spider)
             
             spider.logger.info("🐘 PostgreSQL conectado exitosamente")
             
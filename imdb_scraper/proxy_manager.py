@@ -4,6 +4,8 @@ Gestor de Proxies Avanzado para IMDb Scraper
 Implementa rotación automática, fallback y validación de IPs
 """
 
+import heapq
+import itertools
 import random
 import time
 import requests
@@ -28,35 +30,159 @@ class ProxyConfig:
     failure_count: int = 0
     max_failures: int = 3
     is_active: bool = True
+    # Medias móviles exponenciales (None hasta la primera medida)
+    ewma_latency: Optional[float] = None  # Segundos hasta la cabecera de respuesta
+    ewma_bytes_per_sec: Optional[float] = None  # Velocidad de transferencia del cuerpo
+    ewma_block_rate: float = 0.0  # Fracción de respuestas bloqueadas o fallidas
+
+
+class FenwickTree:
+    """
+    Árbol de Fenwick sobre pesos no negativos
+    Permite cambiar un peso y buscar por suma acumulada en O(log n)
+    """
+    
+    def __init__(self, weights: List[float]):
+        self.size = len(weights)
+        self.weights = list(weights)
+        self.tree = [0.0] * (self.size + 1)
+        self.total = 0.0
+        self.updates = 0
+        
+        # Construcción en O(n)
+        for i, weight in enumerate(self.weights, start=1):
+            self.tree[i] += weight
+            parent = i + (i & -i)
+            if parent <= self.size:
+                self.tree[parent] += self.tree[i]
+            self.total += weight
+    
+    def update(self, index: int, weight: float):
+        """Fijar el peso de la posición `index`"""
+        delta = weight - self.weights[index]
+        if delta == 0:
+            return
+        
+        self.weights[index] = weight
+        self.total += delta
+        self.updates += 1
+        i = index + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+    
+    def find(self, target: float) -> int:
+        """Primera posición cuya suma acumulada supera `target`"""
+        position = 0
+        step = 1 << self.size.bit_length()
+        while step:
+            nxt = position + step
+            if nxt <= self.size and self.tree[nxt] <= target:
+                position = nxt
+                target -= self.tree[nxt]
+            step >>= 1
+        return min(position, self.size - 1)
+
 
 class ProxyRotator:
     """
     Gestor de rotación de proxies con estrategias avanzadas
     """
     
-    def __init__(self, config_file: str = "config/proxies.json"):
+    DEFAULT_TEST_URLS = [
+        'https://httpbin.org/ip',
+        'https://www.imdb.com/robots.txt'
+    ]
+    
+    DEFAULT_IP_CHECK_URLS = [
+        'https://httpbin.org/ip',
+        'https://api.ipify.org?format=json',
+        'https://jsonip.com',
+        'https://ifconfig.me/ip'
+    ]
+    
+    SELECTION_STRATEGIES = ('weighted', 'least_used')
+    
+    # Latencia supuesta para proxies aún sin medidas (s)
+    DEFAULT_LATENCY = 2.0
+    # Tamaño de página de referencia para convertir bytes/s en segundos
+    REFERENCE_PAGE_BYTES = 250_000
+    # Cuerpos menores no dan una medida fiable de velocidad (domina la latencia)
+    MIN_THROUGHPUT_SAMPLE_BYTES = 16_384
+    # Peso mínimo: un proxy penalizado sigue recibiendo algo de tráfico y puede recuperarse
+    MIN_SCORE = 1e-3
+    
+    def __init__(self, config_file: str = "config/proxies.json",
+                 test_urls: Optional[List[str]] = None,
+                 ip_check_urls: Optional[List[str]] = None,
+                 test_timeout: float = 15,
+                 ip_cache_ttl: float = 600,
+                 selection_strategy: str = 'weighted',
+                 ewma_alpha: float = 0.3,
+                 log_file: Optional[str] = 'logs/proxy_manager.log'):
+        if selection_strategy not in self.SELECTION_STRATEGIES:
+            raise ValueError(f"Estrategia de selección desconocida: {selection_strategy}")
+        
         self.config_file = config_file
+        self.test_urls = test_urls or self.DEFAULT_TEST_URLS
+        self.ip_check_urls = ip_check_urls or self.DEFAULT_IP_CHECK_URLS
+        self.test_timeout = test_timeout
+        
+        self.selection_strategy = selection_strategy
+        self.ewma_alpha = ewma_alpha
+        
+        # Índice 'weighted': árbol de Fenwick con la puntuación de cada proxy
+        self._weights: Optional[FenwickTree] = None
+        self._position: Dict[int, int] = {}
+        
+        # Índice 'least_used': heap de (fallos, último uso, secuencia, proxy).
+        # Las entradas no se borran al cambiar un proxy; se invalidan porque
+        # su secuencia deja de coincidir con la vigente y se descartan al salir
+        self._heap: List[Tuple[int, int, int, ProxyConfig]] = []
+        self._entry_seq: Dict[int, int] = {}
+        self._last_use: Dict[int, int] = {}
+        self._sequence = itertools.count()
+        self._use_counter = itertools.count(1)
+        
         self.proxies: List[ProxyConfig] = []
-        self.current_proxy_index = 0
         self.request_count = 0
-        self.rotation_threshold = 10  # Cambiar proxy cada 10 requests
-        self.logger = self._setup_logger()
+        # Ronda de pruebas de salud en curso (ProxyHealthProber)
+        self.probing = False
+        self.logger = self._setup_logger(log_file)
         self.ip_history: List[Dict] = []
         
+        # Caché proxy -> (IP de salida, instante de verificación)
+        self.ip_cache_ttl = ip_cache_ttl
+        self.exit_ip_cache: Dict[str, Tuple[str, float]] = {}
+        
         # Cargar configuración de proxies
         self._load_proxy_config()
         
         # Proxies públicos de respaldo (TOR y otros)
         self._setup_fallback_proxies()
+        
+        self._rebuild_index()
+    
+    @property
+    def proxies(self) -> List[ProxyConfig]:
+        return self._proxies
     
-    def _setup_logger(self) -> logging.Logger:
-        """Configurar logger específico para proxies"""
+    @proxies.setter
+    def proxies(self, proxies: List[ProxyConfig]):
+        """Reemplazar el pool de proxies y reconstruir el índice de selección"""
+        self._proxies = list(proxies)
+        self._rebuild_index()
+    
+    def _setup_logger(self, log_file: Optional[str]) -> logging.Logger:
+        """Configurar logger específico para proxies (sin fichero si log_file es None)"""
         logger = logging.getLogger('proxy_manager')
         logger.setLevel(logging.INFO)
+        if log_file is None:
+            return logger
         
         # Crear handler para archivo
-        os.makedirs('logs', exist_ok=True)
-        handler = logging.FileHandler('logs/proxy_manager.log')
+        os.makedirs(os.path.dirname(log_file) or '.', exist_ok=True)
+        handler = logging.FileHandler(log_file)
         formatter = logging.Formatter(
             '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
         )
@@ -105,31 +231,19 @@ class ProxyRotator:
                 }
             
             # Usar varios servicios para verificar IP
-            ip_services = [
-                'https://httpbin.org/ip',
-                'https://api.ipify.org?format=json',
-                'https://jsonip.com',
-                'https://ifconfig.me/ip'
-            ]
-            
-            for service in ip_services:
+            for service in self.ip_check_urls:
                 try:
                     response = requests.get(
                         service, 
                         proxies=proxy_dict, 
-                        timeout=10,
+                        timeout=self.test_timeout,
                         headers={'User-Agent': 'Mozilla/5.0 (compatible; IP-Checker)'}
                     )
                     
                     if response.status_code == 200:
-                        if 'httpbin.org' in service:
-                            return response.json().get('origin', '').split(',')[0].strip()
-                        elif 'ipify.org' in service:
-                            return response.json().get('ip')
-                        elif 'jsonip.com' in service:
-                            return response.json().get('ip')
-                        else:
-                            return response.text.strip()
+                        ip = self._parse_ip_response(response)
+                        if ip:
+                            return ip
                 except:
                     continue
             
@@ -139,6 +253,18 @@ class ProxyRotator:
             self.logger.error(f"Error obteniendo IP actual: {e}")
             return None
     
+    def _parse_ip_response(self, response) -> Optional[str]:
+        """Extraer la IP de la respuesta de un servicio de eco (JSON o texto plano)"""
+        try:
+            data = response.json()
+            if isinstance(data, dict):
+                ip = data.get('origin') or data.get('ip') or ''
+                return ip.split(',')[0].strip() or None
+        except ValueError:
+            pass
+        
+        return response.text.strip() or None
+    
     def _build_proxy_url(self, proxy: ProxyConfig) -> str:
         """Construir URL del proxy"""
         auth = ""
@@ -157,16 +283,11 @@ class ProxyRotator:
             }
             
             # Probar con IMDb específicamente
-            test_urls = [
-                'https://httpbin.org/ip',
-                'https://www.imdb.com/robots.txt'
-            ]
-            
-            for url in test_urls:
+            for url in self.test_urls:
                 response = requests.get(
                     url,
                     proxies=proxy_dict,
-                    timeout=15,
+                    timeout=self.test_timeout,
                     headers={
                         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
                     }
@@ -178,6 +299,7 @@ class ProxyRotator:
             # Obtener y registrar IP
             current_ip = self.get_current_ip(proxy)
             if current_ip:
+                self.cache_exit_ip(proxy, current_ip)
                 self.logger.info(f"Proxy {proxy.host}:{proxy.port} funciona. IP: {current_ip}")
                 return True
             
@@ -187,34 +309,183 @@ class ProxyRotator:
             self.logger.error(f"Error probando proxy {proxy.host}:{proxy.port}: {e}")
             return False
     
+    def _proxy_key(self, proxy: ProxyConfig) -> str:
+        return f"{proxy.host}:{proxy.port}"
+    
+    def cache_exit_ip(self, proxy: ProxyConfig, ip: str):
+        """Guardar la IP de salida verificada de un proxy"""
+        key = self._proxy_key(proxy)
+        previous = self.exit_ip_cache.get(key)
+        
+        if previous and previous[0] != ip:
+            self.logger.info(f"IP de salida de {key} cambió: {previous[0]} -> {ip}")
+        
+        self.exit_ip_cache[key] = (ip, time.monotonic())
+    
+    def get_cached_ip(self, proxy: ProxyConfig) -> Optional[str]:
+        """IP de salida en caché del proxy, aunque haya caducado (None si nunca se verificó)"""
+        entry = self.exit_ip_cache.get(self._proxy_key(proxy))
+        return entry[0] if entry else None
+    
+    def is_ip_stale(self, proxy: ProxyConfig) -> bool:
+        """True si la IP de salida del proxy no está en caché o superó el TTL"""
+        entry = self.exit_ip_cache.get(self._proxy_key(proxy))
+        return entry is None or time.monotonic() - entry[1] > self.ip_cache_ttl
+    
+    def _is_available(self, proxy: ProxyConfig) -> bool:
+        return proxy.is_active and proxy.failure_count < proxy.max_failures
+    
+    def proxy_score(self, proxy: ProxyConfig) -> float:
+        """
+        Puntuación de selección: páginas limpias por segundo esperadas
+        
+        Combina la latencia y la velocidad de transferencia medidas en el
+        tiempo estimado para una página de referencia, penalizado por la
+        tasa de bloqueos y por los fallos recientes
+        """
+        if not self._is_available(proxy):
+            return 0.0
+        
+        seconds = proxy.ewma_latency if proxy.ewma_latency is not None else self.DEFAULT_LATENCY
+        if proxy.ewma_bytes_per_sec:
+            seconds += self.REFERENCE_PAGE_BYTES / proxy.ewma_bytes_per_sec
+        
+        clean_rate = (1.0 - proxy.ewma_block_rate) ** 2
+        score = clean_rate / max(seconds, 0.01) / (1 + proxy.failure_count)
+        return max(score, self.MIN_SCORE)
+    
+    def record_response(self, proxy: ProxyConfig, latency: Optional[float] = None,
+                        size: int = 0, transfer_time: Optional[float] = None,
+                        blocked: bool = False):
+        """Actualizar las medias móviles del proxy con el resultado de un request"""
+        alpha = self.ewma_alpha
+        
+        if latency is not None:
+            if proxy.ewma_latency is None:
+                proxy.ewma_latency = latency
+            else:
+                proxy.ewma_latency = alpha * latency + (1 - alpha) * proxy.ewma_latency
+        
+        if size >= self.MIN_THROUGHPUT_SAMPLE_BYTES and transfer_time:
+            bytes_per_sec = size / max(transfer_time, 1e-3)
+            if proxy.ewma_bytes_per_sec is None:
+                proxy.ewma_bytes_per_sec = bytes_per_sec
+            else:
+                proxy.ewma_bytes_per_sec = alpha * bytes_per_sec + (1 - alpha) * proxy.ewma_bytes_per_sec
+        
+        proxy.ewma_block_rate = alpha * float(blocked) + (1 - alpha) * proxy.ewma_block_rate
+        
+        if self.selection_strategy == 'weighted':
+            self._index_proxy(proxy)
+    
+    def _index_proxy(self, proxy: ProxyConfig):
+        """Actualizar la entrada del proxy en el índice de selección"""
+        if self.selection_strategy == 'weighted':
+            position = self._position.get(id(proxy))
+            if position is not None:
+                self._weights.update(position, self.proxy_score(proxy))
+                # Recalcular de cero para no acumular error de coma flotante
+                if self._weights.updates > 4 * self._weights.size + 64:
+                    self._rebuild_index()
+            return
+        
+        # Reinsertar con su clave actual, invalidando la anterior
+        seq = next(self._sequence)
+        self._entry_seq[id(proxy)] = seq
+        heapq.heappush(self._heap, (proxy.failure_count, self._last_use.get(id(proxy), 0), seq, proxy))
+        
+        # Compactar si las entradas invalidadas dominan el heap
+        if len(self._heap) > 2 * len(self._proxies) + 64:
+            self._rebuild_index()
+    
+    def _rebuild_index(self):
+        """Reconstruir el índice de selección desde el pool (O(n))"""
+        if self.selection_strategy == 'weighted':
+            self._position = {id(proxy): i for i, proxy in enumerate(self._proxies)}
+            self._weights = FenwickTree([self.proxy_score(proxy) for proxy in self._proxies])
+            return
+        
+        self._heap = []
+        self._entry_seq = {}
+        for proxy in self._proxies:
+            if self._is_available(proxy):
+                seq = next(self._sequence)
+                self._entry_seq[id(proxy)] = seq
+                self._heap.append((proxy.failure_count, self._last_use.get(id(proxy), 0), seq, proxy))
+        heapq.heapify(self._heap)
+    
+    def _pop_available(self) -> Optional[ProxyConfig]:
+        """Extraer el proxy con menos fallos y uso más antiguo, descartando entradas obsoletas"""
+        while self._heap:
+            _, _, seq, proxy = heapq.heappop(self._heap)
+            if self._entry_seq.get(id(proxy)) != seq:
+                continue
+            del self._entry_seq[id(proxy)]
+            if self._is_available(proxy):
+                return proxy
+        return None
+    
+    def _pick_weighted(self) -> Optional[ProxyConfig]:
+        """Elegir un proxy al azar con probabilidad proporcional a su puntuación"""
+        while self._weights.total > 1e-12:
+            index = self._weights.find(random.random() * self._weights.total)
+            proxy = self._proxies[index]
+            if self._is_available(proxy):
+                return proxy
+            # Desactivado sin pasar por el rotador: sacarlo del sorteo
+            self._weights.update(index, 0.0)
+        return None
+    
+    def set_proxy_active(self, proxy: ProxyConfig, active: bool):
+        """Activar o desactivar un proxy manteniendo el índice de selección"""
+        proxy.is_active = active
+        if self.selection_strategy == 'weighted' or self._is_available(proxy):
+            self._index_proxy(proxy)
+    
+    def apply_health_results(self, results):
+        """
+        Volcar de una vez los resultados de una ronda de pruebas de salud
+        
+        Solo cambia is_active: los fallos que el tráfico real haya acumulado
+        durante la ronda se conservan. El índice se reconstruye una vez.
+        """
+        for proxy, healthy in results:
+            proxy.is_active = bool(healthy)
+        self._rebuild_index()
+        self.probing = False
+    
     def get_next_proxy(self) -> Optional[ProxyConfig]:
-        """Obtener el siguiente proxy en rotación"""
+        """
+        Obtener el siguiente proxy en rotación
+        
+        'weighted': sorteo ponderado por puntuación (latencia, velocidad y bloqueos)
+        'least_used': menos fallos y uso más antiguo primero
+        """
         if not self.proxies:
             return None
         
-        # Filtrar proxies activos
-        active_proxies = [p for p in self.proxies if p.is_active and p.failure_count < p.max_failures]
+        weighted = self.selection_strategy == 'weighted'
+        proxy = self._pick_weighted() if weighted else self._pop_available()
         
-        if not active_proxies:
+        if proxy is None:
+            if self.probing:
+                # El reinicio desharía los resultados de la ronda en curso y los fallos reales
+                self.logger.warning("Sin proxies disponibles durante las pruebas de salud")
+                return None
+            
             # Reiniciar contadores de fallo si todos han fallado
-            for proxy in self.proxies:
-                proxy.failure_count = 0
-                proxy.is_active = True
-            active_proxies = self.proxies
+            for p in self.proxies:
+                p.failure_count = 0
+                p.is_active = True
+            self._rebuild_index()
             self.logger.warning("Reiniciando contadores de proxy - todos habían fallado")
+            proxy = self._pick_weighted() if weighted else self._pop_available()
         
-        # Selección basada en estrategia
-        if self.request_count % self.rotation_threshold == 0 or self.current_proxy_index >= len(active_proxies):
-            # Rotación automática o reinicio
-            self.current_proxy_index = 0
-            
-            # Ordenar por último uso y fallos
-            active_proxies.sort(key=lambda p: (p.failure_count, p.last_used or datetime.min))
-        
-        proxy = active_proxies[self.current_proxy_index % len(active_proxies)]
         proxy.last_used = datetime.now()
+        if not weighted:
+            self._last_use[id(proxy)] = next(self._use_counter)
+            self._index_proxy(proxy)
         
-        self.current_proxy_index += 1
         self.request_count += 1
         
         return proxy
@@ -225,15 +496,29 @@ class ProxyRotator:
         
         if proxy.failure_count >= proxy.max_failures:
             proxy.is_active = False
+            if self.selection_strategy == 'weighted':
+                self._index_proxy(proxy)
             self.logger.warning(f"Proxy {proxy.host}:{proxy.port} desactivado tras {proxy.failure_count} fallos")
         else:
+            self._index_proxy(proxy)
             self.logger.info(f"Proxy {proxy.host}:{proxy.port} falló. Intentos: {proxy.failure_count}/{proxy.max_failures}")
     
-    def mark_proxy_success(self, proxy: ProxyConfig, ip_used: str):
-        """Marcar un proxy como exitoso y registrar IP"""
+    def mark_proxy_success(self, proxy: ProxyConfig, ip_used: Optional[str] = None):
+        """Marcar un proxy como exitoso y registrar IP (de la caché si no se indica)"""
+        previous = (proxy.failure_count, proxy.is_active)
         proxy.failure_count = max(0, proxy.failure_count - 1)  # Reducir contador de fallos
         proxy.is_active = True
         
+        # Reindexar solo si cambió su clave o había salido del heap
+        if (proxy.failure_count, proxy.is_active) != previous or (
+                self.selection_strategy == 'least_used' and id(proxy) not in self._entry_seq):
+            self._index_proxy(proxy)
+        
+        if ip_used:
+            self.cache_exit_ip(proxy, ip_used)
+        else:
+            ip_used = self.get_cached_ip(proxy)
+        
         # Registrar en historial
         self.ip_history.append({
             'timestamp': datetime.now().isoformat(),
@@ -256,7 +541,20 @@ class ProxyRotator:
         """Obtener estadísticas del gestor de proxies"""
         active_count = sum(1 for p in self.proxies if p.is_active)
         total_requests = len(self.ip_history)
-        unique_ips = len(set(record['ip_used'] for record in self.ip_history))
+        unique_ips = len(set(record['ip_used'] for record in self.ip_history if record['ip_used']))
+        
+        # Proxies con mejor puntuación y sus medias móviles
+        best = heapq.nlargest(5, self.proxies, key=self.proxy_score)
+        top_proxies = [
+            {
+                'proxy': self._proxy_key(p),
+                'score': round(self.proxy_score(p), 3),
+                'latency': round(p.ewma_latency, 3) if p.ewma_latency is not None else None,
+                'bytes_per_sec': round(p.ewma_bytes_per_sec) if p.ewma_bytes_per_sec else None,
+                'block_rate': round(p.ewma_block_rate, 3),
+            }
+            for p in best
+        ]
         
         return {
             'total_proxies': len(self.proxies),
@@ -264,6 +562,8 @@ class ProxyRotator:
             'total_requests': total_requests,
             'unique_ips_used': unique_ips,
             'current_request_count': self.request_count,
+            'selection_strategy': self.selection_strategy,
+            'top_proxies': top_proxies,
             'ip_history': self.ip_history[-10:]  # Últimas 10 IPs usadas
         }
     
@@ -3,17 +3,21 @@ Middleware de Scrapy para rotación automática de proxies
 Integra con el ProxyManager para control avanzado de red
 """
 
-import random
-import time
 import logging
+import time
 from typing import Optional
+from urllib.parse import urlparse
 from scrapy import signals
 from scrapy.downloadermiddlewares.retry import RetryMiddleware
+from scrapy.utils.defer import maybe_deferred_to_future
 from scrapy.utils.response import response_status_message
 from scrapy.exceptions import NotConfigured, IgnoreRequest
 from twisted.internet.error import TimeoutError, DNSLookupError, ConnectionRefusedError, ConnectionLost
 
+from .block_detector import BlockDetector
 from .proxy_manager import ProxyRotator, ProxyConfig
+from .proxy_prober import ProxyHealthProber, ExitIPVerifier
+from .tor_control import TorControlClient
 
 
 class ProxyRotationMiddleware:
@@ -22,7 +26,35 @@ class ProxyRotationMiddleware:
     """
     
     def __init__(self, settings):
-        self.proxy_rotator = ProxyRotator()
+        self.proxy_rotator = ProxyRotator(
+            config_file=settings.get('PROXY_CONFIG_FILE', 'config/proxies.json'),
+            test_urls=settings.getlist('PROXY_HEALTH_CHECK_URLS') or None,
+            ip_check_urls=settings.getlist('IP_CHECK_URLS') or None,
+            test_timeout=settings.getfloat('PROXY_HEALTH_CHECK_TIMEOUT', 15),
+            ip_cache_ttl=settings.getfloat('PROXY_IP_CACHE_TTL', 600),
+            selection_strategy=settings.get('PROXY_SELECTION_STRATEGY', 'weighted'),
+            ewma_alpha=settings.getfloat('PROXY_EWMA_ALPHA', 0.3),
+        )
+        self.block_detector = BlockDetector.from_settings(settings)
+        self.ip_verification = settings.getbool('PROXY_IP_VERIFICATION', True)
+        self.slot_per_proxy = settings.getbool('PROXY_DOWNLOAD_SLOTS', True)
+        # Límite global = proxies sanos × límite por slot (AdaptiveConcurrency lo gestiona si está activo)
+        self.scale_total_concurrency = self.slot_per_proxy and not settings.getbool('ADAPTIVE_CONCURRENCY_ENABLED')
+        self.min_total_concurrency = max(1, settings.getint('CONCURRENT_REQUESTS', 1))
+        self.per_slot_concurrency = max(1, settings.getint('CONCURRENT_REQUESTS_PER_DOMAIN', 1))
+        self.max_total_concurrency = max(self.min_total_concurrency, settings.getint('PROXY_TOTAL_CONCURRENCY_MAX', 16))
+        self.sized_active_proxies = None
+        self.crawler = None
+        self.ip_verifier = ExitIPVerifier(
+            self.proxy_rotator,
+            max_workers=settings.getint('PROXY_IP_VERIFIER_WORKERS', 2),
+        )
+        self.prober = ProxyHealthProber(
+            self.proxy_rotator,
+            time_budget=settings.getfloat('PROXY_HEALTH_CHECK_BUDGET', 20),
+            min_healthy=settings.getint('PROXY_HEALTH_MIN_HEALTHY', 1),
+            max_workers=settings.getint('PROXY_HEALTH_CHECK_WORKERS', 20),
+        )
         self.enabled = settings.getbool('PROXY_ROTATION_ENABLED', True)
         self.max_retry_times = settings.getint('PROXY_RETRY_TIMES', 3)
         self.retry_priority_adjust = settings.getint('RETRY_PRIORITY_ADJUST', -1)
@@ -49,10 +81,13 @@ class ProxyRotationMiddleware:
         """Crear instancia desde crawler"""
         settings = crawler.settings
         middleware = cls(settings)
+        middleware.crawler = crawler
         
         # Conectar señales
         crawler.signals.connect(middleware.spider_opened, signal=signals.spider_opened)
         crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(middleware.headers_received, signal=signals.headers_received)
+        crawler.signals.connect(middleware.response_downloaded, signal=signals.response_downloaded)
         
         return middleware
     
@@ -60,8 +95,8 @@ class ProxyRotationMiddleware:
         """Ejecutar cuando el spider se abre"""
         self.logger.info(f"Spider {spider.name} iniciado con rotación de proxies")
         
-        # Probar proxies al inicio
-        self._test_initial_proxies()
+        # Probar proxies al inicio; el crawl arranca cuando el Deferred se dispara
+        return self._test_initial_proxies()
     
     def spider_closed(self, spider):
         """Ejecutar cuando el spider se cierra"""
@@ -75,16 +110,50 @@ class ProxyRotationMiddleware:
         self.logger.info(f"  - IPs únicas usadas: {stats['unique_ips_used']}")
         self.logger.info(f"  - Proxies activos: {stats['active_proxies']}/{stats['total_proxies']}")
     
+    def headers_received(self, headers, body_length, request, spider):
+        """Marcar el inicio de la transferencia del cuerpo"""
+        if request.meta.get('proxy_config'):
+            request.meta['proxy_headers_at'] = time.monotonic()
+    
+    def response_downloaded(self, response, request, spider):
+        """Medir la transferencia del cuerpo (bytes en el cable, antes de descomprimir)"""
+        started = request.meta.pop('proxy_headers_at', None)
+        if started is not None:
+            request.meta['proxy_transfer_time'] = time.monotonic() - started
+            request.meta['proxy_wire_bytes'] = len(response.body)
+    
     def _test_initial_proxies(self):
-        """Probar proxies al inicio para validar disponibilidad"""
-        self.logger.info("Probando proxies disponibles...")
-        
-        working_proxies = 0
-        for proxy in self.proxy_rotator.proxies:
-            if self.proxy_rotator.test_proxy(proxy):
-                working_proxies += 1
+        """Probar proxies en paralelo al inicio para validar disponibilidad"""
+        self.logger.info(f"Probando {len(self.proxy_rotator.proxies)} proxies en paralelo...")
         
-        self.logger.info(f"{working_proxies}/{len(self.proxy_rotator.proxies)} proxies funcionando")
+        d = self.prober.probe_all()
+        d.addCallback(self._log_initial_proxies)
+        return d
+    
+    def _log_initial_proxies(self, working_proxies):
+        self.logger.info(f"{working_proxies}/{len(self.proxy_rotator.proxies)} proxies funcionando al arrancar")
+        self._update_total_concurrency()
+    
+    def _update_total_concurrency(self):
+        """
+        Ajustar el límite global del downloader al número de proxies activos
+
+        Con un slot por proxy, CONCURRENT_REQUESTS = 1 dejaría todos los slots
+        salvo uno parados: el total pasa a proxies activos ×
+        CONCURRENT_REQUESTS_PER_DOMAIN, entre CONCURRENT_REQUESTS y
+        PROXY_TOTAL_CONCURRENCY_MAX. Se recalcula al terminar las pruebas de
+        salud y cuando un proxy se activa o desactiva.
+        """
+        if not self.scale_total_concurrency or self.crawler is None or self.crawler.engine is None:
+            return
+        
+        active = sum(1 for proxy in self.proxy_rotator.proxies if proxy.is_active)
+        self.sized_active_proxies = active
+        total = min(self.max_total_concurrency, max(self.min_total_concurrency, active * self.per_slot_concurrency))
+        downloader = self.crawler.engine.downloader
+        if total != downloader.total_concurrency:
+            self.logger.info(f"Límite global de concurrencia: {downloader.total_concurrency} -> {total} ({active} proxies activos)")
+            downloader.total_concurrency = total
     
     def process_request(self, request, spider):
         """Procesar request agregando proxy"""
@@ -93,11 +162,16 @@ class ProxyRotationMiddleware:
         # Obtener proxy para este request
         proxy = self.proxy_rotator.get_next_proxy()
         
+        # Tras caer todos, get_next_proxy los reactiva: recuperar el límite global
+        if self.sized_active_proxies == 0 and proxy and proxy.is_active:
+            self._update_total_concurrency()
+        
         if proxy and proxy.is_active:
             # Configurar proxy en el request
             proxy_url = self._build_proxy_url(proxy)
             request.meta['proxy'] = proxy_url
             request.meta['proxy_config'] = proxy
+            self._assign_slot(request, proxy)
             
             # Headers adicionales para evitar detección
             self._add_stealth_headers(request)
@@ -111,6 +185,7 @@ class ProxyRotationMiddleware:
             # Sin proxy disponible - usar conexión directa
             request.meta.pop('proxy', None)
             request.meta['proxy_config'] = None
+            self._assign_slot(request, None)
             self.logger.warning("No hay proxies disponibles - usando conexión directa")
         
         return None
@@ -118,20 +193,39 @@ class ProxyRotationMiddleware:
     def process_response(self, request, response, spider):
         """Procesar respuesta y manejar errores de proxy"""
         proxy_config = request.meta.get('proxy_config')
+        block_reason = self.block_detector.match(response)
+        blocked = block_reason is not None
+        
+        if proxy_config:
+            # Alimentar la puntuación del proxy (latencia, velocidad y bloqueos)
+            self.proxy_rotator.record_response(
+                proxy_config,
+                latency=request.meta.get('download_latency'),
+                size=request.meta.get('proxy_wire_bytes', 0),
+                transfer_time=request.meta.get('proxy_transfer_time'),
+                blocked=blocked,
+            )
         
-        # Verificar si la respuesta indica bloqueo
-        if self._is_blocked_response(response):
-            return self._retry_with_different_proxy(request, response, spider, "Respuesta bloqueada")
+        # Verificar si la respuesta indica bloqueo: se reintenta con otro proxy;
+        # sin proxy o sin reintentos la respuesta sigue hacia NetworkResilienceMiddleware
+        if blocked and proxy_config:
+            retry_request = self._retry_with_different_proxy(
+                request, response, spider, f"Respuesta bloqueada ({block_reason})"
+            )
+            return retry_request or response
         
-        # Respuesta exitosa
-        if proxy_config and response.status == 200:
-            # Obtener IP usada si es posible
+        # Respuesta exitosa (304: re-crawl condicional sin cambios)
+        if proxy_config and response.status in (200, 304):
+            # Obtener IP usada si es posible; si no, se usa la de la caché
             current_ip = self._extract_ip_from_response(response)
-            if current_ip:
-                self.proxy_rotator.mark_proxy_success(proxy_config, current_ip)
-            else:
-                # Intentar obtener IP en segundo plano
-                self._verify_proxy_ip(proxy_config)
+            if not current_ip and self.ip_verification:
+                # Refrescar la IP en segundo plano si la caché caducó
+                self.ip_verifier.request_refresh(proxy_config)
+            
+            was_active = proxy_config.is_active
+            self.proxy_rotator.mark_proxy_success(proxy_config, current_ip)
+            if not was_active:
+                self._update_total_concurrency()
         
         return response
     
@@ -143,7 +237,10 @@ class ProxyRotationMiddleware:
         proxy_errors = (TimeoutError, DNSLookupError, ConnectionRefusedError, ConnectionLost)
         
         if isinstance(exception, proxy_errors) and proxy_config:
+            self.proxy_rotator.record_response(proxy_config, blocked=True)
             self.proxy_rotator.mark_proxy_failed(proxy_config)
+            if not proxy_config.is_active:
+                self._update_total_concurrency()
             self.stats['proxy_failures'] += 1
             
             return self._retry_with_different_proxy(
@@ -156,6 +253,12 @@ class ProxyRotationMiddleware:
         """Reintentar request con un proxy diferente"""
         retry_times = request.meta.get('retry_times', 0) + 1
         
+        # Con plazo (CRAWL_DEADLINE_SECONDS) solo se reintenta lo que aún cabe
+        deadline = getattr(spider, 'crawl_deadline', None)
+        if retry_times <= self.max_retry_times and deadline is not None and not deadline.admits_retry(request):
+            self.logger.info(f"Sin reintento por el plazo del crawl: {request.url} ({reason})")
+            raise IgnoreRequest(f"Plazo del crawl: reintento descartado {request.url}")
+        
         if retry_times <= self.max_retry_times:
             self.logger.info(f"Reintentando request {request.url} (intento {retry_times}): {reason}")
             
@@ -170,8 +273,8 @@ class ProxyRotationMiddleware:
                 new_request.meta['proxy_config'] = new_proxy
                 new_request.priority = request.priority + self.retry_priority_adjust
                 
-                # Añadir delay para evitar detección
-                time.sleep(random.uniform(1, 3))
+                # El delay del slot del nuevo proxy espacia el reintento
+                self._assign_slot(new_request, new_proxy)
                 
                 self.stats['retries'] += 1
                 self.stats['ip_changes'] += 1
@@ -184,6 +287,23 @@ class ProxyRotationMiddleware:
         self.logger.error(f"Request fallido tras {retry_times} intentos: {request.url}")
         return None
     
+    def _assign_slot(self, request, proxy: Optional[ProxyConfig]):
+        """
+        Asignar un slot de descarga por proxy
+
+        Cada IP de salida tiene así su propio DOWNLOAD_DELAY y límite de
+        concurrencia (CONCURRENT_REQUESTS_PER_DOMAIN), y el total escala con
+        el número de proxies sanos (_update_total_concurrency). Sin proxy se
+        usa el slot del dominio.
+        """
+        if not self.slot_per_proxy:
+            return
+        
+        if proxy:
+            request.meta['download_slot'] = f"proxy:{proxy.host}:{proxy.port}"
+        else:
+            request.meta.pop('download_slot', None)
+    
     def _build_proxy_url(self, proxy: ProxyConfig) -> str:
         """Construir URL del proxy"""
         auth = ""
@@ -206,32 +326,6 @@ class ProxyRotationMiddleware:
             if header not in request.headers:
                 request.headers[header] = value
     
-    def _is_blocked_response(self, response) -> bool:
-        """Detectar si la respuesta indica bloqueo"""
-        # Códigos de estado que indican bloqueo
-        blocked_status_codes = [403, 429, 503, 521, 522, 523, 524]
-        
-        if response.status in blocked_status_codes:
-            return True
-        
-        # Verificar contenido que indica bloqueo
-        blocked_indicators = [
-            b'blocked',
-            b'access denied',
-            b'rate limit',
-            b'too many requests',
-            b'captcha',
-            b'cloudflare',
-            b'please verify',
-        ]
-        
-        body_lower = response.body.lower()
-        for indicator in blocked_indicators:
-            if indicator in body_lower:
-                return True
-        
-        return False
-    
     def _extract_ip_from_response(self, response) -> Optional[str]:
         """Intentar extraer IP de la respuesta si es posible"""
         # Para páginas que muestran la IP (como httpbin.org)
@@ -244,27 +338,27 @@ class ProxyRotationMiddleware:
             pass
         
         return None
-    
-    def _verify_proxy_ip(self, proxy_config: ProxyConfig):
-        """Verificar IP del proxy en segundo plano"""
-        try:
-            current_ip = self.proxy_rotator.get_current_ip(proxy_config)
-            if current_ip:
-                self.proxy_rotator.mark_proxy_success(proxy_config, current_ip)
-        except:
-            pass  # No es crítico si falla
 
 
 class TorRotationMiddleware:
     """
     Middleware específico para rotación de identidad TOR
+
+    Usa una conexión de control persistente y asíncrona: la rotación no
+    bloquea el reactor y solo los requests enrutados por TOR esperan a que
+    se construya el nuevo circuito, incluido el que dispara la rotación.
     """
     
     def __init__(self, settings):
         self.enabled = settings.getbool('TOR_ROTATION_ENABLED', False)
         self.rotation_interval = settings.getint('TOR_ROTATION_INTERVAL', 30)
+        self.control_host = settings.get('TOR_CONTROL_HOST', '127.0.0.1')
         self.control_port = settings.getint('TOR_CONTROL_PORT', 9051)
         self.control_password = settings.get('TOR_CONTROL_PASSWORD', '')
+        self.tor_ports = {
+            settings.getint('TOR_SOCKS_PORT', 9050),
+            settings.getint('TOR_HTTP_PORT', 8118),
+        }
         
         self.request_count = 0
         self.logger = logging.getLogger(__name__)
@@ -272,61 +366,66 @@ class TorRotationMiddleware:
         if not self.enabled:
             raise NotConfigured('TOR rotation middleware disabled')
         
+        self.tor_control = TorControlClient(
+            host=self.control_host,
+            port=self.control_port,
+            password=self.control_password,
+            newnym_interval=settings.getfloat('TOR_NEWNYM_INTERVAL', 10),
+            circuit_wait=settings.getfloat('TOR_CIRCUIT_BUILD_WAIT', 2),
+        )
+        
         self.logger.info("TorRotationMiddleware inicializado")
     
     @classmethod
     def from_crawler(cls, crawler):
         """Crear instancia desde crawler"""
-        return cls(crawler.settings)
+        middleware = cls(crawler.settings)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
     
-    def process_request(self, request, spider):
+    def spider_closed(self, spider):
+        """Cerrar la conexión de control al terminar"""
+        self.tor_control.close()
+        self.logger.info(f"Estadísticas de control TOR: {self.tor_control.stats}")
+    
+    async def process_request(self, request, spider):
         """Procesar request y rotar identidad TOR si es necesario"""
         self.request_count += 1
         
-        # Rotar identidad cada X requests
+        # Rotar identidad cada X requests; si el request que la dispara sale
+        # por TOR, no se suelta hasta que TOR responda a NEWNYM (y luego
+        # espera al circuito nuevo como los demás)
         if self.request_count % self.rotation_interval == 0:
-            self._rotate_tor_identity()
+            rotation = self._rotate_tor_identity()
+            if self._is_tor_request(request):
+                await maybe_deferred_to_future(rotation)
+        
+        # Solo los requests que salen por TOR esperan al nuevo circuito
+        if self.tor_control.circuit_building and self._is_tor_request(request):
+            await maybe_deferred_to_future(self.tor_control.wait_for_circuit())
         
         return None
     
+    def _is_tor_request(self, request) -> bool:
+        """Detectar si el request está enrutado por el proxy local de TOR"""
+        proxy = request.meta.get('proxy')
+        if not proxy:
+            return False
+        
+        parsed = urlparse(proxy)
+        return parsed.hostname in ('127.0.0.1', 'localhost') and parsed.port in self.tor_ports
+    
     def _rotate_tor_identity(self):
-        """Rotar identidad TOR usando el puerto de control"""
-        try:
-            import socket
-            
-            # Conectar al puerto de control de TOR
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.connect(('127.0.0.1', self.control_port))
-                
-                # Autenticar si hay password
-                if self.control_password:
-                    s.send(f'AUTHENTICATE "{self.control_password}"\r\n'.encode())
-                else:
-                    s.send(b'AUTHENTICATE\r\n')
-                
-                # Leer respuesta
-                response = s.recv(1024)
-                
-                if b'250 OK' in response:
-                    # Solicitar nueva identidad
-                    s.send(b'SIGNAL NEWNYM\r\n')
-                    response = s.recv(1024)
-                    
-                    if b'250 OK' in response:
-                        self.logger.info("Identidad TOR rotada exitosamente")
-                        time.sleep(2)  # Esperar a que TOR establezca nueva ruta
-                    else:
-                        self.logger.error("Error rotando identidad TOR")
-                else:
-                    self.logger.error("Error autenticando con TOR")
-                    
-        except Exception as e:
-            self.logger.error(f"Error rotando identidad TOR: {e}")
+        """Rotar identidad TOR usando la conexión de control persistente"""
+        d = self.tor_control.new_identity()
+        d.addErrback(lambda failure: self.logger.error(f"Error rotando identidad TOR: {failure.getErrorMessage()}"))
+        return d
 
 
 # Configuración para settings.py
 PROXY_MIDDLEWARE_CONFIG = {
     'DOWNLOADER_MIDDLEWARES': {
+        'imdb_scraper.middlewares.NetworkResilienceMiddleware': 345,  # Por debajo: ve lo que los proxies no resuelven
         'imdb_scraper.proxy_middleware.ProxyRotationMiddleware': 350,
         'imdb_scraper.proxy_middleware.TorRotationMiddleware': 351,
         'scrapy.downloadermiddlewares.retry.RetryMiddleware': None,  # Deshabilitar retry por defecto
@@ -340,13 +439,18 @@ PROXY_MIDDLEWARE_CONFIG = {
     # Configuración de TOR
     'TOR_ROTATION_ENABLED': False,
     'TOR_ROTATION_INTERVAL': 10,
+    'TOR_CONTROL_HOST': '127.0.0.1',
     'TOR_CONTROL_PORT': 9051,
     'TOR_CONTROL_PASSWORD': '',
+    'TOR_NEWNYM_INTERVAL': 10,
+    'TOR_CIRCUIT_BUILD_WAIT': 2,
     
     # Configuración de requests
     'DOWNLOAD_TIMEOUT': 30,
     'DOWNLOAD_DELAY': 2,
     'RANDOMIZE_DOWNLOAD_DELAY': 0.5,
-    'CONCURRENT_REQUESTS': 1,
-    'CONCURRENT_REQUESTS_PER_DOMAIN': 1,
+    'CONCURRENT_REQUESTS': 1,  # Mínimo; el total escala con los proxies sanos
+    'PROXY_TOTAL_CONCURRENCY_MAX': 16,  # Techo del total (proxies × límite por slot)
+    'CONCURRENT_REQUESTS_PER_DOMAIN': 1,  # Por slot, es decir, por proxy
+    'PROXY_DOWNLOAD_SLOTS': True,
 }
@@ -0,0 +1,187 @@
+"""
+Verificación de proxies en segundo plano integrada con el reactor de Twisted
+Incluye el sondeo concurrente de salud al arrancar el spider y el refresco
+asíncrono de la caché de IPs de salida, sin hacer E/S de red en el reactor
+"""
+
+import logging
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from twisted.internet.defer import Deferred
+from twisted.internet.threads import deferToThreadPool
+from twisted.python.threadpool import ThreadPool
+
+from .proxy_manager import ProxyRotator, ProxyConfig
+
+
+class ProxyHealthProber:
+    """
+    Ejecuta ProxyRotator.test_proxy para todos los proxies a la vez
+
+    Mientras dura la ronda los proxies siguen en rotación con su estado
+    actual y ProxyRotator.probing impide el reinicio general de contadores.
+    Los resultados se acumulan y se vuelcan de una vez, con
+    ProxyRotator.apply_health_results, cuando termina la última prueba. Las
+    pruebas que siguen en curso cuando se libera el arranque continúan en
+    segundo plano.
+    """
+
+    def __init__(self, proxy_rotator: ProxyRotator, time_budget: float = 20.0,
+                 min_healthy: int = 1, max_workers: int = 20):
+        self.proxy_rotator = proxy_rotator
+        self.time_budget = time_budget
+        self.min_healthy = min_healthy
+        self.max_workers = max_workers
+        self.logger = logging.getLogger(__name__)
+
+        self.healthy = 0
+        self.failed = 0
+        self.pending = 0
+        self.results: List[Tuple[ProxyConfig, bool]] = []
+        self.started_at: Optional[float] = None
+        self._ready: Optional[Deferred] = None
+        self._deadline = None
+        self._pool: Optional[ThreadPool] = None
+
+    def probe_all(self) -> Deferred:
+        """
+        Lanzar las pruebas de todos los proxies
+
+        Returns:
+            Deferred: se dispara con el número de proxies sanos cuando se alcanza
+            `min_healthy`, vence el presupuesto de tiempo o terminan todas las pruebas
+        """
+        from twisted.internet import reactor
+
+        proxies = list(self.proxy_rotator.proxies)
+        self._ready = Deferred()
+        self.started_at = time.monotonic()
+
+        if not proxies:
+            self._ready.callback(0)
+            return self._ready
+
+        self._pool = ThreadPool(minthreads=0, maxthreads=min(self.max_workers, len(proxies)),
+                                name='proxy-health-prober')
+        self._pool.start()
+        reactor.addSystemEventTrigger('during', 'shutdown', self._stop_pool)
+
+        self.pending = len(proxies)
+        self.results = []
+        self.proxy_rotator.probing = True
+        for proxy in proxies:
+            d = deferToThreadPool(reactor, self._pool, self.proxy_rotator.test_proxy, proxy)
+            d.addCallbacks(self._on_result, self._on_error, callbackArgs=(proxy,), errbackArgs=(proxy,))
+
+        self._deadline = reactor.callLater(self.time_budget, self._release, 'presupuesto de tiempo agotado')
+        return self._ready
+
+    def _on_result(self, is_healthy: bool, proxy: ProxyConfig):
+        """Anotar el resultado de la prueba (se aplica al terminar la ronda)"""
+        self.pending -= 1
+        self.results.append((proxy, bool(is_healthy)))
+
+        if is_healthy:
+            self.healthy += 1
+        else:
+            self.failed += 1
+            self.logger.debug(f"Proxy {proxy.host}:{proxy.port} no superó la prueba de salud")
+
+        if self.healthy >= self.min_healthy:
+            self._release(f"{self.healthy} proxies sanos")
+        elif self.pending == 0:
+            self._release('todas las pruebas terminadas')
+
+        if self.pending == 0:
+            self.proxy_rotator.apply_health_results(self.results)
+            self._stop_pool()
+
+    def _on_error(self, failure, proxy: ProxyConfig):
+        self.logger.error(f"Error probando proxy {proxy.host}:{proxy.port}: {failure.getErrorMessage()}")
+        self._on_result(False, proxy)
+
+    def _release(self, reason: str):
+        """Liberar el arranque del crawl (una sola vez)"""
+        if self._ready is None or self._ready.called:
+            return
+
+        if self._deadline is not None and self._deadline.active():
+            self._deadline.cancel()
+
+        elapsed = time.monotonic() - self.started_at
+        self.logger.info(
+            f"Arranque liberado tras {elapsed:.1f}s ({reason}): "
+            f"{self.healthy} sanos, {self.failed} fallidos, {self.pending} en curso"
+        )
+        self._ready.callback(self.healthy)
+
+    def _stop_pool(self):
+        if self._pool is not None and self._pool.started:
+            self._pool.stop()
+
+
+class ExitIPVerifier:
+    """
+    Refresca en segundo plano la caché proxy -> IP de salida de ProxyRotator
+
+    Las peticiones a los servicios de eco de IP se ejecutan en un pool de
+    hilos propio; el procesamiento de respuestas solo encola refrescos.
+    """
+
+    def __init__(self, proxy_rotator: ProxyRotator, max_workers: int = 2):
+        self.proxy_rotator = proxy_rotator
+        self.max_workers = max_workers
+        self.logger = logging.getLogger(__name__)
+
+        self.in_flight: Set[str] = set()
+        self.last_attempt: Dict[str, float] = {}
+        self.refreshes = 0
+        self._pool: Optional[ThreadPool] = None
+
+    def request_refresh(self, proxy: ProxyConfig) -> bool:
+        """
+        Encolar la verificación de la IP de salida si la caché está caducada
+
+        Returns:
+            bool: True si se lanzó un refresco nuevo
+        """
+        key = f"{proxy.host}:{proxy.port}"
+        if key in self.in_flight or not self.proxy_rotator.is_ip_stale(proxy):
+            return False
+
+        # Tras un intento fallido no se reintenta hasta que pase otro TTL
+        now = time.monotonic()
+        if now - self.last_attempt.get(key, float('-inf')) < self.proxy_rotator.ip_cache_ttl:
+            return False
+
+        from twisted.internet import reactor
+
+        if self._pool is None:
+            self._pool = ThreadPool(minthreads=0, maxthreads=self.max_workers, name='exit-ip-verifier')
+            self._pool.start()
+            reactor.addSystemEventTrigger('during', 'shutdown', self.stop)
+
+        self.in_flight.add(key)
+        self.last_attempt[key] = now
+        d = deferToThreadPool(reactor, self._pool, self.proxy_rotator.get_current_ip, proxy)
+        d.addCallbacks(self._on_ip, self._on_error, callbackArgs=(proxy,), errbackArgs=(proxy,))
+        d.addBoth(self._done, key)
+        return True
+
+    def _on_ip(self, ip: Optional[str], proxy: ProxyConfig):
+        if ip:
+            self.proxy_rotator.cache_exit_ip(proxy, ip)
+            self.refreshes += 1
+        else:
+            self.logger.debug(f"No se pudo verificar la IP de salida de {proxy.host}:{proxy.port}")
+
+    def _on_error(self, failure, proxy: ProxyConfig):
+        self.logger.debug(f"Error verificando IP de {proxy.host}:{proxy.port}: {failure.getErrorMessage()}")
+
+    def _done(self, _, key: str):
+        self.in_flight.discard(key)
+
+    def stop(self):
+        if self._pool is not None and self._pool.started:
+            self._pool.stop()
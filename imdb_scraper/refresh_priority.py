@@ -0,0 +1,201 @@
+"""
+Prioridad de refresco de títulos para catálogos grandes
+Lee de la base de DatabasePipeline cuándo se refrescó cada título por última
+vez, su ranking y cuánto suele variar su rating, y con eso puntúa qué fichas
+conviene pedir antes: las de ranking alto, las que cambian a menudo y las que
+llevan más tiempo sin refrescarse
+"""
+
+import logging
+import math
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from .sqlite_store import resolve_path
+from .validator_store import DEFAULT_PATH as VALIDATORS_PATH
+
+
+# La base de DatabasePipeline (data/exports/peliculas.db)
+DEFAULT_PATH = os.path.join('data', 'exports', 'peliculas.db')
+
+DAY_SECONDS = 86400
+
+
+class TitleHistory(NamedTuple):
+    ranking: Optional[int]
+    rating: Optional[float]
+    volatility: float  # Media móvil exponencial del cambio absoluto de rating por día
+    refreshed_at: float
+
+
+class RefreshHistory:
+    """
+    Historial de refrescos por ID de título, de solo lectura
+
+    Cada fila de `peliculas` con imdb_id es un refresco con item (rating y
+    fecha_scraping); la volatilidad se calcula con las `max_rows` últimas
+    filas del título. Con re-crawl condicional las fichas sin cambios (304 o
+    mismo contenido) no escriben fila, pero ConditionalRequestMiddleware
+    actualiza la fecha de sus validadores: cuenta como refresco con cambio 0
+    (solo la última comprobación, y si es de otro día que la fila), de modo
+    que la volatilidad de los títulos estables decae. Un título nuevo
+    empieza con `prior` (cambio diario supuesto) hasta tener refrescos propios.
+
+    La base se abre en la primera consulta, cuando DatabasePipeline ya la ha
+    creado o migrado; sin base o sin la columna imdb_id no hay historial.
+    """
+
+    QUERY = (
+        "SELECT ranking, calificacion, CAST(strftime('%s', fecha_scraping) AS REAL) FROM peliculas "
+        "WHERE imdb_id = ? ORDER BY fecha_scraping DESC, id DESC LIMIT ?"
+    )
+
+    def __init__(self, path: str, validators_path: Optional[str] = None, alpha: float = 0.5,
+                 prior: float = 0.01, max_rows: int = 30):
+        self.path = path
+        self.validators_path = validators_path
+        self.alpha = alpha
+        self.prior = prior
+        self.max_rows = max_rows
+        self.connection = None
+        self.validators = False
+        self.opened = False
+        self.found = 0
+        self.logger = logging.getLogger(__name__)
+
+    @classmethod
+    def from_settings(cls, settings):
+        """Crear el historial si REFRESH_PRIORITY_ENABLED; None en caso contrario"""
+        if not settings.getbool('REFRESH_PRIORITY_ENABLED', False):
+            return None
+
+        validators_path = None
+        if settings.getbool('CONDITIONAL_REQUESTS_ENABLED', False):
+            validators_path = resolve_path(settings.get('CONDITIONAL_REQUESTS_PATH', VALIDATORS_PATH))
+        return cls(
+            resolve_path(settings.get('REFRESH_HISTORY_PATH', DEFAULT_PATH)),
+            validators_path=validators_path,
+            alpha=settings.getfloat('REFRESH_VOLATILITY_ALPHA', 0.5),
+            prior=settings.getfloat('REFRESH_VOLATILITY_PRIOR', 0.01),
+        )
+
+    @staticmethod
+    def _read_only_uri(path: str) -> str:
+        return Path(path).absolute().as_uri() + '?mode=ro'
+
+    def _connect(self):
+        """Abrir la base (una vez) en solo lectura; None si no tiene historial por título"""
+        if self.opened:
+            return self.connection
+        self.opened = True
+        if not os.path.exists(self.path):
+            return None
+
+        connection = sqlite3.connect(self._read_only_uri(self.path), uri=True)
+        columns = {row[1] for row in connection.execute('PRAGMA table_info(peliculas)')}
+        if 'imdb_id' not in columns:
+            connection.close()
+            return None
+
+        if self.validators_path and os.path.exists(self.validators_path):
+            connection.execute('ATTACH DATABASE ? AS validadores', (self._read_only_uri(self.validators_path),))
+            self.validators = True
+        self.connection = connection
+        return connection
+
+    def _volatility(self, volatility: float, change: float, since: float, now: float) -> float:
+        # Por día: un refresco tras una semana acumula más cambio que uno diario
+        days = max(1.0, (now - since) / DAY_SECONDS)
+        return self.alpha * change / days + (1 - self.alpha) * volatility
+
+    def get(self, imdb_id: str) -> Optional[TitleHistory]:
+        connection = self._connect()
+        if connection is None:
+            return None
+        rows = connection.execute(self.QUERY, (imdb_id, self.max_rows)).fetchall()
+        if not rows:
+            return None
+
+        # De la fila más antigua a la más reciente
+        ranking, rating, refreshed_at = rows.pop()
+        volatility = self.prior
+        for row_ranking, row_rating, row_date in reversed(rows):
+            change = abs(row_rating - rating) if row_rating is not None and rating is not None else 0.0
+            volatility = self._volatility(volatility, change, refreshed_at, row_date)
+            ranking = row_ranking if row_ranking is not None else ranking
+            rating = row_rating if row_rating is not None else rating
+            refreshed_at = row_date
+
+        if self.validators:
+            checked = connection.execute(
+                'SELECT fecha FROM validadores.validadores WHERE imdb_id = ?', (imdb_id,)
+            ).fetchone()
+            # Ficha sin cambios después de la última fila: refresco sin variación.
+            # Los validadores de una ficha cambiada se guardan segundos después
+            # de su fila y no son otro refresco
+            if checked and checked[0] > refreshed_at:
+                if checked[0] - refreshed_at >= DAY_SECONDS / 2:
+                    volatility = self._volatility(volatility, 0.0, refreshed_at, checked[0])
+                refreshed_at = checked[0]
+
+        self.found += 1
+        return TitleHistory(ranking, rating, volatility, refreshed_at)
+
+    def summary(self) -> str:
+        return f"🕰️ Historial de refrescos: {self.found} títulos con refrescos anteriores"
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+            self.logger.info(self.summary())
+
+
+class RefreshScorer:
+    """
+    Valor de refrescar un título ahora
+
+    score = días sin refrescar × cambio diario esperado × peso del ranking
+
+    - Peso del ranking: 1 / log2(ranking + 1) (1 para el primero, ~0.13 para el 250)
+    - Cambio diario esperado: `volatility_floor` + volatilidad observada, para
+      que un título estable acabe refrescándose si pasa el tiempo suficiente
+    - Los títulos nunca refrescados van primero (por ranking)
+    """
+
+    # Puntuación de los títulos sin historial: por encima de cualquier otro
+    NEVER_REFRESHED = 1e9
+
+    def __init__(self, volatility_floor: float = 0.001, max_age_days: float = 365.0,
+                 default_rank: int = 1000):
+        self.volatility_floor = volatility_floor
+        self.max_age_days = max_age_days
+        self.default_rank = default_rank
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(
+            volatility_floor=settings.getfloat('REFRESH_VOLATILITY_FLOOR', 0.001),
+            max_age_days=settings.getfloat('REFRESH_MAX_AGE_DAYS', 365.0),
+        )
+
+    def rank_weight(self, ranking: Optional[int]) -> float:
+        return 1.0 / math.log2(max(1, ranking or self.default_rank) + 1)
+
+    def score(self, history: Optional[TitleHistory], ranking: Optional[int] = None,
+              now: Optional[float] = None) -> float:
+        if history is None:
+            return self.NEVER_REFRESHED * self.rank_weight(ranking)
+
+        now = time.time() if now is None else now
+        age_days = min(self.max_age_days, max(0.0, now - history.refreshed_at) / DAY_SECONDS)
+        weight = self.rank_weight(ranking if ranking is not None else history.ranking)
+        return age_days * weight * (self.volatility_floor + history.volatility)
+
+    @staticmethod
+    def priority(score: float) -> int:
+        """Prioridad de Scrapy (entera, mayor sale antes) para una puntuación"""
+        return int(round(math.log10(1 + score) * 1000))
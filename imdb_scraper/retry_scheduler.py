@@ -0,0 +1,172 @@
+"""
+Planificador de reintentos diferidos para Scrapy
+Aparca los requests fallidos en una cola ordenada por instante de reintento
+y los reinyecta en el engine cuando expira su backoff, sin bloquear el reactor
+"""
+
+import heapq
+import itertools
+import logging
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from scrapy import signals
+from scrapy.exceptions import DontCloseSpider
+from scrapy.http import Request
+from scrapy.utils.httpobj import urlparse_cached
+
+
+class RetryScheduler:
+    """
+    Cola de reintentos ordenada por tiempo con presupuesto de reintentos por host
+
+    El presupuesto es un cubo de `per_host_budget` reintentos por host que se
+    rellena a `refill_per_minute` por minuto: una racha de errores no puede
+    gastar más del cubo, pero un crawl largo no se queda sin reintentos para
+    siempre por los fallos de hace horas.
+    """
+
+    def __init__(self, crawler, per_host_budget: int = 100, refill_per_minute: float = 10.0):
+        self.crawler = crawler
+        self.per_host_budget = per_host_budget
+        self.refill_per_second = refill_per_minute / 60.0
+        self.logger = logging.getLogger(__name__)
+
+        # Heap de (instante_de_reintento, secuencia, request)
+        self._queue: List[Tuple[float, int, Request]] = []
+        self._sequence = itertools.count()
+        self._timer = None
+
+        self.host_retries: Dict[str, int] = defaultdict(int)
+        # Por host: (reintentos disponibles, instante del último relleno)
+        self._host_budget: Dict[str, Tuple[float, float]] = {}
+        self.stats = {
+            'scheduled': 0,
+            'reinjected': 0,
+            'budget_exhausted': 0,
+            'backoff_seconds': 0.0,
+            'max_queue_depth': 0,
+        }
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """Crear instancia desde crawler"""
+        scheduler = cls(
+            crawler,
+            per_host_budget=crawler.settings.getint('RETRY_BUDGET_PER_HOST', 100),
+            refill_per_minute=crawler.settings.getfloat('RETRY_BUDGET_REFILL_PER_MINUTE', 10.0),
+        )
+        crawler.signals.connect(scheduler.spider_idle, signal=signals.spider_idle)
+        crawler.signals.connect(scheduler.spider_closed, signal=signals.spider_closed)
+        return scheduler
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def schedule(self, request: Request, delay: float) -> bool:
+        """
+        Aparcar un request para reinyectarlo dentro de `delay` segundos
+
+        Returns:
+            bool: False si el host ya agotó su presupuesto de reintentos
+        """
+        from twisted.internet import reactor
+
+        host = urlparse_cached(request).hostname or ''
+        now = reactor.seconds()
+        available = self._available(host, now)
+        if available < 1:
+            self.stats['budget_exhausted'] += 1
+            self._inc_stat('budget_exhausted')
+            self.logger.warning(
+                f"Presupuesto de reintentos agotado para {host} ({self.per_host_budget}, "
+                f"+{self.refill_per_second * 60:g}/min)"
+            )
+            return False
+
+        self._host_budget[host] = (available - 1, now)
+        self.host_retries[host] += 1
+        heapq.heappush(self._queue, (now + delay, next(self._sequence), request))
+
+        self.stats['scheduled'] += 1
+        self.stats['backoff_seconds'] += delay
+        self.stats['max_queue_depth'] = max(self.stats['max_queue_depth'], len(self._queue))
+        self._inc_stat('scheduled')
+        self._inc_stat('backoff_seconds', delay)
+        self._update_queue_stats()
+
+        self._arm_timer()
+        return True
+
+    def _available(self, host: str, now: float) -> float:
+        """Reintentos disponibles para `host`, con el relleno desde la última consulta"""
+        tokens, refilled_at = self._host_budget.get(host, (self.per_host_budget, now))
+        tokens = min(self.per_host_budget, tokens + (now - refilled_at) * self.refill_per_second)
+        self._host_budget[host] = (tokens, now)
+        return tokens
+
+    def _arm_timer(self):
+        """Programar el temporizador para el próximo reintento de la cola"""
+        from twisted.internet import reactor
+
+        if self._timer is not None and self._timer.active():
+            self._timer.cancel()
+        self._timer = None
+
+        if self._queue:
+            delay = max(0.0, self._queue[0][0] - reactor.seconds())
+            self._timer = reactor.callLater(delay, self._release_due)
+
+    def _release_due(self):
+        """Reinyectar en el engine todos los requests cuyo backoff ha expirado"""
+        from twisted.internet import reactor
+
+        self._timer = None
+        now = reactor.seconds()
+
+        while self._queue and self._queue[0][0] <= now:
+            _, _, request = heapq.heappop(self._queue)
+            self.crawler.engine.crawl(request)
+            self.stats['reinjected'] += 1
+            self._inc_stat('reinjected')
+
+        self._update_queue_stats()
+        self._arm_timer()
+
+    def _inc_stat(self, key: str, count=1):
+        if self.crawler.stats:
+            self.crawler.stats.inc_value(f'retry_scheduler/{key}', count)
+
+    def _update_queue_stats(self):
+        if self.crawler.stats:
+            self.crawler.stats.set_value('retry_scheduler/queue_depth', len(self._queue))
+            self.crawler.stats.max_value('retry_scheduler/max_queue_depth', len(self._queue))
+
+    def spider_idle(self, spider):
+        """Evitar que el spider se cierre mientras queden reintentos aparcados"""
+        if self._queue:
+            raise DontCloseSpider
+
+    def spider_closed(self, spider):
+        """Cancelar el temporizador y registrar estadísticas finales"""
+        if self._timer is not None and self._timer.active():
+            self._timer.cancel()
+        self._timer = None
+
+        if self._queue:
+            self.logger.warning(f"{len(self._queue)} reintentos pendientes descartados al cerrar el spider")
+
+        self.logger.info(
+            f"Reintentos diferidos: {self.stats['scheduled']} programados, "
+            f"{self.stats['reinjected']} reinyectados, "
+            f"{self.stats['backoff_seconds']:.1f}s de backoff acumulado"
+        )
+
+    def get_stats(self) -> Dict:
+        """Obtener estadísticas del planificador"""
+        return {
+            **self.stats,
+            'queue_depth': len(self._queue),
+            'host_retries': dict(self.host_retries),
+        }
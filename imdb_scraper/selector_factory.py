@@ -4,7 +4,21 @@ Permite manejar diferentes versiones de la página de IMDb de manera modular
 """
 
 from abc import ABC, abstractmethod
+import codecs
+import html
+import json
 import re
+from collections import Counter
+
+from lxml import etree
+from lxml import html as lxml_html
+from parsel.csstranslator import HTMLTranslator
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
 
 
 class SelectorStrategy(ABC):
@@ -33,34 +47,238 @@ class SelectorStrategy(ABC):
     @abstractmethod
     def extract_actors(self, response):
         pass
+    
+    def chain_stats(self):
+        """Contadores de los selectores CSS evaluados (ver CompiledSelectorStrategy)"""
+        return Counter()
+
+
+# Traductor CSS -> XPath de parsel (el mismo que usa response.css)
+_css_translator = HTMLTranslator()
+
+
+def compile_css(query: str):
+    """Traducir un selector CSS (admite ::text y ::attr) a un XPath compilado de lxml"""
+    return etree.XPath(_css_translator.css_to_xpath(query), smart_strings=False)
+
+
+class FallbackChain:
+    """
+    Selectores alternativos de un campo, en orden de preferencia
+
+    Se prueban en el orden actual hasta el primero que acierta. El orden
+    parte del declarado (el selector preciso antes que el genérico) y cada
+    `reorder_every` evaluaciones se revisa con los aciertos/intentos de esa
+    ventana, con dos salvaguardas para no cambiar valores por ruido:
+
+    - Solo se comparan selectores con al menos `min_samples` intentos en la
+      ventana (los de detrás solo se intentan cuando fallan los de delante)
+    - Histéresis: un selector adelanta a uno declarado antes solo si su tasa
+      la supera en más de `margin`, y vuelve detrás en cuanto la diferencia
+      baja a `margin / 2`. A igualdad manda el orden declarado
+
+    Mientras el orden no es el declarado, una de cada `probe_every`
+    evaluaciones usa el declarado: así los selectores relegados siguen
+    acumulando intentos aunque el que los adelantó acierte siempre, y si IMDb
+    revierte el cambio de maquetación recuperan su puesto. Las cadenas se
+    comparten en el proceso (como layout_detector): el orden se amortiza a lo
+    largo del crawl, mientras que los aciertos para las estadísticas los
+    cuenta quien la evalúa.
+    """
+    
+    def __init__(self, queries, reorder_every: int = 200, min_samples: int = 20,
+                 margin: float = 0.5, probe_every: int = 8):
+        self.queries = tuple(queries)
+        self.xpaths = tuple(compile_css(query) for query in self.queries)
+        self.reorder_every = reorder_every
+        self.min_samples = min_samples
+        self.margin = margin
+        self.probe_every = max(1, probe_every)
+        self.declared = tuple(range(len(self.queries)))
+        self.order = self.declared
+        self.reorders = 0
+        self._hits = [0] * len(self.queries)
+        self._attempts = [0] * len(self.queries)
+        self._evaluations = 0
+    
+    def evaluate(self, root, accept, counts=None):
+        """
+        Valor del primer selector cuyo resultado `accept` no convierte en None
+        
+        Args:
+            counts: Counter donde sumar ('hits'|'attempts', índice del selector)
+        """
+        self._evaluations += 1
+        if self.reorder_every and self._evaluations % self.reorder_every == 0:
+            self.reorder()
+        
+        order = self.order
+        if order is not self.declared and self._evaluations % self.probe_every == 0:
+            order = self.declared
+        
+        for index in order:
+            value = accept(self.xpaths[index](root))
+            self._attempts[index] += 1
+            if counts is not None:
+                counts['attempts', index] += 1
+            if value is not None:
+                self._hits[index] += 1
+                if counts is not None:
+                    counts['hits', index] += 1
+                return value
+        return None
+    
+    def reorder(self):
+        """Revisar el orden con la ventana actual y empezar una nueva"""
+        rates = [
+            hits / attempts if attempts >= self.min_samples else None
+            for hits, attempts in zip(self._hits, self._attempts)
+        ]
+        order = list(self.order)
+        # Cada par solo puede cambiar en un sentido con las mismas tasas: termina
+        swapped = True
+        while swapped:
+            swapped = False
+            for position in range(len(order) - 1):
+                if self._goes_ahead(order[position + 1], order[position], rates):
+                    order[position], order[position + 1] = order[position + 1], order[position]
+                    swapped = True
+        
+        order = self.declared if tuple(order) == self.declared else tuple(order)
+        if order != self.order:
+            self.order = order
+            self.reorders += 1
+        self._hits = [0] * len(self.queries)
+        self._attempts = [0] * len(self.queries)
+    
+    def _goes_ahead(self, behind: int, ahead: int, rates) -> bool:
+        """Si el selector `behind` debe pasar delante del que ahora le precede"""
+        behind_rate, ahead_rate = rates[behind], rates[ahead]
+        if behind_rate is None:
+            return False
+        if behind < ahead:
+            # Declarado antes: recupera su puesto con la mitad del margen
+            return ahead_rate is None or behind_rate >= ahead_rate - self.margin / 2
+        return ahead_rate is not None and behind_rate > ahead_rate + self.margin
+
+
+def _first_result(results):
+    return results[0] if results and results[0] else None
 
 
-class ModernIMDbSelector(SelectorStrategy):
+def _all_results(results):
+    return results or None
+
+
+class CompiledSelectorStrategy(SelectorStrategy):
+    """
+    Estrategia CSS con los selectores declarados en `SELECTORS`
+
+    Cada subclase declara, por campo, sus selectores CSS en orden de
+    preferencia. Se traducen y compilan una sola vez al definir la clase,
+    en una FallbackChain por campo compartida por todas las instancias, y
+    se evalúan directamente sobre la raíz lxml de la respuesta, sin pasar
+    por cssselect ni crear objetos Selector en cada página. Los aciertos de
+    cada selector se cuentan por instancia (ver chain_stats).
+    """
+    
+    SELECTORS = {}
+    # Cada cuántas evaluaciones se revisa el orden de cada cadena (0: orden declarado)
+    CHAIN_REORDER_EVERY = 200
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._chains = {
+            field: FallbackChain(queries, reorder_every=cls.CHAIN_REORDER_EVERY)
+            for field, queries in cls.SELECTORS.items()
+        }
+    
+    def __init__(self):
+        self._counts = {field: Counter() for field in self._chains}
+    
+    def chain_stats(self):
+        """
+        Contadores de los selectores evaluados por esta instancia
+
+        Returns:
+            Counter: {'hits|attempts/Clase/campo/selector': n}
+        """
+        stats = Counter()
+        name = type(self).__name__
+        for field, counts in self._counts.items():
+            queries = self._chains[field].queries
+            for (outcome, index), count in counts.items():
+                stats[f"{outcome}/{name}/{field}/{queries[index]}"] += count
+        return stats
+    
+    def _evaluate(self, response, field, accept):
+        return self._chains[field].evaluate(response.selector.root, accept, self._counts[field])
+    
+    def _first(self, response, field):
+        """Primer resultado no vacío (equivale a `css(a).get() or css(b).get() ...`)"""
+        return self._evaluate(response, field, _first_result)
+    
+    def _all(self, response, field):
+        """Resultados del primer selector que devuelva alguno"""
+        return self._evaluate(response, field, _all_results) or []
+    
+    def _re_first(self, response, field, pattern):
+        """Primer grupo de `pattern` en los resultados (equivale a `re_first` en cadena)"""
+        def first_match(results):
+            for text in results:
+                match = pattern.search(text)
+                if match:
+                    return match.group(1)
+            return None
+        return self._evaluate(response, field, first_match)
+
+
+YEAR_RE = re.compile(r'(\d{4})')
+
+
+class ModernIMDbSelector(CompiledSelectorStrategy):
     """Selector para la versión moderna de IMDb (2024+)"""
     
+    SELECTORS = {
+        'title': (
+            'h1[data-testid="hero__pageTitle"] span::text',
+            'h1.sc-b73cd867-0::text',
+            'h1::text',
+        ),
+        'year': (
+            'ul.ipc-inline-list a::text',
+            'span.sc-8c396aa2-2::text',
+        ),
+        'rating': (
+            'span[class*="rating"]::text',
+            'div[data-testid="hero-rating-bar__aggregate-rating"] span::text',
+            'span.ipc-rating-star--rating::text',
+        ),
+        'duration': (
+            'ul.ipc-inline-list li::text',
+        ),
+        'metascore': (
+            'span.score-meta::text',
+            'span[class*="metacritic-score"]::text',
+        ),
+        'actors': (
+            'a[data-testid="title-cast-item__actor"]::text',
+            'li[data-testid="title-cast-item"] a::text',
+            'ul.cast_list a[href*="/name/"]::text',
+        ),
+    }
+    
     def extract_title(self, response):
-        return (
-            response.css('h1[data-testid="hero__pageTitle"] span::text').get() or
-            response.css('h1.sc-b73cd867-0::text').get() or
-            response.css('h1::text').get() or
-            ''
-        ).strip()
+        return (self._first(response, 'title') or '').strip()
     
     def extract_year(self, response):
-        year_text = response.css('ul.ipc-inline-list a::text').re_first(r'(\d{4})')
-        if not year_text:
-            year_text = response.css('span.sc-8c396aa2-2::text').re_first(r'(\d{4})')
-        return year_text
+        return self._re_first(response, 'year', YEAR_RE)
     
     def extract_rating(self, response):
-        return (
-            response.css('span[class*="rating"]::text').get() or
-            response.css('div[data-testid="hero-rating-bar__aggregate-rating"] span::text').get() or
-            response.css('span.ipc-rating-star--rating::text').get()
-        )
+        return self._first(response, 'rating')
     
     def extract_duration(self, response):
-        duration_texts = response.css('ul.ipc-inline-list li::text').getall()
+        duration_texts = self._all(response, 'duration')
         for text in duration_texts:
             if 'h' in text and 'm' in text:
                 return text.strip()
@@ -69,49 +287,605 @@ class ModernIMDbSelector(SelectorStrategy):
         return None
     
     def extract_metascore(self, response):
-        return (
-            response.css('span.score-meta::text').get() or
-            response.css('span[class*="metacritic-score"]::text').get()
-        )
+        return self._first(response, 'metascore')
     
     def extract_actors(self, response):
-        actor_links = (
-            response.css('a[data-testid="title-cast-item__actor"]::text').getall() or
-            response.css('li[data-testid="title-cast-item"] a::text').getall() or
-            response.css('ul.cast_list a[href*="/name/"]::text').getall()
-        )
+        actor_links = self._all(response, 'actors')
         return [actor.strip() for actor in actor_links if actor.strip()][:3]
 
 
-class LegacyIMDbSelector(SelectorStrategy):
+class LegacyIMDbSelector(CompiledSelectorStrategy):
     """Selector para versión legacy de IMDb (fallback)"""
     
+    SELECTORS = {
+        'title': (
+            'h1.header::text',
+            '.title_wrapper h1::text',
+            'h1::text',
+        ),
+        'year': ('h1 .nobr::text',),
+        'rating': ('.ratingValue span::text',),
+        'duration': ('.subtext time::text',),
+        'metascore': ('.metacriticScore span::text',),
+        'actors': ('.cast_list .primary_photo+ td a::text',),
+    }
+    
     def extract_title(self, response):
-        return (
-            response.css('h1.header::text').get() or
-            response.css('.title_wrapper h1::text').get() or
-            response.css('h1::text').get() or
-            ''
-        ).strip()
+        return (self._first(response, 'title') or '').strip()
     
     def extract_year(self, response):
-        return response.css('h1 .nobr::text').re_first(r'(\d{4})')
+        return self._re_first(response, 'year', YEAR_RE)
     
     def extract_rating(self, response):
-        return response.css('.ratingValue span::text').get()
+        return self._first(response, 'rating')
     
     def extract_duration(self, response):
-        duration = response.css('.subtext time::text').get()
-        return duration.strip() if duration else None
+        # Como .get(): el primer nodo, aunque sea solo espacios
+        durations = self._all(response, 'duration')
+        return durations[0].strip() if durations else None
     
     def extract_metascore(self, response):
-        return response.css('.metacriticScore span::text').get()
+        return self._first(response, 'metascore')
     
     def extract_actors(self, response):
-        actors = response.css('.cast_list .primary_photo+ td a::text').getall()
+        actors = self._all(response, 'actors')
         return [actor.strip() for actor in actors if actor.strip()][:3]
 
 
+# Tipos schema.org de las fichas de título
+JSON_LD_TITLE_TYPES = {'Movie', 'TVSeries', 'TVEpisode', 'TVMovie', 'VideoGame', 'CreativeWork'}
+
+# Clases del recuadro de Metacritic (las mismas que usan los selectores CSS)
+METASCORE_CLASSES = (b'metacritic-score', b'score-meta')
+METASCORE_VALUE_RE = re.compile(rb'[^>]{0,200}>\s*(\d{1,3})\s*<')
+
+ISO_DURATION_RE = re.compile(r'^P(?:(\d+)D)?T?(?:(\d+)H)?(?:(\d+)M)?(?:\d+S)?$')
+
+
+def find_json_ld(body: bytes, types=JSON_LD_TITLE_TYPES):
+    """
+    Localizar y parsear el bloque JSON-LD de la ficha sin construir el DOM
+
+    Returns:
+        dict: objeto schema.org del título (o del primer tipo de `types`),
+        o None si no hay uno válido
+    """
+    start = body.find(b'application/ld+json')
+    while start != -1:
+        content_start = body.find(b'>', start) + 1
+        content_end = body.find(b'</script>', content_start)
+        if content_start == 0 or content_end == -1:
+            return None
+
+        try:
+            data = _json_loads(body[content_start:content_end])
+        except ValueError:
+            data = None
+
+        for candidate in (data if isinstance(data, list) else [data]):
+            if isinstance(candidate, dict) and candidate.get('@type') in types:
+                return candidate
+
+        start = body.find(b'application/ld+json', content_end)
+    return None
+
+
+def find_metascore(body: bytes):
+    """Leer el metascore del recuadro de Metacritic directamente de los bytes"""
+    for marker in METASCORE_CLASSES:
+        position = body.find(marker)
+        while position != -1:
+            match = METASCORE_VALUE_RE.match(body, position + len(marker))
+            if match:
+                return match.group(1).decode()
+            position = body.find(marker, position + len(marker))
+    return None
+
+
+def format_iso_duration(value):
+    """Convertir una duración ISO-8601 (PT2H22M) al formato de la ficha (2h 22m)"""
+    match = ISO_DURATION_RE.match(value or '')
+    if not match:
+        return None
+
+    days, hours, minutes = (int(group or 0) for group in match.groups())
+    # PT142M y PT2H22M deben dar lo mismo
+    return format_minutes(days * 24 * 60 + hours * 60 + minutes)
+
+
+def format_minutes(total_minutes):
+    """Formatear una duración en minutos como en la ficha (2h 22m)"""
+    hours, minutes = divmod(int(total_minutes), 60)
+    parts = []
+    if hours:
+        parts.append(f"{hours}h")
+    if minutes:
+        parts.append(f"{minutes}m")
+    return ' '.join(parts) or None
+
+
+def dig(data, *path):
+    """Recorrer claves/índices anidados; None si algún nivel falta o no encaja"""
+    for key in path:
+        try:
+            data = data[key]
+        except (KeyError, IndexError, TypeError):
+            return None
+    return data
+
+
+class NextDataPayload:
+    """
+    Blob __NEXT_DATA__ de la ficha, decodificado por secciones bajo demanda
+
+    El script completo ronda el megabyte (reseñas, trivia, recomendaciones...)
+    y parsearlo entero cuesta más que leer los campos del item. Aquí solo se
+    localiza su inicio en los bytes; cada sección se decodifica la primera
+    vez que se pide, desde su clave y hasta donde termina su valor.
+
+    Dentro del JSON las comillas de los textos van escapadas, así que
+    `"clave":` en los bytes siempre es una clave real.
+    """
+
+    MARKER = b'id="__NEXT_DATA__"'
+    # Ventana inicial de bytes que se decodifica para una sección; crece si no basta
+    INITIAL_WINDOW = 16 * 1024
+
+    _decoder = json.JSONDecoder()
+
+    def __init__(self, body: bytes, start: int):
+        self.body = body
+        self.start = start
+        self._end = None
+        self._sections = {}
+
+    @classmethod
+    def from_body(cls, body: bytes):
+        """Localizar el inicio del script en los bytes; None si la página no lo incluye"""
+        position = body.find(cls.MARKER)
+        if position == -1:
+            return None
+
+        start = body.find(b'>', position) + 1
+        if start == 0:
+            return None
+        return cls(body, start)
+
+    @property
+    def end(self):
+        """Fin del script (buscar el cierre recorre el blob entero: solo bajo demanda)"""
+        if self._end is None:
+            end = self.body.find(b'</script>', self.start)
+            self._end = end if end != -1 else len(self.body)
+        return self._end
+
+    def load(self):
+        """Decodificar el blob completo (para campos que el item no usa)"""
+        try:
+            return _json_loads(self.body[self.start:self.end])
+        except ValueError:
+            return None
+
+    def section(self, *keys):
+        """
+        Valor de la primera clave `keys[-1]` tras las anteriores, p. ej.
+        section('mainColumnData', 'cast'), o None si no existe o no es JSON válido
+        """
+        if keys not in self._sections:
+            self._sections[keys] = self._decode_section(keys)
+        return self._sections[keys]
+
+    def _decode_section(self, keys):
+        # No se acota al cierre del script: las claves buscadas solo aparecen
+        # en el blob y raw_decode se detiene donde termina el valor
+        limit = len(self.body)
+        position = self.start
+        for key in keys:
+            needle = b'"' + key.encode() + b'":'
+            position = self.body.find(needle, position)
+            if position == -1:
+                return None
+            position += len(needle)
+
+        window = self.INITIAL_WINDOW
+        while True:
+            stop = min(position + window, limit)
+            # 'ignore' solo descarta un carácter multibyte cortado al final de la ventana
+            text = self.body[position:stop].decode('utf-8', 'ignore')
+            try:
+                return self._decoder.raw_decode(text.lstrip())[0]
+            except ValueError:
+                if stop == limit:
+                    return None
+                window *= 4
+
+
+class NextDataSelector(SelectorStrategy):
+    """
+    Selector sobre el blob __NEXT_DATA__ de las fichas modernas
+
+    Los campos del item salen de `aboveTheFoldData` (unos cientos de bytes) y
+    el reparto de `mainColumnData.cast`; el resto del blob no se decodifica.
+    Lo que falte se pide al selector JSON-LD/CSS de la página.
+    """
+    
+    def __init__(self, payload: NextDataPayload):
+        self.payload = payload
+        self._fallback = None
+    
+    @property
+    def above_the_fold(self):
+        return self.payload.section('aboveTheFoldData') or {}
+    
+    def _structured(self, response):
+        if self._fallback is None:
+            self._fallback = SelectorFactory.create_json_ld_selector(response)
+        return self._fallback
+    
+    def chain_stats(self):
+        return self._fallback.chain_stats() if self._fallback is not None else Counter()
+    
+    def extract_title(self, response):
+        title = dig(self.above_the_fold, 'titleText', 'text')
+        if title:
+            return title.strip()
+        return self._structured(response).extract_title(response)
+    
+    def extract_year(self, response):
+        year = dig(self.above_the_fold, 'releaseYear', 'year')
+        if year:
+            return str(year)
+        return self._structured(response).extract_year(response)
+    
+    def extract_rating(self, response):
+        rating = dig(self.above_the_fold, 'ratingsSummary', 'aggregateRating')
+        if rating is not None:
+            return str(rating)
+        return self._structured(response).extract_rating(response)
+    
+    def extract_duration(self, response):
+        seconds = dig(self.above_the_fold, 'runtime', 'seconds')
+        duration = format_minutes(seconds // 60) if isinstance(seconds, int) else None
+        if duration:
+            return duration
+        return self._structured(response).extract_duration(response)
+    
+    def extract_metascore(self, response):
+        score = dig(self.above_the_fold, 'metacritic', 'metascore', 'score')
+        if score is not None:
+            return str(score)
+        return self._structured(response).extract_metascore(response)
+    
+    def extract_actors(self, response):
+        edges = dig(self.payload.section('mainColumnData', 'cast'), 'edges') or []
+        names = []
+        for edge in edges:
+            name = dig(edge, 'node', 'name', 'nameText', 'text')
+            if name and name.strip():
+                names.append(name.strip())
+                if len(names) == 3:
+                    return names
+        if names:
+            return names
+        return self._structured(response).extract_actors(response)
+
+
+class JsonLdSelector(SelectorStrategy):
+    """
+    Selector sobre el bloque JSON-LD (schema.org) de la ficha
+
+    Todos los campos salen del mismo objeto ya parseado; solo los que faltan
+    en el JSON-LD se piden al selector CSS de la página, que se crea la
+    primera vez que hace falta.
+    """
+    
+    def __init__(self, data):
+        self.data = data
+        self._fallback = None
+    
+    def _css(self, response):
+        if self._fallback is None:
+            self._fallback = SelectorFactory.create_css_selector(response)
+        return self._fallback
+    
+    def chain_stats(self):
+        return self._fallback.chain_stats() if self._fallback is not None else Counter()
+    
+    def extract_title(self, response):
+        name = self.data.get('name')
+        if name:
+            return html.unescape(name).strip()
+        return self._css(response).extract_title(response)
+    
+    def extract_year(self, response):
+        published = self.data.get('datePublished') or ''
+        if published[:4].isdigit():
+            return published[:4]
+        return self._css(response).extract_year(response)
+    
+    def extract_rating(self, response):
+        rating = (self.data.get('aggregateRating') or {}).get('ratingValue')
+        if rating is not None:
+            return str(rating)
+        return self._css(response).extract_rating(response)
+    
+    def extract_duration(self, response):
+        duration = format_iso_duration(self.data.get('duration'))
+        if duration:
+            return duration
+        return self._css(response).extract_duration(response)
+    
+    def extract_metascore(self, response):
+        # schema.org no incluye el metascore de Metacritic: se lee el recuadro
+        # de la ficha sobre los bytes y solo si no aparece se recurre al DOM
+        return find_metascore(response.body) or self._css(response).extract_metascore(response)
+    
+    def extract_actors(self, response):
+        actors = self.data.get('actor') or []
+        if isinstance(actors, dict):
+            actors = [actors]
+        names = [html.unescape(actor.get('name', '')).strip() for actor in actors if isinstance(actor, dict)]
+        names = [name for name in names if name][:3]
+        if names:
+            return names
+        return self._css(response).extract_actors(response)
+
+
+TITLE_ID_RE = re.compile(r'/title/(tt\d+)')
+
+
+def find_chart_entries(body: bytes):
+    """
+    Entradas del ranking de /chart/top/ leídas de los bytes, sin el DOM
+
+    La lista completa viaja en `chartTitles` dentro de __NEXT_DATA__
+    (posición, título, año, rating, duración); sin el blob se usa el
+    ItemList JSON-LD, que no trae el año. El reparto no está en el ranking.
+
+    Returns:
+        list: dicts con imdb_id, ranking y los campos del item sin validar
+        (None si el ranking no los trae), en el orden del ranking
+    """
+    payload = NextDataPayload.from_body(body)
+    edges = dig(payload.section('chartTitles'), 'edges') if payload is not None else None
+    if edges:
+        entries = []
+        for position, edge in enumerate(edges, 1):
+            node = dig(edge, 'node') or {}
+            seconds = dig(node, 'runtime', 'seconds')
+            rating = dig(node, 'ratingsSummary', 'aggregateRating')
+            year = dig(node, 'releaseYear', 'year')
+            score = dig(node, 'metacritic', 'metascore', 'score')
+            entries.append({
+                'imdb_id': node.get('id'),
+                'ranking': dig(edge, 'currentRank') or position,
+                'titulo': dig(node, 'titleText', 'text'),
+                'anio': str(year) if year else None,
+                'calificacion': str(rating) if rating is not None else None,
+                'duracion': format_minutes(seconds // 60) if isinstance(seconds, int) else None,
+                'metascore': str(score) if score is not None else None,
+                'actores': [],
+            })
+        return entries
+
+    item_list = find_json_ld(body, types={'ItemList'})
+    entries = []
+    for position, element in enumerate((item_list or {}).get('itemListElement') or [], 1):
+        item = dig(element, 'item') or {}
+        match = TITLE_ID_RE.search(item.get('url') or '')
+        rating = dig(item, 'aggregateRating', 'ratingValue')
+        entries.append({
+            'imdb_id': match.group(1) if match else None,
+            'ranking': dig(element, 'position') or position,
+            'titulo': html.unescape(item.get('name') or ''),
+            'anio': None,
+            'calificacion': str(rating) if rating is not None else None,
+            'duracion': format_iso_duration(item.get('duration')),
+            'metascore': None,
+            'actores': [],
+        })
+    return entries
+
+
+# Bloques del reparto en el HTML (inicio, cierre): es lo último que se extrae
+CAST_SECTION_MARKERS = (
+    (b'data-testid="title-cast"', b'</section>'),
+    (b'class="cast_list"', b'</table>'),
+)
+
+
+def has_required_data(body: bytes) -> bool:
+    """
+    Indicar si un prefijo de la ficha ya contiene todo lo que extrae DataExtractor
+
+    Con __NEXT_DATA__ basta con que se puedan decodificar enteras las
+    secciones que lee NextDataSelector; sin él, el HTML tiene que incluir el
+    bloque del reparto completo (va después del hero y del <head>).
+    """
+    return RequiredDataScanner().scan(body)
+
+
+class RequiredDataScanner:
+    """
+    has_required_data incremental para un cuerpo que crece (descarga en streaming)
+
+    Cada secuencia de marcadores recuerda cuál le toca y desde dónde
+    buscarlo; en la siguiente comprobación solo se busca en lo recién llegado
+    (más un solape del largo del marcador, por si quedó partido entre dos
+    chunks). Las secciones de __NEXT_DATA__ se decodifican desde su clave ya
+    localizada y, una vez completas, no se vuelven a mirar. Así cada
+    comprobación cuesta lo que ha llegado desde la anterior, no el cuerpo
+    entero. Acepta bytes o bytearray (sin copiarlo).
+    """
+    
+    NEXT_DATA_START = (NextDataPayload.MARKER, b'>')
+    # Secciones que lee NextDataSelector
+    SECTIONS = (('aboveTheFoldData',), ('mainColumnData', 'cast'))
+    
+    def __init__(self):
+        self._progress = {}
+        self._complete = set()
+    
+    def scan(self, body) -> bool:
+        if self._locate(body, self.NEXT_DATA_START) is not None:
+            return all(self._section_complete(body, keys) for keys in self.SECTIONS)
+        return any(self._locate(body, markers) is not None for markers in CAST_SECTION_MARKERS)
+    
+    def _locate(self, body, needles):
+        """Posición tras el último de `needles` (en orden), o None si aún no ha llegado"""
+        index, position = self._progress.get(needles, (0, 0))
+        while index < len(needles):
+            needle = needles[index]
+            found = body.find(needle, position)
+            if found == -1:
+                self._progress[needles] = (index, max(position, len(body) - len(needle) + 1))
+                return None
+            position = found + len(needle)
+            index += 1
+        self._progress[needles] = (index, position)
+        return position
+    
+    def _section_complete(self, body, keys) -> bool:
+        if keys in self._complete:
+            return True
+        
+        needles = self.NEXT_DATA_START + tuple(b'"' + key.encode() + b'":' for key in keys)
+        position = self._locate(body, needles)
+        if position is None:
+            return False
+        
+        window = NextDataPayload.INITIAL_WINDOW
+        while True:
+            stop = min(position + window, len(body))
+            text = body[position:stop].decode('utf-8', 'ignore')
+            try:
+                NextDataPayload._decoder.raw_decode(text.lstrip())
+            except ValueError:
+                if stop == len(body):
+                    return False
+                window *= 4
+            else:
+                self._complete.add(keys)
+                return True
+
+
+# Sondeos del DOM para distinguir la maquetación moderna de la legacy
+MODERN_LAYOUT_PROBE = compile_css('h1[data-testid="hero__pageTitle"]')
+LEGACY_LAYOUT_PROBE = compile_css('.ratingValue')
+
+
+def _next_data_selector(response):
+    payload = NextDataPayload.from_body(response.body)
+    return NextDataSelector(payload) if payload is not None else None
+
+
+def _json_ld_selector(response):
+    data = find_json_ld(response.body)
+    return JsonLdSelector(data) if data else None
+
+
+# Constructores por maquetación; devuelven None si la página no encaja
+LAYOUT_BUILDERS = {
+    'next_data': _next_data_selector,
+    'json_ld': _json_ld_selector,
+    'modern': lambda response: ModernIMDbSelector(),
+    'legacy': lambda response: LegacyIMDbSelector(),
+}
+
+
+class LayoutDetector:
+    """
+    Caché de estrategia por huella de maquetación
+
+    La huella es la etiqueta <html> y el primer marcador de MARKERS, ambos
+    buscados solo en los primeros `scan_bytes` bytes: la huella no recorre
+    la página, y el constructor de la maquetación ya busca sus datos en el
+    cuerpo. El blob __NEXT_DATA__ suele quedar fuera de ese prefijo, así que
+    una ficha con __NEXT_DATA__ y JSON-LD comparte huella con una que solo
+    trae JSON-LD; las dos se extraen bien con la maquetación que quede
+    asociada. La primera página de cada huella pasa por la detección
+    completa y la maquetación ganadora queda asociada a la huella; las
+    siguientes solo calculan la huella. Si la estrategia cacheada no encaja
+    con la página (el constructor devuelve None, o los campos obligatorios
+    salen vacíos, ver redetect) se vuelve a detectar y se actualiza la caché.
+    """
+    
+    # Uno por maquetación, en el orden de probe_layout
+    MARKERS = (
+        b'id="__NEXT_DATA__"',
+        b'application/ld+json',
+        b'data-testid="hero__pageTitle"',
+        b'class="ratingValue"',
+    )
+    HTML_TAG_RE = re.compile(rb'<html[^>]{0,256}>', re.IGNORECASE)
+    
+    def __init__(self, builders, probe, scan_bytes: int = 4096):
+        self.builders = builders
+        self.probe = probe
+        self.scan_bytes = scan_bytes
+        self.fingerprints = {}
+        self.layouts = Counter()
+        self.probes = 0
+        self.invalidations = 0
+    
+    def fingerprint(self, body: bytes):
+        """Huella barata de la maquetación (hashable)"""
+        tag = self.HTML_TAG_RE.search(body, 0, self.scan_bytes)
+        # find con límite: acota la búsqueda sin copiar el prefijo
+        marker = next((marker for marker in self.MARKERS if body.find(marker, 0, self.scan_bytes) != -1), None)
+        return (tag.group(0) if tag else b'', marker)
+    
+    def select(self, response):
+        """
+        Returns:
+            tuple: (maquetación, SelectorStrategy)
+        """
+        key = self.fingerprint(response.body)
+        layout = self.fingerprints.get(key)
+        selector = self.builders[layout](response) if layout else None
+        if selector is None:
+            self.probes += 1
+            layout, selector = self.probe(response)
+            self.fingerprints[key] = layout
+        
+        self.layouts[layout] += 1
+        return layout, selector
+    
+    def learn(self, body: bytes, layout: str):
+        """
+        Asociar a la huella de `body` una maquetación resuelta fuera de este
+        proceso (pool de extracción) o guardada en la caché de extracciones
+        """
+        self.fingerprints[self.fingerprint(body)] = layout
+        self.layouts[layout] += 1
+    
+    def redetect(self, response, layout):
+        """
+        La estrategia de `layout` dejó vacíos los campos obligatorios
+
+        Si esa maquetación venía de la caché se descarta para la huella y se
+        hace la detección completa. Devuelve la nueva (maquetación,
+        SelectorStrategy), o None si la detección da la misma maquetación
+        (la página no trae los datos, no es un error de la caché).
+        """
+        key = self.fingerprint(response.body)
+        if self.fingerprints.get(key) != layout:
+            return None
+        
+        self.probes += 1
+        new_layout, selector = self.probe(response)
+        self.fingerprints[key] = new_layout
+        if new_layout == layout:
+            return None
+        
+        self.invalidations += 1
+        self.layouts[layout] -= 1
+        if self.layouts[layout] <= 0:
+            del self.layouts[layout]
+        self.layouts[new_layout] += 1
+        return new_layout, selector
+
+
 class SelectorFactory:
     """Factory para crear selectores apropiados según la página"""
     
@@ -126,11 +900,48 @@ class SelectorFactory:
         Returns:
             SelectorStrategy: Instancia del selector apropiado
         """
+        return SelectorFactory.detect_layout(response)[1]
+    
+    @staticmethod
+    def detect_layout(response):
+        """Maquetación y selector de la página, con la caché por huella"""
+        return layout_detector.select(response)
+    
+    @staticmethod
+    def redetect_layout(response, layout):
+        """Nueva maquetación si la cacheada dejó vacíos los campos obligatorios (o None)"""
+        return layout_detector.redetect(response, layout)
+    
+    @staticmethod
+    def probe_layout(response):
+        """
+        Detección completa de la maquetación
+        
+        Los datos estructurados se localizan sobre los bytes: si existen
+        no se construye el DOM
+        """
+        for layout in ('next_data', 'json_ld'):
+            selector = LAYOUT_BUILDERS[layout](response)
+            if selector is not None:
+                return layout, selector
+        
+        selector = SelectorFactory.create_css_selector(response)
+        return ('legacy' if isinstance(selector, LegacyIMDbSelector) else 'modern'), selector
+    
+    @staticmethod
+    def create_json_ld_selector(response):
+        """Selector JSON-LD si la página lo incluye; si no, el selector CSS"""
+        return _json_ld_selector(response) or SelectorFactory.create_css_selector(response)
+    
+    @staticmethod
+    def create_css_selector(response):
+        """Selector CSS (moderno o legacy) según la estructura de la página"""
         try:
             # Detectar si es la versión moderna checkeando elementos específicos
-            if response.css('h1[data-testid="hero__pageTitle"]'):
+            root = response.selector.root
+            if MODERN_LAYOUT_PROBE(root):
                 return ModernIMDbSelector()
-            elif response.css('.ratingValue'):
+            elif LEGACY_LAYOUT_PROBE(root):
                 return LegacyIMDbSelector()
             else:
                 # Default a moderno
@@ -140,15 +951,89 @@ class SelectorFactory:
             return ModernIMDbSelector()
 
 
-class DataExtractor:
-    """Extractor de datos que utiliza el patrón Factory"""
+# Compartido por todo el proceso: la caché se amortiza a lo largo del crawl
+layout_detector = LayoutDetector(LAYOUT_BUILDERS, SelectorFactory.probe_layout)
+
+
+class LxmlResponse:
+    """
+    Respuesta para el backend de extracción 'lxml'
+
+    Las estrategias solo usan `body` y `selector.root`. Aquí la raíz se
+    parsea una vez directamente de los bytes, sin decodificar el cuerpo a
+    str ni volver a codificarlo (lo que hace Selector de Scrapy) y sin crear
+    objetos Selector. El resto de atributos se delega en la respuesta.
+    """
+    
+    # Los parsers de lxml son reutilizables; uno por codificación
+    _parsers = {}
     
     def __init__(self, response):
         self.response = response
-        self.selector = SelectorFactory.create_selector(response)
+        self._root = None
+    
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+    
+    @property
+    def selector(self):
+        return self
+    
+    @property
+    def root(self):
+        if self._root is None:
+            self._root = self._parse()
+        return self._root
+    
+    def _parse(self):
+        encoding = self.response.encoding
+        if codecs.lookup(encoding).name != 'utf-8':
+            # Otras codificaciones: el camino de parsel, que decodifica el texto
+            return self.response.selector.root
+        
+        # Misma limpieza que parsel antes de parsear
+        body = self.response.body.replace(b'\x00', b'').strip() or b'<html/>'
+        parser = self._parsers.get(encoding)
+        if parser is None:
+            parser = lxml_html.HTMLParser(recover=True, encoding='utf-8', huge_tree=True)
+            self._parsers[encoding] = parser
+        try:
+            root = etree.fromstring(body, parser=parser, base_url=self.response.url)
+        except etree.XMLSyntaxError:
+            root = None
+        if root is None or len(parser.error_log.filter_from_level(etree.ErrorLevels.FATAL)):
+            return self.response.selector.root
+        return root
+
+
+class DataExtractor:
+    """Extractor de datos que utiliza el patrón Factory"""
+    
+    # 'parsel': DOM del Selector de Scrapy; 'lxml': DOM parseado de los bytes
+    BACKENDS = ('parsel', 'lxml')
+    # Campos que cualquier maquetación bien detectada tiene que devolver (el
+    # título solo no basta: 'h1::text' acierta en casi cualquier ficha)
+    REQUIRED_FIELDS = ('titulo', 'calificacion')
+    
+    def __init__(self, response, backend='parsel'):
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Backend de extracción desconocido: {backend}")
+        
+        self.response = LxmlResponse(response) if backend == 'lxml' else response
+        self.layout, self.selector = SelectorFactory.detect_layout(self.response)
     
     def extract_all_data(self):
         """Extrae todos los datos de la película usando el selector apropiado"""
+        data = self._extract()
+        if not all(data[field] for field in self.REQUIRED_FIELDS):
+            # Maquetación cacheada equivocada: se detecta de nuevo y se repite
+            redetected = SelectorFactory.redetect_layout(self.response, self.layout)
+            if redetected is not None:
+                self.layout, self.selector = redetected
+                data = self._extract()
+        return data
+    
+    def _extract(self):
         try:
             return {
                 'titulo': self.selector.extract_title(self.response),
@@ -22,18 +22,35 @@ ADDONS = {}
 ROBOTSTXT_OBEY = False
 
 # Concurrency and throttling settings
+# ProxyRotationMiddleware asigna un slot de descarga por proxy, así que el
+# límite por dominio y el delay se aplican a cada IP de salida. El total es
+# proxies sanos × CONCURRENT_REQUESTS_PER_DOMAIN, entre CONCURRENT_REQUESTS
+# (sin proxies: un request a la vez) y PROXY_TOTAL_CONCURRENCY_MAX; con
+# ADAPTIVE_CONCURRENCY_ENABLED lo ajusta AIMD hasta ADAPTIVE_TOTAL_CONCURRENCY_MAX
 CONCURRENT_REQUESTS = 1
-CONCURRENT_REQUESTS_PER_DOMAIN = 1
-DOWNLOAD_DELAY = 3  # Aumentado para evitar bloqueos con proxies
+PROXY_TOTAL_CONCURRENCY_MAX = 16
+CONCURRENT_REQUESTS_PER_DOMAIN = 1  # Por slot: un request a la vez por proxy
+# El espaciado entre requests de cada slot lo pone el jitter de
+# RandomDelayMiddleware: con DOWNLOAD_DELAY > 0 el slot espera además su propio
+# delay y el jitter apenas varía (manda el mayor de los dos)
+DOWNLOAD_DELAY = 0
 RANDOMIZE_DOWNLOAD_DELAY = 1.0  # Más variación para parecer más humano
 DOWNLOAD_TIMEOUT = 30  # Timeout específico para conexiones con proxy
 
+# Jitter de RandomDelayMiddleware (no bloqueante, aplicado por proxy/dominio).
+# El rango de un DOWNLOAD_DELAY de 3 s aleatorizado (×0.5-1.5) por proxy
+RANDOM_DELAY_MIN = 1.5
+RANDOM_DELAY_MAX = 4.5
+
 # Retry settings with exponential backoff
 RETRY_TIMES = 3
 RETRY_HTTP_CODES = [500, 502, 503, 504, 408, 429]
 RETRY_PRIORITY_ADJUST = -1
+RETRY_BUDGET_PER_HOST = 100  # Reintentos diferidos por host que se pueden gastar de golpe
+RETRY_BUDGET_REFILL_PER_MINUTE = 10  # Reintentos que recupera cada host por minuto (hasta el máximo)
 
 # AutoThrottle with exponential backoff
+# Desactívalo al activar ADAPTIVE_CONCURRENCY_ENABLED: los dos ajustan el delay de los slots
 AUTOTHROTTLE_ENABLED = True
 AUTOTHROTTLE_START_DELAY = 1
 AUTOTHROTTLE_MAX_DELAY = 30
@@ -43,6 +60,139 @@ AUTOTHROTTLE_DEBUG = False
 # Exponential backoff factor
 BACKOFF_FACTOR = 2.0
 
+# Detección de páginas de bloqueo (imdb_scraper.block_detector.BlockDetector)
+# Solo se inspeccionan los primeros BLOCK_PAGE_SCAN_BYTES del cuerpo. Un <title> de
+# ficha (BLOCK_PAGE_TRUSTED_TITLES) da la respuesta por buena aunque la película se
+# llame "Blocked"; si no, las firmas cuentan únicamente dentro de <title> y los
+# marcadores de desafío se buscan en el prefijo
+BLOCK_PAGE_STATUS_CODES = [403, 429, 503, 521, 522, 523, 524]
+BLOCK_PAGE_TITLE_SIGNATURES = [
+    'access denied',
+    'attention required',
+    'just a moment',
+    'too many requests',
+    'rate limit',
+    'robot check',
+    'are you a robot',
+    'captcha',
+    'blocked',
+    'please verify',
+]
+BLOCK_PAGE_MARKERS = [
+    '/cdn-cgi/challenge-platform/',
+    '_cf_chl_opt',
+    'cf-error-details',
+    'awswafcookiedomainlist',
+    'captcha-sdk.awswaf.com',
+    'captcha-delivery.com',
+    'px-captcha',
+    'distil_r_captcha',
+]
+BLOCK_PAGE_TRUSTED_TITLES = [' - IMDb']
+BLOCK_PAGE_SCAN_BYTES = 32768
+
+# Control adaptativo AIMD por slot (imdb_scraper.extensions.AdaptiveConcurrency)
+# Parte de DOWNLOAD_DELAY / CONCURRENT_REQUESTS_PER_DOMAIN y busca el mayor
+# ritmo sin bloqueos: acelera tras N éxitos y frena de golpe ante un bloqueo.
+# Opcional: sustituye a AutoThrottle (AUTOTHROTTLE_ENABLED = False)
+ADAPTIVE_CONCURRENCY_ENABLED = False
+ADAPTIVE_CONCURRENCY_MIN = 1
+ADAPTIVE_CONCURRENCY_MAX = 4  # Requests simultáneos máximos por slot (proxy)
+ADAPTIVE_TOTAL_CONCURRENCY_MAX = 16  # Techo del límite global (parte de CONCURRENT_REQUESTS)
+ADAPTIVE_DELAY_MIN = 0.5
+ADAPTIVE_DELAY_MAX = 30
+ADAPTIVE_DELAY_STEP = 0.25  # Reducción del delay por cada racha de éxitos
+ADAPTIVE_INCREASE_EVERY = 10  # Éxitos seguidos necesarios para acelerar
+ADAPTIVE_DECREASE_FACTOR = 0.5  # Concurrencia x0.5 y delay x2 ante un bloqueo
+ADAPTIVE_BLOCK_COOLDOWN = 5  # Segundos en los que no se vuelve a penalizar al slot
+
+# Corte anticipado de las descargas de fichas (imdb_scraper.extensions.EarlyAbortDownload)
+# Los requests con meta['early_abort'] se detienen en cuanto el cuerpo recibido
+# contiene todos los campos del item: menos GB por proxy y menos tiempo por item.
+# Opcional: la respuesta que llega al spider está truncada
+EARLY_ABORT_ENABLED = False
+EARLY_ABORT_CHECK_BYTES = 16384  # Cada cuántos bytes descomprimidos se comprueba
+EARLY_ABORT_MAX_SCAN_BYTES = 4194304  # Más allá no se inspecciona (descarga completa)
+
+# Backend de extracción de DataExtractor cuando hace falta el DOM
+# 'parsel': Selector de Scrapy (decodifica el cuerpo a str)
+# 'lxml': DOM parseado directamente de los bytes (misma salida, menos CPU y memoria)
+EXTRACTION_BACKEND = 'parsel'
+
+# Procesos para parsear y extraer las fichas fuera del reactor (0: en el reactor)
+# Solo compensa en páginas que necesitan el DOM; con más procesos puede hacer
+# falta subir SCRAPER_SLOT_MAX_ACTIVE_SIZE (5MB) para tener más fichas en vuelo
+EXTRACTION_PROCESS_WORKERS = 0
+
+# Modo de TopMoviesSpider (o -a mode=...)
+# 'detail': una ficha por película (TOP_50_MOVIE_IDS)
+# 'chart': las 250 películas de /chart/top/ en un solo request; solo se piden
+# fichas para completar los campos de CHART_DETAIL_FIELDS que falten en el
+# ranking (p. ej. ['actores', 'metascore']). Vacío: refresco de ratings
+TOP_MOVIES_MODE = 'detail'
+CHART_DETAIL_FIELDS = []
+
+# Fuente de IDs del modo 'detail' (imdb_scraper.title_source); sin fichero se
+# usa TOP_50_MOVIE_IDS. Se lee en streaming: texto plano con un ID por línea,
+# .gz, o el volcado title.basics.tsv.gz de IMDb (filtros por tipo, año y
+# adultos). Los argumentos -a ids_file=... -a ids_shard=... tienen prioridad
+TITLE_IDS_FILE = None
+TITLE_IDS_TYPES = []  # p. ej. ['movie'] (solo title.basics.tsv)
+TITLE_IDS_MIN_YEAR = None
+TITLE_IDS_MAX_YEAR = None
+TITLE_IDS_INCLUDE_ADULT = False
+TITLE_IDS_SHARD = 0  # Este proceso lee los títulos con número % SHARDS == SHARD
+TITLE_IDS_SHARDS = 1
+TITLE_IDS_LIMIT = None  # Máximo de títulos de este shard
+
+# Re-crawl condicional de las fichas (imdb_scraper.middlewares.ConditionalRequestMiddleware)
+# Se guardan por título ETag, Last-Modified y hash del contenido; las fichas con
+# 304 o con el mismo hash no se extraen ni se escriben en BD. Con esta opción
+# los pipelines no borran las filas del día al empezar: las fichas sin cambios
+# conservan las suyas. Opcional: guarda estado entre ejecuciones
+CONDITIONAL_REQUESTS_ENABLED = False
+CONDITIONAL_REQUESTS_PATH = 'data/cache/validadores.db'  # Relativa a la raíz del proyecto
+
+# Prioridad de refresco (imdb_scraper.middlewares.RefreshPriorityMiddleware)
+# Las fichas salen por días sin refrescar × peso del ranking × volatilidad del
+# rating, leídos de la base de DatabasePipeline (filas de peliculas por imdb_id
+# y, con re-crawl condicional, la fecha de los validadores); las nunca
+# refrescadas primero. Con REFRESH_REQUEST_BUDGET > 0 solo se piden N fichas,
+# las de más valor dentro de una ventana de REFRESH_LOOKAHEAD candidatas.
+# Opcional: cambia el orden de las fichas
+REFRESH_PRIORITY_ENABLED = False
+REFRESH_HISTORY_PATH = 'data/exports/peliculas.db'  # La de DatabasePipeline, relativa a la raíz del proyecto
+REFRESH_REQUEST_BUDGET = 0  # 0: sin límite (solo prioridad)
+REFRESH_LOOKAHEAD = 1000  # Candidatas leídas por delante con presupuesto (memoria y espera acotadas)
+REFRESH_VOLATILITY_ALPHA = 0.5  # Peso del último cambio de rating en la volatilidad
+REFRESH_VOLATILITY_PRIOR = 0.01  # Cambio diario supuesto de un título sin historial
+REFRESH_VOLATILITY_FLOOR = 0.001  # Cambio diario mínimo: todo título acaba refrescándose
+REFRESH_MAX_AGE_DAYS = 365
+
+# Plazo fijo para el crawl (imdb_scraper.crawl_deadline.CrawlDeadline; 0: sin plazo)
+# Con el ritmo medido (respuestas/s en la ventana, con delays y reintentos) se
+# recorta lo que ya no cabe: primero las fichas opcionales del modo 'chart',
+# luego los reintentos de menor prioridad y por último el trabajo nuevo (se
+# deja de leer la fuente de IDs). Las estadísticas deadline/* dicen qué se
+# descartó; al agotarse el plazo el spider se cierra con motivo 'deadline'
+CRAWL_DEADLINE_SECONDS = 0
+CRAWL_DEADLINE_RESERVE_SECONDS = 30  # Final del plazo sin trabajo nuevo (requests en vuelo, pipelines)
+CRAWL_DEADLINE_WINDOW_SECONDS = 60  # Ventana de la estimación del ritmo
+CRAWL_DEADLINE_MIN_SAMPLES = 5  # Respuestas necesarias antes de recortar por ritmo
+
+# Caché persistente de extracciones por hash del cuerpo (imdb_scraper.extraction_cache)
+# Una ficha sin cambios desde la última ejecución cuesta un hash y una consulta
+# SQLite; LRU acotada a EXTRACTION_CACHE_MAX_ENTRIES fichas. Subir la versión
+# invalida las entradas tras cambiar selectores o validaciones. Opcional:
+# guarda estado entre ejecuciones, y con las fichas actuales de IMDb
+# (__NEXT_DATA__) no se consulta: solo compensa en las maquetaciones HTML
+EXTRACTION_CACHE_ENABLED = False
+EXTRACTION_CACHE_PATH = 'data/cache/extracciones.db'  # Relativa a la raíz del proyecto
+EXTRACTION_CACHE_MAX_ENTRIES = 20000
+EXTRACTION_CACHE_VERSION = 1
+# Maquetaciones que no usan la caché: leer sus datos estructurados cuesta menos que el hash
+EXTRACTION_CACHE_SKIP_LAYOUTS = ['next_data', 'json_ld']
+
 # Disable cookies (enabled by default)
 #COOKIES_ENABLED = False
 
@@ -62,13 +212,26 @@ DEFAULT_REQUEST_HEADERS = {
 
 # Enable or disable spider middlewares
 # See https://docs.scrapy.org/en/latest/topics/spider-middleware.html
-#SPIDER_MIDDLEWARES = {
+SPIDER_MIDDLEWARES = {
 #    "imdb_scraper.middlewares.ImdbScraperSpiderMiddleware": 543,
-#}
+    # Prioridad de las fichas por valor de refresco (REFRESH_PRIORITY_*)
+    "imdb_scraper.middlewares.RefreshPriorityMiddleware": 560,
+}
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
 DOWNLOADER_MIDDLEWARES = {
+    # Plazo del crawl: descarta lo que ya no cabe antes de delays y proxies
+    "imdb_scraper.middlewares.CrawlDeadlineMiddleware": 330,
+    
+    # Re-crawl condicional (If-None-Match / If-Modified-Since + hash del contenido)
+    "imdb_scraper.middlewares.ConditionalRequestMiddleware": 340,
+    
+    # Reintentos con backoff: por debajo de los proxies para que
+    # ProxyRotationMiddleware vea antes cada respuesta y excepción (puntuación
+    # del proxy, bloqueos, fallos) y solo le lleguen las que no resuelve
+    "imdb_scraper.middlewares.NetworkResilienceMiddleware": 345,
+    
     # Middleware de proxies ORIGINAL integrado con proxy_manager.py
     "imdb_scraper.proxy_middleware.ProxyRotationMiddleware": 350,
     "imdb_scraper.proxy_middleware.TorRotationMiddleware": 351,
@@ -76,7 +239,6 @@ DOWNLOADER_MIDDLEWARES = {
     # Middlewares personalizados
     "imdb_scraper.middlewares.RandomUserAgentMiddleware": 400,
     "imdb_scraper.middlewares.RandomDelayMiddleware": 450,
-    "imdb_scraper.middlewares.NetworkResilienceMiddleware": 500,
     
     # Sistema de proxies consolidado usando proxy_middleware.py + proxy_manager.py
     
@@ -94,21 +256,41 @@ DOWNLOADER_MIDDLEWARES = {
 # Sistema de proxies rotativos avanzado
 PROXY_ROTATION_ENABLED = True  # HABILITADO para pruebas
 PROXY_CONFIG_FILE = 'config/proxies.json'
-PROXY_IP_VERIFICATION = True  # Verificar IP en cada rotación
+PROXY_IP_VERIFICATION = True  # Verificar IP de salida en segundo plano
+PROXY_IP_CACHE_TTL = 600  # Segundos de validez de la IP de salida en caché
+PROXY_IP_VERIFIER_WORKERS = 2  # Hilos del verificador de IP en segundo plano
 PROXY_FALLBACK_ENABLED = True  # Fallback a conexión directa si todos fallan
 
 # Configuración de rotación automática
+PROXY_DOWNLOAD_SLOTS = True  # Un slot de descarga (delay y concurrencia) por proxy
+# 'weighted': sorteo ponderado por latencia, velocidad y tasa de bloqueos (EWMA)
+# 'least_used': menos fallos y uso más antiguo primero
+PROXY_SELECTION_STRATEGY = 'weighted'
+PROXY_EWMA_ALPHA = 0.3  # Peso de la última medida en las medias móviles
 REQUESTS_PER_PROXY = 5  # Rotar cada 5 requests
 PROXY_RETRY_ATTEMPTS = 3
 PROXY_HEALTH_CHECK_INTERVAL = 300  # 5 minutos
 
+# Sondeo concurrente de proxies al arrancar el spider
+PROXY_HEALTH_CHECK_BUDGET = 20  # Segundos máximos antes de empezar a crawlear
+PROXY_HEALTH_MIN_HEALTHY = 1  # Arrancar en cuanto haya N proxies sanos
+PROXY_HEALTH_CHECK_WORKERS = 20  # Pruebas simultáneas
+PROXY_HEALTH_CHECK_TIMEOUT = 10  # Timeout por petición de prueba
+PROXY_HEALTH_CHECK_URLS = [
+    'https://httpbin.org/ip',
+    'https://www.imdb.com/robots.txt'
+]
+
 # Configuración de TOR (Actualizada)
 TOR_ROTATION_ENABLED = True  # HABILITADO para pruebas
 TOR_ROTATION_INTERVAL = 8  # Rotar identidad cada 8 requests
+TOR_CONTROL_HOST = '127.0.0.1'
 TOR_CONTROL_PORT = 9051
 TOR_SOCKS_PORT = 9050
 TOR_HTTP_PORT = 8118
 TOR_CONTROL_PASSWORD = ''
+TOR_NEWNYM_INTERVAL = 10  # TOR ignora NEWNYM más frecuentes que cada 10s
+TOR_CIRCUIT_BUILD_WAIT = 2  # Segundos que esperan los requests por TOR tras rotar
 
 # Configuración de VPN automática
 VPN_ROTATION_ENABLED = False  # Habilitar para usar VPN con Docker
@@ -132,9 +314,10 @@ PROXY_READ_TIMEOUT = 60
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
-#EXTENSIONS = {
-#    "scrapy.extensions.telnet.TelnetConsole": None,
-#}
+EXTENSIONS = {
+    "imdb_scraper.extensions.AdaptiveConcurrency": 500,
+    "imdb_scraper.extensions.EarlyAbortDownload": 510,
+}
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
@@ -1,8 +1,14 @@
 import scrapy
 import re
+from collections import Counter
 from urllib.parse import urljoin
+from scrapy.utils.defer import maybe_deferred_to_future
 from imdb_scraper.items import ImdbScraperItem
-from imdb_scraper.selector_factory import DataExtractor
+from imdb_scraper.crawl_deadline import CrawlDeadline
+from imdb_scraper.extraction_cache import ExtractionCache
+from imdb_scraper.extraction_pool import ExtractionPool, extract_chart, extract_movie
+from imdb_scraper.selector_factory import layout_detector
+from imdb_scraper.title_source import TitleIdSource
 
 
 class TopMoviesSpider(scrapy.Spider):
@@ -10,6 +16,26 @@ class TopMoviesSpider(scrapy.Spider):
     allowed_domains = ['imdb.com']
     # Remover start_urls y usar start_requests en su lugar
     
+    # 'detail': una ficha por película; 'chart': el ranking de /chart/top/
+    # (-a mode=chart, por defecto TOP_MOVIES_MODE)
+    mode = None
+    CHART_URL = 'https://www.imdb.com/chart/top/'
+    
+    # Headers más convincentes para evitar bloqueos
+    REQUEST_HEADERS = {
+        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+        'Accept-Language': 'en-US,en;q=0.5',
+        'Accept-Encoding': 'gzip, deflate, br',
+        'Referer': 'https://www.imdb.com/chart/top/',
+        'DNT': '1',
+        'Connection': 'keep-alive',
+        'Upgrade-Insecure-Requests': '1',
+        'Sec-Fetch-Dest': 'document',
+        'Sec-Fetch-Mode': 'navigate',
+        'Sec-Fetch-Site': 'same-origin',
+    }
+    
     # Custom headers y cookies
     custom_settings = {
         'DEFAULT_REQUEST_HEADERS': {
@@ -28,8 +54,42 @@ class TopMoviesSpider(scrapy.Spider):
         'COOKIES_DEBUG': True,
     }
     
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        # Opcional: parseo y extracción en procesos (EXTRACTION_PROCESS_WORKERS > 0)
+        spider.extraction_pool = ExtractionPool.from_settings(crawler.settings)
+        # Opcional: fichas ya extraídas, por hash del cuerpo (EXTRACTION_CACHE_ENABLED)
+        spider.extraction_cache = ExtractionCache.from_settings(crawler.settings)
+        # Opcional: plazo fijo para el crawl (CRAWL_DEADLINE_SECONDS > 0)
+        spider.crawl_deadline = CrawlDeadline.from_crawler(crawler)
+        # Aciertos de los selectores CSS de este crawl (también los del pool)
+        spider.selector_stats = Counter()
+        return spider
+    
+    async def start(self):
+        """Requests iniciales bajo demanda: la fuente de IDs se lee según avanza el crawl"""
+        deadline = getattr(self, 'crawl_deadline', None)
+        for request in self.start_requests():
+            # Con plazo, la fuente se deja de leer cuando ya no cabe ningún título más
+            if deadline is not None and not deadline.accepts_new():
+                deadline.stop_start(request.meta.get('rank'))
+                return
+            yield request
+    
     def start_requests(self):
-        """Iniciar directamente con el método de 50 películas"""
+        """Iniciar con el ranking (modo 'chart') o directamente con las 50 fichas"""
+        mode = self.mode or self.settings.get('TOP_MOVIES_MODE', 'detail')
+        if mode == 'chart':
+            self.logger.info("🚀 Iniciando scraping del ranking /chart/top/")
+            yield scrapy.Request(
+                self.CHART_URL,
+                callback=self.parse_chart,
+                headers=dict(self.REQUEST_HEADERS, Referer='https://www.imdb.com/'),
+                dont_filter=True
+            )
+            return
+        
         self.logger.info("🚀 Iniciando scraping directo de películas")
         yield from self.parse_top_50()
     
@@ -47,58 +107,166 @@ class TopMoviesSpider(scrapy.Spider):
         'tt0057012', 'tt0088763', 'tt0172495', 'tt0110413', 'tt0062622'
     ]
 
+    # Argumentos del spider de la fuente de IDs (-a ids_file=title.basics.tsv.gz
+    # -a ids_types=movie -a ids_shard=0 -a ids_shards=4 ...); ver TITLE_IDS_*
+    ID_SOURCE_OPTIONS = ('file', 'types', 'min_year', 'max_year', 'include_adult', 'shard', 'shards', 'limit')
+    
+    def title_ids(self):
+        """(posición, ID) de la fuente configurada o de TOP_50_MOVIE_IDS"""
+        source = TitleIdSource.from_settings(
+            self.settings,
+            **{name: getattr(self, f'ids_{name}', None) for name in self.ID_SOURCE_OPTIONS}
+        )
+        self.title_source = source
+        if source is None:
+            return enumerate(self.TOP_50_MOVIE_IDS, 1)
+        
+        self.logger.info(f"📄 Leyendo IDs de {source.path} (shard {source.shard}/{source.shards})")
+        return iter(source)
+    
     def parse_top_50(self):
-        """Método alternativo que obtiene las top 50 películas directamente"""
-        base_url = "https://www.imdb.com/title/"
+        """Método alternativo que obtiene las películas directamente (top 50 o fichero de IDs)"""
+        title_ids = self.title_ids()
+        # Con un fichero pueden ser cientos de miles: el detalle va a DEBUG
+        log = self.logger.info if self.title_source is None else self.logger.debug
+        for i, movie_id in title_ids:
+            request = self.detail_request(movie_id, i)
+            log(f"🎬 Procesando película {i}: {request.url}")
+            yield request
+    
+    def detail_request(self, movie_id, rank, **meta):
+        """Request de la ficha de un título"""
+        return scrapy.Request(
+            f"https://www.imdb.com/title/{movie_id}/",
+            callback=self.parse_detail,
+            headers=self.REQUEST_HEADERS,
+            # La descarga se corta en cuanto llegan los datos (EarlyAbortDownload);
+            # una ficha sin cambios desde la última ejecución no genera item
+            # (ConditionalRequestMiddleware), salvo si completa uno del ranking
+            meta={
+                'rank': rank,
+                'title_id': movie_id,
+                'early_abort': True,
+                'conditional': 'chart_item' not in meta,
+                **meta,
+            },
+            # Mejor posición, antes: con plazo (CrawlDeadlineMiddleware) se
+            # descartan primero los títulos peor clasificados
+            priority=-rank,
+            dont_filter=True
+        )
+    
+    def parse_chart(self, response):
+        """
+        Items del ranking completo a partir de una sola respuesta
         
-        # Usar todas las 50 películas
-        for i, movie_id in enumerate(self.TOP_50_MOVIE_IDS, 1):
-            url = f"{base_url}{movie_id}/"
-            self.logger.info(f"🎬 Procesando película {i}: {url}")
-            
-            # Headers más convincentes para evitar bloqueos
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.5',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'Referer': 'https://www.imdb.com/chart/top/',
-                'DNT': '1',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1',
-                'Sec-Fetch-Dest': 'document',
-                'Sec-Fetch-Mode': 'navigate',
-                'Sec-Fetch-Site': 'same-origin',
-            }
+        Solo se piden fichas para los campos de CHART_DETAIL_FIELDS que el
+        ranking no trae (p. ej. 'actores' o 'metascore'); con la lista vacía
+        basta un request para las 250 películas.
+        """
+        entries = extract_chart(response)
+        if not entries:
+            self.logger.error(f"❌ Ranking sin datos en {response.url}: se usan las fichas")
+            yield from self.parse_top_50()
+            return
+        
+        detail_fields = self.settings.getlist('CHART_DETAIL_FIELDS')
+        stats = self.crawler.stats
+        stats.set_value('chart/entries', len(entries))
+        
+        for entry in entries:
+            movie_id = entry['imdb_id']
+            missing = [field for field in detail_fields if not entry.get(field)]
+            if missing:
+                stats.inc_value('chart/detail_requests')
+                # parse_detail completa el item con los campos de la ficha; la
+                # ficha es opcional (CRAWL_DEADLINE_SECONDS) y si no se descarga
+                # queda el item del ranking
+                request = self.detail_request(movie_id, entry['ranking'], chart_item=entry, optional=True)
+                yield request.replace(errback=self.chart_detail_failed)
+                continue
             
-            yield scrapy.Request(
-                url, 
-                callback=self.parse_detail,
-                headers=headers,
-                meta={'rank': i},
-                dont_filter=True
-            )
+            stats.inc_value('chart/items')
+            yield self.item_from_chart(entry)
+        
+        self.logger.info(
+            f"📊 Ranking: {len(entries)} películas, "
+            f"{stats.get_value('chart/detail_requests', 0)} fichas pendientes"
+        )
 
-    def parse_detail(self, response):
+    @staticmethod
+    def item_from_chart(entry):
+        item = ImdbScraperItem()
+        for field, value in entry.items():
+            item[field] = value
+        return item
+    
+    def chart_detail_failed(self, failure):
+        """Ficha del ranking descartada o fallida: el item sale con los datos del ranking"""
+        # Reintento aparcado por NetworkResilienceMiddleware: el item saldrá de él
+        if failure.request.meta.get('retry_deferred'):
+            return
+        self.logger.info(f"📊 Sin ficha para {failure.request.url}: item del ranking ({failure.value})")
+        self.crawler.stats.inc_value('chart/detail_failed')
+        self.crawler.stats.inc_value('chart/items')
+        yield self.item_from_chart(failure.request.meta['chart_item'])
+
+    async def parse_detail(self, response):
         """Extrae datos de una película usando el patrón Factory"""
+        # Sin cambios desde la última ejecución: ni extracción ni escritura en BD
+        if response.meta.get('not_modified') or response.meta.get('unchanged'):
+            self.crawler.stats.inc_value('conditional/skipped')
+            self.logger.debug(f"⏭️ Sin cambios: {response.url}")
+            return
+        
         try:
             item = ImdbScraperItem()
             
             # Ranking de la película
             rank = response.meta.get('rank', 0)
             item['ranking'] = rank
+            item['imdb_id'] = response.meta.get('title_id')
             
-            # Usar el Factory Pattern para extraer datos
-            extractor = DataExtractor(response)
-            data = extractor.extract_all_data()
+            # Una ficha idéntica a otra ya extraída solo cuesta el hash
+            cache = getattr(self, 'extraction_cache', None)
+            if cache is not None and not cache.applies(response.body):
+                cache = None
+            key = cache.key(response.body) if cache is not None else None
+            data = cache.get(key) if cache is not None else None
             
-            # Asignar datos extraídos con validación
-            item['titulo'] = self._validate_string(data.get('titulo', ''))
-            item['anio'] = self._validate_year(data.get('anio'))
-            item['calificacion'] = self._validate_rating(data.get('calificacion'))
-            item['duracion'] = self._validate_string(data.get('duracion'))
-            item['metascore'] = self._validate_metascore(data.get('metascore'))
-            item['actores'] = self._validate_actors(data.get('actores', []))
+            if data is not None:
+                self.crawler.stats.inc_value('extraction_cache/hits')
+                layout = data.pop('layout', None)
+                if layout:
+                    layout_detector.learn(response.body, layout)
+            else:
+                # Usar el Factory Pattern para extraer datos, en el pool de
+                # procesos si está activo; los campos ya vienen validados
+                pool = getattr(self, 'extraction_pool', None)
+                if pool is not None:
+                    data = await maybe_deferred_to_future(pool.submit(response))
+                else:
+                    data = extract_movie(response, backend=self.settings.get('EXTRACTION_BACKEND', 'parsel'))
+                self.selector_stats.update(data.pop('selectors', {}))
+                
+                if cache is not None:
+                    self.crawler.stats.inc_value('extraction_cache/misses')
+                    # Sin título la extracción falló: no se guarda para reintentarla
+                    if data.get('titulo'):
+                        cache.put(key, data)
+                layout = data.pop('layout')
+                self.crawler.stats.inc_value(f"selector/layout/{layout}")
+                if pool is not None:
+                    # La detección se hizo en el worker: este proceso no conoce la huella
+                    layout_detector.learn(response.body, layout)
+            
+            # En modo 'chart' la ficha solo completa lo que el ranking no trae
+            chart_item = response.meta.get('chart_item')
+            if chart_item:
+                data.update((field, value) for field, value in chart_item.items() if value)
+            
+            for field, value in data.items():
+                item[field] = value
             
             self.logger.info(f"✅ Extraído: {item['titulo']} ({item['anio']}) - Rating: {item['calificacion']}")
             
@@ -109,53 +277,37 @@ class TopMoviesSpider(scrapy.Spider):
             # Yield item vacío para mantener estadísticas
             yield ImdbScraperItem()
     
-    def _validate_string(self, value):
-        """Valida y limpia strings"""
-        try:
-            return str(value).strip() if value else ''
-        except Exception:
-            return ''
-    
-    def _validate_year(self, value):
-        """Valida año"""
-        try:
-            if value and str(value).isdigit() and 1900 <= int(value) <= 2030:
-                return value
-            return None
-        except Exception:
-            return None
-    
-    def _validate_rating(self, value):
-        """Valida rating"""
-        try:
-            if value:
-                rating = float(str(value).replace(',', '.'))
-                if 0 <= rating <= 10:
-                    return str(rating)
-            return None
-        except Exception:
-            return None
-    
-    def _validate_metascore(self, value):
-        """Valida metascore"""
-        try:
-            if value and str(value).isdigit():
-                score = int(value)
-                if 0 <= score <= 100:
-                    return str(score)
-            return None
-        except Exception:
-            return None
-    
-    def _validate_actors(self, actors_list):
-        """Valida lista de actores"""
-        try:
-            if isinstance(actors_list, list) and actors_list:
-                # Filtrar actores válidos y tomar los primeros 3
-                valid_actors = [actor.strip() for actor in actors_list if actor and actor.strip()][:3]
-                return valid_actors if valid_actors else []
-            return []
-        except Exception:
-            return []
-
-
+    def closed(self, reason):
+        """Registrar maquetaciones vistas y aciertos de cada selector CSS"""
+        stats = self.crawler.stats
+        stats.set_value('selector/fingerprints', len(layout_detector.fingerprints))
+        stats.set_value('selector/layout_probes', layout_detector.probes)
+        stats.set_value('selector/layout_invalidations', layout_detector.invalidations)
+        
+        # Con el pool, las cachés de maquetación viven en sus procesos
+        pool = getattr(self, 'extraction_pool', None)
+        if pool is not None:
+            stats.set_value('extraction_pool/submitted', pool.submitted)
+            pool.stop()
+        
+        cache = getattr(self, 'extraction_cache', None)
+        if cache is not None:
+            stats.set_value('extraction_cache/stored', cache.stored)
+            stats.set_value('extraction_cache/evicted', cache.evicted)
+            stats.set_value('extraction_cache/entries', cache.entries)
+            cache.close()
+        
+        # Un selector que deja de acertar delata un cambio de maquetación
+        for key, count in self.selector_stats.items():
+            stats.set_value(f'selector/{key}', count)
+            outcome, selector = key.split('/', 1)
+            if outcome == 'attempts':
+                hits = self.selector_stats[f'hits/{selector}']
+                stats.set_value(f'selector/hit_rate/{selector}', round(hits / count, 3))
+        
+        if layout_detector.layouts:
+            live = ', '.join(f"{layout}: {count}" for layout, count in layout_detector.layouts.most_common())
+            self.logger.info(
+                f"🧩 Maquetaciones: {live} "
+                f"({len(layout_detector.fingerprints)} huellas, {layout_detector.probes} detecciones completas)"
+            )
@@ -0,0 +1,67 @@
+"""
+Base común de los almacenes SQLite locales (caché de extracciones y
+validadores HTTP)
+Resuelve la ruta respecto a la raíz del proyecto, abre la base en modo WAL
+y agrupa las escrituras en confirmaciones cada `commit_every` operaciones
+"""
+
+import logging
+import os
+import sqlite3
+
+
+# Directorio raíz del proyecto, como data/exports
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def resolve_path(path: str) -> str:
+    """Ruta de la base: las relativas cuelgan de la raíz del proyecto"""
+    if path != ':memory:' and not os.path.isabs(path):
+        return os.path.join(PROJECT_ROOT, path)
+    return path
+
+
+class SQLiteStore:
+    """
+    Conexión SQLite con escrituras agrupadas
+
+    Las subclases definen SCHEMA (sentencias CREATE ... IF NOT EXISTS) y
+    llaman a `_written()` tras cada escritura; se confirma cada
+    `commit_every` escrituras y al cerrar. WAL con synchronous=NORMAL: un
+    corte puede perder las últimas confirmaciones, pero no corrompe la base.
+    """
+
+    SCHEMA = ()
+
+    def __init__(self, path: str, commit_every: int = 100):
+        self.path = path
+        self.commit_every = commit_every
+        self.logger = logging.getLogger(type(self).__module__)
+        self._pending = 0
+
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        for statement in self.SCHEMA:
+            self.connection.execute(statement)
+
+    def _written(self):
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self.connection.commit()
+            self._pending = 0
+
+    def summary(self) -> str:
+        """Línea de log al cerrar"""
+        return ''
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.commit()
+            self.connection.close()
+            self.connection = None
+            summary = self.summary()
+            if summary:
+                self.logger.info(summary)
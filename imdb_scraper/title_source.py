@@ -0,0 +1,168 @@
+"""
+Fuentes de IDs de títulos para TopMoviesSpider
+Leen los IDs en streaming desde un fichero (texto plano, gzip o el volcado
+oficial title.basics.tsv.gz de IMDb) con filtros y reparto en shards, sin
+cargar el fichero en memoria: el primer request sale con la primera línea
+"""
+
+import gzip
+import logging
+import re
+from typing import Iterable, Iterator, Optional, Tuple
+
+
+TITLE_ID_RE = re.compile(rb'tt\d{7,}')
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+# Cabecera de title.basics.tsv(.gz): tconst, titleType, ..., isAdult, startYear, ...
+TSV_HEADER = b'tconst\t'
+
+# Valor nulo de los volcados de IMDb
+TSV_NULL = b'\\N'
+
+
+def open_lines(path: str) -> Iterator[bytes]:
+    """Líneas (bytes) de un fichero plano o gzip, detectado por los primeros bytes"""
+    with open(path, 'rb') as raw:
+        if raw.peek(2)[:2] == GZIP_MAGIC:
+            with gzip.GzipFile(fileobj=raw) as stream:
+                yield from stream
+        else:
+            yield from raw
+
+
+def shard_of(title_id: str, shards: int) -> int:
+    """Shard estable de un título (por su número: no depende del orden del fichero)"""
+    return int(title_id[2:]) % shards
+
+
+class TitleIdSource:
+    """
+    Iterador de (posición, ID) sobre un fichero de títulos
+
+    Formatos:
+    - Texto plano (o .gz): un ID por línea, o cualquier línea que contenga
+      uno (URLs de fichas); las líneas vacías y las que empiezan por # se
+      ignoran
+    - title.basics.tsv(.gz) de IMDb, reconocido por su cabecera; permite
+      filtrar por tipo de título, por año de estreno y excluir adultos
+
+    La posición es el orden entre los títulos que pasan los filtros, antes
+    de repartir en shards: es la misma en cualquier shard. `limit` cuenta
+    los títulos de este shard.
+    """
+
+    def __init__(self, path: str, title_types: Optional[Iterable[str]] = None,
+                 min_year: Optional[int] = None, max_year: Optional[int] = None,
+                 include_adult: bool = False, shard: int = 0, shards: int = 1,
+                 limit: Optional[int] = None):
+        if shards < 1 or not 0 <= shard < shards:
+            raise ValueError(f"Shard inválido: {shard}/{shards}")
+
+        self.path = path
+        self.title_types = frozenset(t.encode() for t in title_types) if title_types else None
+        self.min_year = min_year
+        self.max_year = max_year
+        self.include_adult = include_adult
+        self.shard = shard
+        self.shards = shards
+        self.limit = limit
+        self.logger = logging.getLogger(__name__)
+        # Contadores de la última lectura
+        self.lines = 0
+        self.matched = 0
+        self.emitted = 0
+
+    @classmethod
+    def from_settings(cls, settings, **overrides):
+        """
+        Crear la fuente desde TITLE_IDS_* (los argumentos del spider tienen
+        prioridad); None si no hay fichero configurado
+        """
+        def option(name, default=None):
+            value = overrides.get(name)
+            return value if value not in (None, '') else settings.get(f'TITLE_IDS_{name.upper()}', default)
+
+        path = option('file')
+        if not path:
+            return None
+
+        title_types = option('types')
+        if isinstance(title_types, str):
+            title_types = [t.strip() for t in title_types.split(',') if t.strip()]
+
+        def as_int(value):
+            return int(value) if value not in (None, '') else None
+
+        return cls(
+            path,
+            title_types=title_types or None,
+            min_year=as_int(option('min_year')),
+            max_year=as_int(option('max_year')),
+            include_adult=str(option('include_adult', False)).lower() in ('1', 'true', 'yes'),
+            shard=as_int(option('shard')) or 0,
+            shards=as_int(option('shards')) or 1,
+            limit=as_int(option('limit')),
+        )
+
+    def __iter__(self) -> Iterator[Tuple[int, str]]:
+        self.lines = self.matched = self.emitted = 0
+        lines = open_lines(self.path)
+        try:
+            first = next(lines, b'')
+            if first.startswith(TSV_HEADER):
+                ids = self._from_tsv(lines)
+            else:
+                ids = self._from_text(self._chain(first, lines))
+
+            for title_id in ids:
+                self.matched += 1
+                if self.shards > 1 and shard_of(title_id, self.shards) != self.shard:
+                    continue
+                yield self.matched, title_id
+                self.emitted += 1
+                if self.limit is not None and self.emitted >= self.limit:
+                    return
+        finally:
+            lines.close()
+            self.logger.info(
+                f"📄 {self.path}: {self.lines} líneas, {self.matched} títulos tras los filtros, "
+                f"{self.emitted} en el shard {self.shard}/{self.shards}"
+            )
+
+    @staticmethod
+    def _chain(first: bytes, lines: Iterator[bytes]) -> Iterator[bytes]:
+        if first:
+            yield first
+        yield from lines
+
+    def _from_text(self, lines: Iterator[bytes]) -> Iterator[str]:
+        for line in lines:
+            self.lines += 1
+            if line.startswith(b'#'):
+                continue
+            match = TITLE_ID_RE.search(line)
+            if match:
+                yield match.group(0).decode('ascii')
+
+    def _from_tsv(self, lines: Iterator[bytes]) -> Iterator[str]:
+        check_year = self.min_year is not None or self.max_year is not None
+        for line in lines:
+            self.lines += 1
+            # Solo se separan las 6 primeras columnas (hasta startYear)
+            fields = line.split(b'\t', 6)
+            if len(fields) < 6:
+                continue
+            if self.title_types is not None and fields[1] not in self.title_types:
+                continue
+            if not self.include_adult and fields[4] == b'1':
+                continue
+            if check_year:
+                if fields[5] == TSV_NULL:
+                    continue
+                year = int(fields[5])
+                if (self.min_year is not None and year < self.min_year or
+                        self.max_year is not None and year > self.max_year):
+                    continue
+            yield fields[0].decode('ascii')
@@ -0,0 +1,226 @@
+"""
+Cliente asíncrono del puerto de control de TOR integrado con el reactor
+Mantiene una única conexión autenticada, emite SIGNAL NEWNYM respetando el
+límite de frecuencia de TOR y retiene solo los requests enrutados por TOR
+mientras se construye el nuevo circuito
+"""
+
+import logging
+from collections import deque
+from typing import Deque, List, Optional
+
+from twisted.internet.defer import Deferred, DeferredLock, inlineCallbacks, succeed
+from twisted.internet.endpoints import TCP4ClientEndpoint, connectProtocol
+from twisted.internet.task import deferLater
+from twisted.protocols.basic import LineReceiver
+
+
+class TorControlError(Exception):
+    """Error devuelto por el puerto de control de TOR"""
+
+
+class TorControlProtocol(LineReceiver):
+    """
+    Protocolo de control de TOR: un comando por línea y respuestas
+    multilínea terminadas en una línea "NNN " (código + espacio)
+    """
+
+    delimiter = b'\r\n'
+
+    def __init__(self):
+        self._pending: Deque[Deferred] = deque()
+        self._reply_lines: List[str] = []
+        self.connected = False
+
+    def connectionMade(self):
+        self.connected = True
+
+    def connectionLost(self, reason):
+        self.connected = False
+        while self._pending:
+            self._pending.popleft().errback(TorControlError(f"Conexión de control perdida: {reason.getErrorMessage()}"))
+
+    def send_command(self, command: str) -> Deferred:
+        """
+        Enviar un comando de control
+
+        Returns:
+            Deferred: se dispara con (código, líneas) de la respuesta
+        """
+        d = Deferred()
+        self._pending.append(d)
+        self.sendLine(command.encode())
+        return d
+
+    def lineReceived(self, line: bytes):
+        text = line.decode('utf-8', 'replace')
+
+        # Eventos asíncronos (650) no corresponden a ningún comando
+        if text.startswith('650'):
+            return
+
+        self._reply_lines.append(text[4:])
+        if len(text) >= 4 and text[3] == ' ':
+            code = int(text[:3]) if text[:3].isdigit() else 0
+            lines, self._reply_lines = self._reply_lines, []
+            if self._pending:
+                self._pending.popleft().callback((code, lines))
+
+
+class TorControlClient:
+    """
+    Conexión persistente al puerto de control de TOR
+
+    Las rotaciones pedidas dentro de la ventana de NEWNYM se retrasan hasta
+    que TOR las acepte y las peticiones repetidas mientras hay una pendiente
+    se agrupan en una sola.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 9051, password: str = '',
+                 newnym_interval: float = 10.0, circuit_wait: float = 2.0,
+                 connect_timeout: float = 10.0):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.newnym_interval = newnym_interval
+        self.circuit_wait = circuit_wait
+        self.connect_timeout = connect_timeout
+        self.logger = logging.getLogger(__name__)
+
+        self._protocol: Optional[TorControlProtocol] = None
+        self._lock = DeferredLock()
+        self._last_newnym: Optional[float] = None
+        self._rotation_pending = False
+        self._rotation_waiters: List[Deferred] = []
+        self._circuit_building = False
+        self._circuit_waiters: List[Deferred] = []
+
+        self.stats = {
+            'connections': 0,
+            'rotations': 0,
+            'coalesced': 0,
+            'failures': 0,
+        }
+
+    @property
+    def circuit_building(self) -> bool:
+        return self._circuit_building
+
+    @inlineCallbacks
+    def _ensure_connected(self):
+        """Conectar y autenticar si no hay una conexión viva"""
+        if self._protocol is not None and self._protocol.connected:
+            return self._protocol
+
+        from twisted.internet import reactor
+
+        endpoint = TCP4ClientEndpoint(reactor, self.host, self.port, timeout=self.connect_timeout)
+        protocol = yield connectProtocol(endpoint, TorControlProtocol())
+        self.stats['connections'] += 1
+
+        if self.password:
+            command = f'AUTHENTICATE "{self.password}"'
+        else:
+            command = 'AUTHENTICATE'
+
+        code, lines = yield protocol.send_command(command)
+        if code != 250:
+            protocol.transport.loseConnection()
+            raise TorControlError(f"Error autenticando con TOR: {code} {' '.join(lines)}")
+
+        self.logger.info(f"Conectado al puerto de control de TOR {self.host}:{self.port}")
+        self._protocol = protocol
+        return protocol
+
+    def new_identity(self) -> Deferred:
+        """
+        Solicitar una nueva identidad (SIGNAL NEWNYM)
+
+        Sin espera por el límite de NEWNYM el circuito queda en construcción
+        antes de volver, así que el request que pide la rotación ya no sale
+        por el circuito anterior.
+
+        Returns:
+            Deferred: se dispara cuando TOR responde, con True si aceptó la
+            rotación; False si falló o si se agrupó con otra rotación
+            pendiente (se dispara cuando termina esa)
+        """
+        if self._rotation_pending:
+            self.stats['coalesced'] += 1
+            waiter = Deferred()
+            self._rotation_waiters.append(waiter)
+            return waiter
+
+        from twisted.internet import reactor
+
+        self._rotation_pending = True
+        wait = 0.0
+        if self._last_newnym is not None:
+            wait = max(0.0, self._last_newnym + self.newnym_interval - reactor.seconds())
+
+        if wait > 0:
+            self.logger.debug(f"Rotación TOR diferida {wait:.1f}s por el límite de NEWNYM")
+            d = deferLater(reactor, wait, self._lock.run, self._signal_newnym)
+        else:
+            d = self._lock.run(self._signal_newnym)
+        d.addBoth(self._rotation_done)
+        return d
+
+    @inlineCallbacks
+    def _signal_newnym(self):
+        from twisted.internet import reactor
+
+        self._hold_circuit()
+        try:
+            protocol = yield self._ensure_connected()
+            code, lines = yield protocol.send_command('SIGNAL NEWNYM')
+            if code != 250:
+                raise TorControlError(f"TOR rechazó NEWNYM: {code} {' '.join(lines)}")
+        except Exception as e:
+            self.stats['failures'] += 1
+            self.logger.error(f"Error rotando identidad TOR: {e}")
+            if self._protocol is not None and self._protocol.connected:
+                self._protocol.transport.loseConnection()
+            self._protocol = None
+            self._release_circuit()
+            return False
+
+        self._last_newnym = reactor.seconds()
+        self.stats['rotations'] += 1
+        self.logger.info("Identidad TOR rotada exitosamente")
+
+        # Esperar a que TOR establezca nueva ruta sin bloquear el reactor
+        reactor.callLater(self.circuit_wait, self._release_circuit)
+        return True
+
+    def _rotation_done(self, result):
+        self._rotation_pending = False
+        waiters, self._rotation_waiters = self._rotation_waiters, []
+        for waiter in waiters:
+            waiter.callback(False)
+        return result
+
+    def _hold_circuit(self):
+        self._circuit_building = True
+
+    def _release_circuit(self):
+        self._circuit_building = False
+        waiters, self._circuit_waiters = self._circuit_waiters, []
+        for waiter in waiters:
+            waiter.callback(None)
+
+    def wait_for_circuit(self) -> Deferred:
+        """Deferred que se dispara cuando no hay un circuito nuevo en construcción"""
+        if not self._circuit_building:
+            return succeed(None)
+
+        d = Deferred()
+        self._circuit_waiters.append(d)
+        return d
+
+    def close(self):
+        """Cerrar la conexión de control y liberar requests retenidos"""
+        if self._protocol is not None and self._protocol.connected:
+            self._protocol.transport.loseConnection()
+        self._protocol = None
+        self._release_circuit()
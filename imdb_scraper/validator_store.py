@@ -0,0 +1,74 @@
+"""
+Validadores HTTP de las fichas entre ejecuciones
+Guarda por título el ETag, el Last-Modified y el hash del contenido de la
+última ficha procesada, para pedir la siguiente con If-None-Match /
+If-Modified-Since y descartar las que no han cambiado
+"""
+
+import os
+import time
+from typing import NamedTuple, Optional
+
+from .sqlite_store import SQLiteStore, resolve_path
+
+
+DEFAULT_PATH = os.path.join('data', 'cache', 'validadores.db')
+
+
+class Validators(NamedTuple):
+    etag: Optional[str]
+    last_modified: Optional[str]
+    content_hash: Optional[str]
+
+
+class ValidatorStore(SQLiteStore):
+    """
+    Almacén SQLite de validadores por ID de título
+
+    Una fila por título; las escrituras se agrupan y se confirman cada
+    `commit_every` operaciones y al cerrar.
+    """
+
+    SCHEMA = ('''
+        CREATE TABLE IF NOT EXISTS validadores (
+            imdb_id TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            hash TEXT,
+            fecha REAL NOT NULL
+        )
+    ''',)
+
+    def __init__(self, path: str, commit_every: int = 100):
+        super().__init__(path, commit_every)
+        self.updated = 0
+
+    @classmethod
+    def from_settings(cls, settings):
+        """Crear el almacén si CONDITIONAL_REQUESTS_ENABLED; None en caso contrario"""
+        if not settings.getbool('CONDITIONAL_REQUESTS_ENABLED', False):
+            return None
+        return cls(resolve_path(settings.get('CONDITIONAL_REQUESTS_PATH', DEFAULT_PATH)))
+
+    def get(self, imdb_id: str) -> Optional[Validators]:
+        row = self.connection.execute(
+            'SELECT etag, last_modified, hash FROM validadores WHERE imdb_id = ?', (imdb_id,)
+        ).fetchone()
+        return Validators(*row) if row else None
+
+    def update(self, imdb_id: str, validators: Validators):
+        self.connection.execute(
+            'INSERT OR REPLACE INTO validadores (imdb_id, etag, last_modified, hash, fecha) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (imdb_id, *validators, time.time()),
+        )
+        self.updated += 1
+        self._written()
+
+    def touch(self, imdb_id: str):
+        """Ficha sin cambios: mismos validadores, fecha de la comprobación (historial de refrescos)"""
+        self.connection.execute('UPDATE validadores SET fecha = ? WHERE imdb_id = ?', (time.time(), imdb_id))
+        self._written()
+
+    def summary(self) -> str:
+        return f"🏷️ Validadores actualizados: {self.updated}"